@@ -1,24 +1,221 @@
-import sounddevice as sd
+import functools
+import queue
+import struct
+import threading
 import wave
-import speech_recognition as sr
-from python_speech_features import mfcc
 import numpy as np
-import keyboard
 import time
 
+from mfcc_engine import get_plan
+from instrumentation import instrumentation
+from lazy_imports import lazy_import
+
+# Thư viện thiết bị âm thanh, bàn phím và nhận dạng giọng nói chỉ được nạp khi dùng lần đầu,
+# nên các chế độ không cần microphone (hàng loạt, phát lại file) chạy được trên máy không có âm thanh
+sd = lazy_import('sounddevice')
+sr = lazy_import('speech_recognition')
+keyboard = lazy_import('keyboard')
+
 # Cài đặt các tham số
 SAMPLE_RATE = 16000  # Tần số lấy mẫu (Hz)
 MFCC_FEATURES = 13   # Số đặc trưng MFCC cần trích xuất
 
-def record_audio():
+class Workspace(threading.local):
+    """
+    Bộ đệm làm việc dùng lại giữa các lần gọi (riêng cho từng thread): mỗi tên giữ một mảng
+    phẳng chỉ được cấp phát lại khi cần lớn hơn, nên các bản ghi liên tiếp không cấp phát
+    lại các mảng tạm cỡ tín hiệu. Chỉ các bộ đệm tới max_bytes được giữ lại; yêu cầu lớn hơn
+    (ví dụ một file WAV dài) được cấp phát tạm thời và giải phóng sau khi dùng.
+    """
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self._buffers = {}
+        self.max_bytes = max_bytes
+
+    def get(self, name, shape, dtype):
+        """
+        Lấy bộ đệm shape/dtype cho trước (nội dung không xác định)
+        """
+        size = int(np.prod(shape))
+        if size * np.dtype(dtype).itemsize > self.max_bytes:
+            instrumentation.count('workspace.oversize')
+            return np.empty(shape, dtype=dtype)
+        buffer = self._buffers.get((name, np.dtype(dtype)))
+        if buffer is None or buffer.size < size:
+            buffer = np.empty(size, dtype=dtype)
+            self._buffers[(name, np.dtype(dtype))] = buffer
+            instrumentation.count('workspace.allocations')
+        return buffer[:size].reshape(shape)
+
+# Bộ đệm của extract_features
+workspace = Workspace()
+
+def to_audio_data(samples, sample_rate=SAMPLE_RATE):
+    """
+    Đóng gói mẫu PCM int16 thành sr.AudioData mà không sao chép (memoryview trên mảng numpy)
+    
+    Tham số:
+        samples (array): Mảng int16 mono
+        sample_rate (int): Tần số lấy mẫu (Hz)
+        
+    Trả về:
+        sr.AudioData: Dữ liệu âm thanh cho bộ nhận dạng giọng nói
+    """
+    samples = np.ascontiguousarray(samples, dtype=np.int16)
+    return sr.AudioData(memoryview(samples).cast('B'), sample_rate, 2)
+
+def save_wav(path, samples, sample_rate=SAMPLE_RATE):
+    """
+    Lưu mẫu PCM int16 mono thành file WAV
+    """
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)           # Mono
+        wf.setsampwidth(2)           # 16-bit
+        wf.setframerate(sample_rate) # Tần số lấy mẫu
+        wf.writeframes(np.ascontiguousarray(samples, dtype=np.int16).tobytes())
+
+class WavWriter:
+    """
+    Ghi file WAV tăng dần theo từng khối, dùng cho bản ghi không giới hạn độ dài.
+    
+    Header được ghi trước với kích thước tạm, các khối được nối vào cuối file (bộ nhớ chỉ
+    gồm bộ đệm ghi), và kích thước trong header được cập nhật khi flush() hoặc close().
+    File có thể được mở bằng memory map (batch.read_wav_memmap) trong lúc vẫn đang ghi.
+    
+    Thuộc tính:
+        path (str): Đường dẫn file WAV
+        dtype (str): 'int16' (PCM 16-bit) hoặc 'float32' (IEEE float 32-bit)
+        n_samples (int): Số mẫu đã ghi
+    """
+    # Định dạng -> (mã định dạng WAV, số bit mỗi mẫu, kiểu numpy)
+    FORMATS = {'int16': (1, 16, np.dtype('<i2')), 'float32': (3, 32, np.dtype('<f4'))}
+    
+    def __init__(self, path, sample_rate=SAMPLE_RATE, dtype='int16', buffer_size=1 << 20):
+        if dtype not in self.FORMATS:
+            raise ValueError(f"Định dạng mẫu không được hỗ trợ: {dtype}")
+        self.path = path
+        self.sample_rate = sample_rate
+        self.dtype = dtype
+        self.n_samples = 0
+        self._format, self._bits, self._np_dtype = self.FORMATS[dtype]
+        self._file = open(path, 'wb', buffering=buffer_size)
+        self._file.write(self._header())
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _header(self):
+        data_bytes = self.n_samples * self._np_dtype.itemsize
+        block_align = self._np_dtype.itemsize
+        return (struct.pack('<4sI4s', b'RIFF', 36 + data_bytes, b'WAVE')
+                + struct.pack('<4sIHHIIHH', b'fmt ', 16, self._format, 1, self.sample_rate,
+                              self.sample_rate * block_align, block_align, self._bits)
+                + struct.pack('<4sI', b'data', data_bytes))
+    
+    def write(self, block):
+        """
+        Nối một khối mẫu (float trong [-1, 1] hoặc int16) vào cuối file
+        """
+        block = np.asarray(block).reshape(-1)
+        if self.dtype == 'int16' and block.dtype != np.int16:
+            block = (np.clip(block, -1.0, 1.0) * 32767).astype('<i2')
+        elif self.dtype == 'float32' and block.dtype == np.int16:
+            block = block.astype('<f4') / 32768.0
+        self._file.write(np.ascontiguousarray(block, dtype=self._np_dtype).tobytes())
+        self.n_samples += len(block)
+    
+    def flush(self):
+        """
+        Ghi bộ đệm xuống đĩa và cập nhật kích thước trong header
+        """
+        self._file.flush()
+        position = self._file.tell()
+        self._file.seek(0)
+        self._file.write(self._header())
+        self._file.seek(position)
+        self._file.flush()
+    
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+@instrumentation.timed('audio.record_long')
+def record_long(path, dtype='int16', max_seconds=None, block_size=1024):
+    """
+    Ghi âm không giới hạn độ dài thẳng vào file WAV trên đĩa với bộ nhớ cố định.
+    Nhấn Space để bắt đầu, nhấn Space lần nữa để kết thúc.
+    
+    Callback của luồng âm thanh chỉ chép từng khối vào hàng đợi; một thread riêng ghi
+    các khối vào WavWriter, nên bộ nhớ không tăng theo thời lượng ghi âm.
+    
+    Tham số:
+        path (str): File WAV đầu ra
+        dtype (str): 'int16' hoặc 'float32'
+        max_seconds (float): Thời lượng tối đa (giây), None để không giới hạn
+        block_size (int): Số mẫu mỗi khối của luồng âm thanh
+        
+    Trả về:
+        float: Thời lượng đã ghi (giây)
+    """
+    print("Nhấn SPACE để bắt đầu ghi âm, nhấn SPACE lần nữa để kết thúc...")
+    keyboard.wait('space')
+    while keyboard.is_pressed('space'):
+        time.sleep(0.01)
+    print(f"Đang ghi âm vào {path}... (nhấn SPACE để kết thúc)")
+    
+    blocks = queue.Queue()
+    
+    def on_audio(indata, frames, time_info, status):
+        blocks.put(indata[:, 0].copy())
+    
+    with WavWriter(path, dtype=dtype) as writer:
+        def drain():
+            while True:
+                block = blocks.get()
+                if block is None:
+                    break
+                writer.write(block)
+        
+        thread = threading.Thread(target=drain, name='wav-writer', daemon=True)
+        thread.start()
+        stream = sd.InputStream(samplerate=SAMPLE_RATE, channels=1, dtype='float32',
+                                blocksize=block_size, callback=on_audio)
+        start_time = time.time()
+        stream.start()
+        try:
+            while not keyboard.is_pressed('space'):
+                time.sleep(0.05)
+                if max_seconds is not None and time.time() - start_time > max_seconds:
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stream.stop()
+            stream.close()
+            blocks.put(None)
+            thread.join()
+    
+    seconds = writer.n_samples / SAMPLE_RATE
+    print(f"Ghi âm kết thúc: {seconds:.1f} giây")
+    return seconds
+
+@instrumentation.timed('audio.record')
+def record_audio(archive_path=None):
     """
-    Ghi âm từ microphone và lưu thành file WAV.
+    Ghi âm từ microphone, giữ kết quả trong bộ nhớ.
     Người dùng nhấn và giữ phím Space để ghi âm, thả ra để kết thúc.
     
+    Tham số:
+        archive_path (str): Nếu có, lưu thêm bản ghi thành file WAV tại đường dẫn này
+    
     Trả về:
-        tuple: (audio_data, temp_wav_path)
-            - audio_data: Mảng numpy chứa dữ liệu âm thanh đã chuẩn hóa
-            - temp_wav_path: Đường dẫn đến file WAV tạm thời
+        tuple: (audio, audio_data)
+            - audio: Mảng numpy chứa dữ liệu âm thanh đã chuẩn hóa
+            - audio_data: sr.AudioData dùng chung bộ nhớ với mảng int16 của bản ghi,
+                          truyền thẳng cho recognize_speech
     """
     print("Nhấn và giữ SPACE để bắt đầu ghi âm, thả ra để kết thúc...")
     
@@ -30,6 +227,7 @@ def record_audio():
     recording = sd.rec(int(SAMPLE_RATE * 10),  # Tối đa 10 giây
                       samplerate=SAMPLE_RATE,
                       channels=1,
+                      dtype='float32',       # Định dạng gốc của thiết bị, nửa bộ nhớ so với float64
                       blocking=False)
     
     # Đợi cho đến khi phím Space được thả ra
@@ -49,56 +247,50 @@ def record_audio():
     
     # Chuẩn hóa âm thanh về dải [-1, 1]
     if recording.size > 0:
-        recording = np.clip(recording, -1.0, 1.0)
-        # Chuyển đổi sang int16 an toàn
-        int16_data = (recording * 32767).clip(-32768, 32767).astype(np.int16)
+        np.clip(recording, -1.0, 1.0, out=recording)
+        # Chuyển đổi sang int16 an toàn (sau khi cắt về [-1, 1] thì không thể tràn)
+        int16_data = np.multiply(recording, 32767).astype(np.int16)
     else:
         # Nếu không có âm thanh, tạo mảng zeros
         int16_data = np.zeros(SAMPLE_RATE, dtype=np.int16)
     
-    # Lưu file WAV tạm thời
-    temp_wav = "temp_recording.wav"
-    with wave.open(temp_wav, 'wb') as wf:
-        wf.setnchannels(1)           # Mono
-        wf.setsampwidth(2)           # 16-bit
-        wf.setframerate(SAMPLE_RATE) # Tần số lấy mẫu
-        wf.writeframes(int16_data.tobytes())
+    # Chỉ ghi file WAV khi cần lưu trữ bản ghi
+    if archive_path:
+        save_wav(archive_path, int16_data)
     
-    return recording.flatten(), temp_wav
+    return recording.ravel(), to_audio_data(int16_data.ravel())
 
-def recognize_speech(audio_file):
+@instrumentation.timed('asr.recognize')
+def recognize_speech(audio, language='vi-VN', timeout=None):
     """
     Nhận dạng giọng nói thành văn bản sử dụng Google Speech Recognition
     
     Tham số:
-        audio_file (str): Đường dẫn đến file WAV cần nhận dạng
+        audio (sr.AudioData/array/str): Dữ liệu âm thanh trong bộ nhớ (sr.AudioData hoặc
+                                        mảng int16 16 kHz), hoặc đường dẫn đến file WAV
+        language (str): Mã ngôn ngữ
+        timeout (float): Thời gian chờ tối đa cho yêu cầu mạng (giây), None để chờ mãi
         
     Trả về:
         str: Văn bản được nhận dạng hoặc thông báo lỗi
     """
     recognizer = sr.Recognizer()
-    with sr.AudioFile(audio_file) as source:
-        audio = recognizer.record(source)
-        try:
-            # Thử nhận dạng bằng Google Speech Recognition
-            text = recognizer.recognize_google(audio, language='vi-VN')
-            return text
-        except sr.UnknownValueError:
-            return "Không thể nhận dạng giọng nói"
-        except sr.RequestError:
-            return "Lỗi kết nối đến dịch vụ nhận dạng giọng nói"
-    
-    # Trích xuất MFCC
-    mfcc_features = mfcc(audio, 
-                        samplerate=SAMPLE_RATE, 
-                        numcep=MFCC_FEATURES)
-    
-    # Xử lý các giá trị không hợp lệ
-    mfcc_features = np.nan_to_num(mfcc_features)
-    
-    return mfcc_features
+    recognizer.operation_timeout = timeout
+    if isinstance(audio, str):
+        with sr.AudioFile(audio) as source:
+            audio = recognizer.record(source)
+    elif not isinstance(audio, sr.AudioData):
+        audio = to_audio_data(audio)
+    try:
+        # Thử nhận dạng bằng Google Speech Recognition
+        text = recognizer.recognize_google(audio, language=language)
+        return text
+    except sr.UnknownValueError:
+        return "Không thể nhận dạng giọng nói"
+    except (sr.RequestError, OSError):
+        return "Lỗi kết nối đến dịch vụ nhận dạng giọng nói"
 
-def extract_features(audio):
+def extract_features(audio, cache=None, dtype=np.float64):
     """
     Trích xuất đặc trưng MFCC (Mel Frequency Cepstral Coefficients) từ tín hiệu âm thanh.
     MFCC là đặc trưng quan trọng trong xử lý giọng nói, đại diện cho đặc tính của âm thanh
@@ -111,27 +303,91 @@ def extract_features(audio):
     4. Xử lý lại kết quả để đảm bảo tính hợp lệ
     
     Tham số:
-        audio (array): Mảng 1D chứa dữ liệu âm thanh thô
+        audio (array): Mảng 1D chứa dữ liệu âm thanh thô, hoặc mảng 2D
+                       (số_tín_hiệu, số_mẫu) gồm nhiều tín hiệu cùng độ dài
+        cache (FeatureCache): Bộ nhớ đệm đặc trưng trên đĩa; nếu đã có kết quả cho cùng
+                              dữ liệu âm thanh và tham số thì trả về mảng memory map chỉ đọc
+        dtype: Độ chính xác của toàn bộ phép tính và kết quả (np.float64 hoặc np.float32;
+               float32 dùng một nửa bộ nhớ)
         
     Trả về:
         array: Ma trận đặc trưng MFCC, shape (số_khung_thời_gian, 13)
                Mỗi hàng là một vector 13 đặc trưng MFCC cho một khung thời gian
+               (với đầu vào 2D: shape (số_tín_hiệu, số_khung_thời_gian, 13))
     """
-    # Đảm bảo audio không có giá trị NaN hoặc inf
-    audio = np.nan_to_num(audio)
+    dtype = np.dtype(dtype)
+    if cache is not None:
+        params = {'samplerate': SAMPLE_RATE, 'numcep': MFCC_FEATURES, 'nfilt': 26, 'nfft': 512}
+        if dtype != np.float64:
+            params['dtype'] = dtype.name
+        return cache.get_or_compute(audio, params, functools.partial(extract_features, dtype=dtype))
     
-    # Chuẩn hóa âm thanh về dải [-1, 1]
-    if np.std(audio) > 0:
-        audio = (audio - np.mean(audio)) / np.std(audio)
+    plan = get_plan(samplerate=SAMPLE_RATE,   # Tần số lấy mẫu
+                    numcep=MFCC_FEATURES,     # Số hệ số MFCC cần trích xuất
+                    nfilt=26,                 # Số bộ lọc Mel
+                    nfft=512)                 # Kích thước cửa sổ FFT
+    
+    # Sao chép vào bộ đệm dùng lại và loại bỏ NaN/inf tại chỗ
+    audio = np.asarray(audio)
+    signals = workspace.get('audio', audio.shape, dtype)
+    np.copyto(signals, audio, casting='unsafe')
+    np.nan_to_num(signals, copy=False)
     
-    # Trích xuất MFCC với 13 hệ số
-    mfcc_features = mfcc(audio, 
-                        samplerate=SAMPLE_RATE,  # Tần số lấy mẫu
-                        numcep=MFCC_FEATURES,    # Số hệ số MFCC cần trích xuất
-                        nfilt=26,               # Số bộ lọc Mel
-                        nfft=512)               # Kích thước cửa sổ FFT
+    # Chuẩn hóa từng tín hiệu về trung bình 0, độ lệch chuẩn 1 (tại chỗ);
+    # tín hiệu hằng (độ lệch chuẩn 0) được giữ nguyên
+    mean = np.mean(signals, axis=-1, keepdims=True)
+    signals -= mean
+    std = np.sqrt(np.einsum('...i,...i->...', signals, signals) / signals.shape[-1])[..., np.newaxis]
+    signals += np.where(std > 0, 0, mean).astype(dtype)
+    signals /= np.where(std > 0, std, 1).astype(dtype)
+    
+    # Tiền nhấn ghi thẳng vào bộ đệm đã đệm 0, rồi tính MFCC trên các khung (view) của bộ đệm
+    n_samples = signals.shape[-1]
+    padded = workspace.get('padded', signals.shape[:-1] + (plan.padded_length(n_samples),), dtype)
+    padded[..., n_samples:] = 0
+    plan.preemphasis(signals, out=padded[..., :n_samples])
+    with instrumentation.span('features.mfcc'):
+        mfcc_features = plan.frames_to_mfcc(plan.frame(padded))
+    instrumentation.count('features.frames', mfcc_features.shape[-2])
     
     # Xử lý các giá trị không hợp lệ và chuẩn hóa
     mfcc_features = np.nan_to_num(mfcc_features)  # Thay thế NaN/inf
     
-    return mfcc_features
\ No newline at end of file
+    return mfcc_features
+
+def iter_features(samples, chunk_samples=SAMPLE_RATE * 60):
+    """
+    Trích xuất MFCC theo từng đoạn cho tín hiệu dài (ví dụ np.memmap của một file WAV
+    hàng giờ), bộ nhớ chỉ phụ thuộc độ dài đoạn thay vì độ dài tín hiệu.
+    
+    Lượt đầu tính trung bình và độ lệch chuẩn của toàn bộ tín hiệu theo từng đoạn; lượt sau
+    chuẩn hóa từng đoạn và đưa qua StreamingMFCC, nên kết quả giống extract_features
+    trên toàn bộ tín hiệu (trừ khung cuối chưa đủ mẫu, vốn được đệm 0 trong extract_features).
+    
+    Tham số:
+        samples (array): Tín hiệu 1D (int16 hoặc float)
+        chunk_samples (int): Số mẫu mỗi đoạn
+        
+    Trả về:
+        generator: Các khối MFCC, shape (số_khung_của_đoạn, 13)
+    """
+    from streaming import StreamingMFCC
+    
+    n_samples = len(samples)
+    total, total_sq = 0.0, 0.0
+    for start in range(0, n_samples, chunk_samples):
+        chunk = np.nan_to_num(np.asarray(samples[start:start + chunk_samples], dtype=np.float64))
+        total += chunk.sum()
+        total_sq += np.dot(chunk, chunk)
+    mean = total / max(n_samples, 1)
+    std = np.sqrt(max(total_sq / max(n_samples, 1) - mean * mean, 0.0))
+    
+    mfcc = StreamingMFCC(sample_rate=SAMPLE_RATE, numcep=MFCC_FEATURES)
+    for start in range(0, n_samples, chunk_samples):
+        chunk = np.nan_to_num(np.asarray(samples[start:start + chunk_samples], dtype=np.float64))
+        if std > 0:
+            chunk = (chunk - mean) / std
+        with instrumentation.span('features.mfcc'):
+            frames = mfcc.push(chunk)
+        instrumentation.count('features.frames', len(frames))
+        yield frames
\ No newline at end of file
@@ -0,0 +1,233 @@
+import csv
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from audio_utils import SAMPLE_RATE, extract_features
+from data_utils import create_training_data
+from models import ModelFactory, load_models
+
+# Các cột của bảng kết quả, theo thứ tự ghi ra file
+RESULT_COLUMNS = [
+    'path', 'duration_s', 'n_frames', 'n_windows', 'speech_ratio',
+    'hmm_custom_speech_ratio', 'hmm_lib_speech_ratio', 'svm_speech_ratio',
+    'hmm_custom_accuracy', 'hmm_lib_accuracy', 'svm_accuracy',
+    'seconds', 'error',
+]
+
+def read_wav_memmap(path):
+    """
+    Mở file WAV PCM 16-bit hoặc float 32-bit bằng memory map thay vì đọc toàn bộ vào bộ nhớ.
+    File đang được ghi dở (kích thước trong header chưa cập nhật) được đọc đến hết phần đã có.
+
+    Tham số:
+        path (str): Đường dẫn file WAV
+
+    Trả về:
+        tuple: (samples, sample_rate)
+            - samples: np.memmap int16 (hoặc float32) của kênh đầu tiên, shape (số_mẫu,)
+            - sample_rate: Tần số lấy mẫu (Hz)
+    """
+    with open(path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError(f"Không phải file WAV: {path}")
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"Không tìm thấy dữ liệu âm thanh trong {path}")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', f.read(16))
+                f.seek(size - 16 + (size & 1), os.SEEK_CUR)
+            elif chunk_id == b'data':
+                offset = f.tell()
+                break
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)
+
+    if fmt is None:
+        raise ValueError(f"Thiếu khối 'fmt ' trong {path}")
+    audio_format, channels, sample_rate, _, _, bits = fmt
+    dtype = {(1, 16): '<i2', (3, 32): '<f4'}.get((audio_format, bits))
+    if dtype is None:
+        raise ValueError(f"Chỉ hỗ trợ WAV PCM 16-bit hoặc float 32-bit: {path}")
+
+    # Không tin kích thước vượt quá phần dữ liệu thực có trong file (file đang được ghi)
+    available = os.path.getsize(path) - offset
+    size = min(size, available) if size else available
+    n_samples = size // (np.dtype(dtype).itemsize * channels)
+    samples = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(n_samples, channels))
+    return samples[:, 0], sample_rate
+
+def list_inputs(source):
+    """
+    Liệt kê các file WAV cần xử lý
+
+    Tham số:
+        source (str): Thư mục (tìm đệ quy các file .wav) hoặc file manifest
+                      (mỗi dòng một đường dẫn, tương đối so với thư mục của manifest)
+
+    Trả về:
+        list: Danh sách đường dẫn đã sắp xếp (với thư mục) hoặc theo thứ tự manifest
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith('.wav'))
+        return sorted(paths)
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding='utf-8') as f:
+        lines = [line.strip() for line in f]
+    return [line if os.path.isabs(line) else os.path.join(base, line)
+            for line in lines if line and not line.startswith('#')]
+
+def iter_training_batches(paths, batch_size=4096, cache=None):
+    """
+    Sinh dần các lô dữ liệu huấn luyện (X, y) từ nhiều file WAV, để huấn luyện tăng dần
+    (ví dụ ApproxKernelSVM.fit_stream) trên dữ liệu lớn hơn bộ nhớ. Các file lỗi bị bỏ qua.
+
+    Tham số:
+        paths (list): Danh sách file WAV
+        batch_size (int): Số mẫu tối đa mỗi lô
+        cache (FeatureCache): Bộ nhớ đệm đặc trưng (nếu có)
+
+    Trả về:
+        generator: Các tuple (X, y) với tối đa batch_size mẫu
+    """
+    for path in paths:
+        try:
+            samples, sample_rate = read_wav_memmap(path)
+        except (OSError, ValueError, struct.error):
+            continue
+        if sample_rate != SAMPLE_RATE:
+            continue
+        X, y = create_training_data(extract_features(samples, cache=cache))
+        for start in range(0, len(X), batch_size):
+            yield X[start:start + batch_size], y[start:start + batch_size]
+
+# Bộ nhớ đệm đặc trưng, mô hình đã huấn luyện và loại SVM của tiến trình worker hiện tại
+# (tạo một lần trong _init_worker)
+_worker_cache = None
+_worker_models = None
+_worker_svm_backend = 'svc'
+
+def process_file(path, cache=None, models=None, svm_backend=None):
+    """
+    Xử lý một file: trích xuất MFCC, tạo dữ liệu theo cửa sổ và chạy cả ba mô hình.
+    Nếu có mô hình đã huấn luyện thì chỉ suy luận, ngược lại huấn luyện trên 80% đầu của file.
+
+    Tham số:
+        path (str): Đường dẫn file WAV
+        cache (FeatureCache): Bộ nhớ đệm đặc trưng; mặc định dùng bộ đệm của worker (nếu có)
+        models (tuple): (hmm_custom, hmm_lib, svm) đã huấn luyện; mặc định dùng mô hình của worker
+        svm_backend (str): Loại SVM khi phải huấn luyện ('svc', 'rff', 'nystroem')
+
+    Trả về:
+        dict: Một hàng của bảng kết quả (các khóa trong RESULT_COLUMNS)
+    """
+    start = time.perf_counter()
+    row = dict.fromkeys(RESULT_COLUMNS, np.nan)
+    row.update(path=path, error='')
+    try:
+        samples, sample_rate = read_wav_memmap(path)
+        if sample_rate != SAMPLE_RATE:
+            raise ValueError(f"Tần số lấy mẫu {sample_rate} Hz, cần {SAMPLE_RATE} Hz")
+        features = extract_features(samples, cache=cache or _worker_cache)
+        X, y = create_training_data(features)
+        row.update(duration_s=len(samples) / sample_rate, n_frames=len(features),
+                   n_windows=len(X), speech_ratio=float(np.mean(y)))
+
+        models = models or _worker_models
+        if models is not None:
+            hmm_custom, hmm_lib, svm = models
+        else:
+            hmm_custom, hmm_lib, svm = ModelFactory.create_models(svm_backend or _worker_svm_backend)
+            train_size = int(0.8 * len(X))
+            hmm_custom.fit(X[:train_size])
+            hmm_lib.fit(X[:train_size])
+            svm.fit(X[:train_size], y[:train_size])
+
+        for name, model in [('hmm_custom', hmm_custom), ('hmm_lib', hmm_lib), ('svm', svm)]:
+            y_pred = model.predict(X)
+            row[f'{name}_speech_ratio'] = float(np.mean(y_pred))
+            row[f'{name}_accuracy'] = float(np.mean(y_pred == y))
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+    row['seconds'] = time.perf_counter() - start
+    return row
+
+def _init_worker(cache_dir, model_dir, svm_backend='svc'):
+    """
+    Khởi tạo worker: chỉ dùng một luồng BLAS để thông lượng tăng gần tuyến tính theo số lõi,
+    mở bộ nhớ đệm đặc trưng và nạp mô hình một lần cho cả tiến trình
+    """
+    global _worker_cache, _worker_models, _worker_svm_backend
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+    _worker_svm_backend = svm_backend
+    if cache_dir:
+        from feature_cache import FeatureCache
+        _worker_cache = FeatureCache(cache_dir)
+    if model_dir:
+        _worker_models = load_models(model_dir)[:3]
+
+def run_batch(paths, workers=None, max_in_flight=None, cache_dir=None, model_dir=None,
+              progress=None, svm_backend='svc'):
+    """
+    Xử lý nhiều file song song trên một process pool, giới hạn số tác vụ đang chờ
+
+    Tham số:
+        paths (list): Danh sách file WAV
+        workers (int): Số tiến trình (mặc định bằng số lõi CPU)
+        max_in_flight (int): Số tác vụ tối đa đã gửi nhưng chưa xong (mặc định 2 * workers)
+        cache_dir (str): Thư mục bộ nhớ đệm đặc trưng (FeatureCache), None để tắt
+        model_dir (str): Thư mục mô hình đã lưu (save_models); None để huấn luyện trên từng file
+        progress (callable): Hàm gọi lại progress(số_file_đã_xong, tổng_số_file)
+        svm_backend (str): Loại SVM khi huấn luyện trên từng file ('svc', 'rff', 'nystroem')
+
+    Trả về:
+        dict: Bảng kết quả dạng cột {tên_cột: np.array}, theo thứ tự của paths
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    rows = [None] * len(paths)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache_dir, model_dir, svm_backend)) as pool:
+        pending = {}
+        next_index = 0
+        done_count = 0
+        while next_index < len(paths) or pending:
+            # Chỉ gửi thêm tác vụ khi số tác vụ đang chờ còn dưới giới hạn
+            while next_index < len(paths) and len(pending) < max_in_flight:
+                future = pool.submit(process_file, paths[next_index])
+                pending[future] = next_index
+                next_index += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rows[pending.pop(future)] = future.result()
+                done_count += 1
+            if progress is not None:
+                progress(done_count, len(paths))
+
+    return {name: np.array([row[name] for row in rows]) for name in RESULT_COLUMNS}
+
+def save_results(columns, output):
+    """
+    Ghi bảng kết quả ra một file duy nhất: .npz (mỗi cột một mảng) hoặc .csv
+    """
+    if output.endswith('.csv'):
+        with open(output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(RESULT_COLUMNS)
+            writer.writerows(zip(*(columns[name] for name in RESULT_COLUMNS)))
+    else:
+        np.savez(output, **columns)
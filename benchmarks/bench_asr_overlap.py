@@ -0,0 +1,73 @@
+"""
+So sánh độ trễ mỗi bản ghi khi nhận dạng giọng nói chạy tuần tự với pipeline ML
+và khi chạy song song (Transcription trên thread pool), dùng bộ nhận dạng offline
+với độ trễ giả lập nên không cần mạng.
+
+Chạy từ thư mục gốc của dự án:
+    python -m benchmarks.bench_asr_overlap --seconds 5 --asr-delay 0.2 0.5 1.0
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_utils import extract_features, to_audio_data
+from data_utils import create_training_data
+from models import ModelFactory
+from recognizers import OfflineRecognizer, Transcription
+from benchmarks.synthetic import synthetic_speech
+
+def ml_pipeline(audio):
+    """
+    Trích xuất đặc trưng, huấn luyện và dự đoán với cả ba mô hình như một lượt của main
+    """
+    X, y = create_training_data(extract_features(audio))
+    train_size = int(0.8 * len(X))
+    hmm_custom, hmm_lib, svm = ModelFactory.create_models()
+    hmm_custom.fit(X[:train_size])
+    hmm_lib.fit(X[:train_size])
+    svm.fit(X[:train_size], y[:train_size])
+    for model in (hmm_custom, hmm_lib, svm):
+        model.predict(X[train_size:])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chạy song song ASR và pipeline ML")
+    parser.add_argument('--seconds', type=float, default=5.0, help="Độ dài bản ghi (giây)")
+    parser.add_argument('--asr-delay', type=float, nargs='+', default=[0.2, 0.5, 1.0],
+                        help="Độ trễ giả lập của bộ nhận dạng (giây)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    audio = synthetic_speech(args.seconds)
+    audio_data = to_audio_data((audio * 32767).astype('int16'))
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='asr')
+    ml_pipeline(audio)  # Khởi động trước (nạp thư viện, tạo plan MFCC)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        ml_pipeline(audio)
+    ml_s = (time.perf_counter() - start) / args.repeat
+
+    print(f"Pipeline ML: {ml_s * 1000:.1f} ms cho {args.seconds:g} s âm thanh")
+    print(f"{'Độ trễ ASR (ms)':>16}{'Tuần tự (ms)':>16}{'Song song (ms)':>16}{'max(ASR, ML)':>16}")
+    for delay in args.asr_delay:
+        recognizer = OfflineRecognizer(delay=delay)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            recognizer.recognize(audio_data)
+            ml_pipeline(audio)
+        sequential = (time.perf_counter() - start) / args.repeat
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            transcription = Transcription(executor, recognizer, audio_data)
+            ml_pipeline(audio)
+            transcription.result()
+        concurrent = (time.perf_counter() - start) / args.repeat
+
+        print(f"{delay * 1000:>16.0f}{sequential * 1000:>16.1f}{concurrent * 1000:>16.1f}"
+              f"{max(delay, ml_s) * 1000:>16.1f}")
+    executor.shutdown()
+
+if __name__ == "__main__":
+    main()
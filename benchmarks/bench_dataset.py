@@ -0,0 +1,62 @@
+"""
+Đo thông lượng của bộ sinh dữ liệu giả lập (dataset.iter_synthetic_batches) theo số worker,
+kiểm tra dữ liệu sinh ra giống hệt nhau với mọi số worker, rồi huấn luyện ApproxKernelSVM
+trực tiếp trên luồng lô (fit_stream) với bộ nhớ giới hạn.
+
+Chạy từ thư mục gốc của dự án:
+    python -m benchmarks.bench_dataset --samples 20000 --batch-size 1000 --workers 1 2 4 8
+"""
+import argparse
+import resource
+import time
+
+import numpy as np
+
+from dataset import iter_synthetic_batches
+from data_utils import prepare_data
+from models import ApproxKernelSVM
+
+def peak_rss_mb():
+    """
+    Bộ nhớ tối đa (MB) của tiến trình này và của tiến trình con lớn nhất (Linux: ru_maxrss tính bằng KB)
+    """
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bộ sinh dữ liệu giả lập song song")
+    parser.add_argument('--samples', type=int, default=20000, help="Số đoạn âm thanh")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Số đoạn mỗi lô")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="Các số worker cần đo")
+    parser.add_argument('--durations', type=float, nargs='+', default=[1.0, 2.0, 3.0],
+                        help="Các độ dài đoạn có thể chọn (giây)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    options = dict(batch_size=args.batch_size, seed=args.seed, durations=tuple(args.durations))
+    print(f"{args.samples} đoạn, lô {args.batch_size}, độ dài {args.durations} s")
+    print(f"{'Worker':>8}{'Thời gian (s)':>16}{'Mẫu/s':>10}{'Tăng tốc':>10}{'Giống lô 1 worker':>20}")
+    reference, base = None, None
+    for workers in args.workers:
+        checksum = []
+        start = time.perf_counter()
+        for X, _ in iter_synthetic_batches(args.samples, workers=workers, **options):
+            checksum.append(X.sum(dtype=np.float64))
+        elapsed = time.perf_counter() - start
+        reference = reference if reference is not None else checksum
+        base = base or elapsed
+        print(f"{workers:>8}{elapsed:>16.2f}{args.samples / elapsed:>10.0f}{base / elapsed:>9.2f}x"
+              f"{str(checksum == reference):>20}")
+
+    # Huấn luyện trực tiếp trên luồng lô: chỉ vài lô nằm trong bộ nhớ tại mỗi thời điểm
+    start = time.perf_counter()
+    svm = ApproxKernelSVM().fit_stream(iter_synthetic_batches(args.samples, workers=max(args.workers),
+                                                              **options))
+    elapsed = time.perf_counter() - start
+    X_test, y_test = prepare_data(seed=args.seed + 1, n_samples=2000)
+    main_mb, child_mb = peak_rss_mb()
+    print(f"ApproxKernelSVM.fit_stream: {elapsed:.2f} s, accuracy {np.mean(svm.predict(X_test) == y_test):.3f}, "
+          f"bộ nhớ tối đa {main_mb:.0f} MB (worker {child_mb:.0f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Đo lợi ích của cổng năng lượng/ZCR (gate.py) đặt trước MFCC và các mô hình: tỷ lệ khung
+bị bỏ qua, thời gian trích xuất đặc trưng + suy luận, và độ chính xác của từng mô hình so với
+đường xử lý đầy đủ, với nhiều mức margin_db.
+
+Nhãn tham chiếu là nhãn năng lượng (create_training_data) của đặc trưng không qua cổng,
+nên độ lệch accuracy chỉ phản ánh những gì cổng làm thay đổi.
+
+Chạy từ thư mục gốc của dự án:
+    python -m benchmarks.bench_gate --seconds 60 --margins 3 6 10 --repeat 3
+"""
+import argparse
+import time
+
+import numpy as np
+
+from audio_utils import extract_features
+from data_utils import create_training_data, MODEL_NAMES
+from gate import EnergyGate, extract_gated_features, active_windows, cascade_predict
+from models import ModelFactory
+from benchmarks.synthetic import synthetic_speech
+
+def best_time(func, repeat):
+    """
+    Thời gian chạy nhỏ nhất (giây) sau repeat lần
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def train(audio, svm_backend):
+    """
+    Huấn luyện ba mô hình trên đặc trưng không qua cổng, như chế độ tương tác làm ở bản ghi
+    đầu tiên trước khi cổng được bật
+    """
+    X, y = create_training_data(extract_features(audio))
+    models = ModelFactory.create_models(svm_backend)
+    hmm_custom, hmm_lib, svm = models
+    hmm_custom.fit(X)
+    hmm_lib.fit(X)
+    svm.fit(X, y)
+    return models
+
+def ungated(models, audio):
+    X, _ = create_training_data(extract_features(audio))
+    return tuple(model.predict(X) for model in models)
+
+def gated(models, audio, gate):
+    features, keep = extract_gated_features(audio, gate)
+    X, _ = create_training_data(features)
+    return cascade_predict(models, X, active_windows(keep)), keep
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cổng năng lượng/ZCR trước MFCC và mô hình")
+    parser.add_argument('--seconds', type=float, default=60.0, help="Độ dài tín hiệu đo (giây)")
+    parser.add_argument('--margins', type=float, nargs='+', default=[3.0, 6.0, 10.0],
+                        help="Các giá trị margin_db cần đo")
+    parser.add_argument('--zcr', type=float, default=0.7, help="Ngưỡng ZCR của cổng")
+    parser.add_argument('--svm-backend', choices=['svc', 'rff', 'nystroem'], default='svc')
+    parser.add_argument('--repeat', type=int, default=3, help="Số lần lặp lại mỗi phép đo")
+    args = parser.parse_args()
+
+    audio = synthetic_speech(args.seconds, seed=1)
+    models = train(audio, args.svm_backend)
+    _, y_true = create_training_data(extract_features(audio))
+
+    t_full, full = best_time(lambda: ungated(models, audio), args.repeat)
+    full_accuracy = [np.mean(pred == y_true) for pred in full]
+
+    print(f"Tín hiệu {args.seconds:g} s, {len(y_true)} cửa sổ, {np.mean(y_true):.1%} có tiếng nói")
+    header = "".join(f"{name:>18}" for name in MODEL_NAMES)
+    print(f"{'Cấu hình':<18}{'Bỏ qua':>8}{'Thời gian (ms)':>16}{'Tăng tốc':>10}{header}")
+    print(f"{'không cổng':<18}{'0.0%':>8}{t_full * 1000:>16.1f}{1.0:>9.2f}x"
+          + "".join(f"{acc:>18.3f}" for acc in full_accuracy))
+    for margin in args.margins:
+        gate = EnergyGate(margin_db=margin, zcr_max=args.zcr)
+        t_gate, (preds, keep) = best_time(lambda: gated(models, audio, gate), args.repeat)
+        deltas = [np.mean(pred == y_true) - acc for pred, acc in zip(preds, full_accuracy)]
+        print(f"{f'margin {margin:g} dB':<18}{1 - keep.mean():>8.1%}{t_gate * 1000:>16.1f}"
+              f"{t_full / t_gate:>9.2f}x" + "".join(f"{delta:>+18.3f}" for delta in deltas))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+So sánh tốc độ trích xuất MFCC giữa python_speech_features và mfcc_engine
+trên khối lượng công việc cỡ prepare_data (100 đoạn âm thanh 2 giây, 16 kHz).
+
+Chạy từ thư mục gốc của dự án:
+    python -m benchmarks.bench_mfcc --clips 100 --seconds 2 --repeat 5
+"""
+import argparse
+import time
+
+import numpy as np
+from python_speech_features import mfcc as reference_mfcc
+
+from mfcc_engine import get_plan
+
+SAMPLE_RATE = 16000
+
+def best_time(func, repeat):
+    """
+    Thời gian chạy nhỏ nhất (giây) sau repeat lần
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trích xuất MFCC")
+    parser.add_argument('--clips', type=int, default=100, help="Số đoạn âm thanh")
+    parser.add_argument('--seconds', type=float, default=2.0, help="Độ dài mỗi đoạn (giây)")
+    parser.add_argument('--repeat', type=int, default=5, help="Số lần lặp lại mỗi phép đo")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    audio = rng.standard_normal((args.clips, int(SAMPLE_RATE * args.seconds)))
+    plan = get_plan(SAMPLE_RATE, nfft=512, nfilt=26, numcep=13)
+
+    t_ref, ref = best_time(lambda: np.array([
+        reference_mfcc(clip, samplerate=SAMPLE_RATE, numcep=13, nfilt=26, nfft=512)
+        for clip in audio]), args.repeat)
+    t_loop, loop = best_time(lambda: np.array([plan.compute(clip) for clip in audio]), args.repeat)
+    t_batch, batch = best_time(lambda: plan.compute(audio), args.repeat)
+
+    print(f"Khối lượng: {args.clips} đoạn x {args.seconds:g} s, {ref.shape[1]} khung/đoạn")
+    print(f"{'Phương pháp':<32}{'Thời gian (ms)':>16}{'Tăng tốc':>10}")
+    for name, t in [('python_speech_features (từng đoạn)', t_ref),
+                    ('mfcc_engine (từng đoạn)', t_loop),
+                    ('mfcc_engine (cả lô 2D)', t_batch)]:
+        print(f"{name:<32}{t * 1000:>16.1f}{t_ref / t:>9.2f}x")
+    print(f"Sai lệch tuyệt đối lớn nhất: từng đoạn {np.abs(loop - ref).max():.2e}, "
+          f"cả lô {np.abs(batch - ref).max():.2e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+So sánh pipeline float64 và float32 (extract_features -> create_training_data -> ba mô hình)
+trên các bản ghi tổng hợp: bộ nhớ tối đa (tracemalloc) của từng bước, số lần cấp phát bộ đệm
+làm việc, thời gian và độ lệch accuracy / tỷ lệ dự đoán khác nhau giữa hai chế độ.
+
+Chạy từ thư mục gốc của dự án:
+    python -m benchmarks.bench_precision --seconds 10 --recordings 5
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from audio_utils import extract_features
+from data_utils import create_training_data, MODEL_NAMES
+from models import ModelFactory
+from instrumentation import instrumentation
+from benchmarks.synthetic import synthetic_speech
+
+def traced(func):
+    """
+    Chạy func, trả về (kết quả, bộ nhớ tối đa được cấp phát thêm (MB), thời gian (s))
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak / 1e6, elapsed
+
+def run_pipeline(audio, dtype, svm_backend):
+    """
+    Một bản ghi như chế độ tương tác: huấn luyện trên 80% đầu, dự đoán 20% còn lại
+
+    Trả về:
+        tuple: (y_test, [dự đoán của từng mô hình], {bước: (MB, giây)})
+    """
+    stages = {}
+    features, *stages['extract_features'] = traced(lambda: extract_features(audio, dtype=dtype))
+    (X, y), *stages['create_training_data'] = traced(lambda: create_training_data(features, dtype=dtype))
+    train_size = int(0.8 * len(X))
+
+    def models():
+        hmm_custom, hmm_lib, svm = ModelFactory.create_models(svm_backend, dtype=dtype)
+        hmm_custom.fit(X[:train_size])
+        hmm_lib.fit(X[:train_size])
+        svm.fit(X[:train_size], y[:train_size])
+        return [model.predict(X[train_size:]) for model in (hmm_custom, hmm_lib, svm)]
+    y_preds, *stages['models'] = traced(models)
+    return y[train_size:], y_preds, stages
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline float32 so với float64")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Độ dài mỗi bản ghi (giây)")
+    parser.add_argument('--recordings', type=int, default=5, help="Số bản ghi")
+    parser.add_argument('--svm-backend', choices=['svc', 'rff', 'nystroem'], default='svc')
+    args = parser.parse_args()
+
+    recordings = [synthetic_speech(args.seconds, seed=seed) for seed in range(args.recordings)]
+    # Lượt chạy khởi động: nạp scikit-learn/hmmlearn/scipy.fft trước khi đo
+    run_pipeline(synthetic_speech(1.0, seed=100), np.float32, args.svm_backend)
+    results = {}
+    for dtype in (np.float64, np.float32):
+        allocations = instrumentation.counters.get('workspace.allocations', 0)
+        runs = []
+        for seed, audio in enumerate(recordings):
+            # Cùng khởi tạo ngẫu nhiên của HMM thư viện cho cả hai chế độ
+            np.random.seed(seed)
+            runs.append(run_pipeline(audio, dtype, args.svm_backend))
+        allocations = instrumentation.counters.get('workspace.allocations', 0) - allocations
+        results[dtype] = runs, allocations
+
+    print(f"{args.recordings} bản ghi x {args.seconds:g} s")
+    print(f"{'Bước':<24}{'float64 (MB)':>14}{'float32 (MB)':>14}{'Tỷ lệ':>8}{'float64 (ms)':>14}{'float32 (ms)':>14}")
+    for stage in ('extract_features', 'create_training_data', 'models'):
+        (mb64, t64), (mb32, t32) = [
+            np.mean([stages[stage] for _, _, stages in results[dtype][0]], axis=0)
+            for dtype in (np.float64, np.float32)]
+        print(f"{stage:<24}{mb64:>14.2f}{mb32:>14.2f}{mb32 / mb64:>8.2f}{t64 * 1000:>14.1f}{t32 * 1000:>14.1f}")
+    print("Số lần cấp phát bộ đệm làm việc: " + ", ".join(
+        f"{np.dtype(dtype).name} {results[dtype][1]}" for dtype in results))
+
+    print(f"{'Mô hình':<18}{'Accuracy float64':>18}{'Accuracy float32':>18}{'Độ lệch':>10}{'Dự đoán khác':>14}")
+    runs64, runs32 = results[np.float64][0], results[np.float32][0]
+    for i, name in enumerate(MODEL_NAMES):
+        acc64 = np.mean([np.mean(preds[i] == y) for y, preds, _ in runs64])
+        acc32 = np.mean([np.mean(preds[i] == y) for y, preds, _ in runs32])
+        differ = np.mean([np.mean(a[1][i] != b[1][i]) for a, b in zip(runs64, runs32)])
+        print(f"{name:<18}{acc64:>18.3f}{acc32:>18.3f}{acc32 - acc64:>+10.3f}{differ:>13.1%}")
+
+if __name__ == "__main__":
+    main()
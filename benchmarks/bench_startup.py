@@ -0,0 +1,77 @@
+"""
+Đo thời gian khởi động (cold start) bằng python -X importtime: thời gian import các module
+của dự án so với import trực tiếp các thư viện nặng như trước khi chuyển sang nạp trễ,
+và kiểm tra các thư viện âm thanh / giao diện nào bị nạp ở mỗi chế độ.
+
+Chạy từ thư mục gốc của dự án:
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+# Các thư viện mà main.py từng import ngay khi khởi động
+EAGER_IMPORTS = ['sklearn.svm', 'sklearn.linear_model', 'sklearn.kernel_approximation',
+                 'sklearn.model_selection', 'hmmlearn.hmm', 'matplotlib.pyplot',
+                 'speech_recognition', 'keyboard', 'sounddevice']
+
+# Các trường hợp đo: tên -> mã Python chạy trong tiến trình con
+TARGETS = {
+    'import main': 'import main',
+    'import batch (hàng loạt)': 'import batch',
+    'import streaming (luồng)': 'import streaming',
+    'nạp ngay các thư viện (cách cũ)': '\n'.join(
+        f"try:\n    import {name}\nexcept Exception:\n    pass" for name in EAGER_IMPORTS),
+}
+
+# In ra các thư viện nặng đã nạp sau khi chạy mã đo
+REPORT = """
+import json, sys
+print(json.dumps(sorted(n for n in %r if n in sys.modules)))
+""" % (EAGER_IMPORTS,)
+
+def import_time(code):
+    """
+    Chạy code trong một tiến trình Python mới với -X importtime
+
+    Trả về:
+        tuple: (tổng thời gian import (giây), thời gian chạy tiến trình (giây), các thư viện nặng đã nạp)
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code + REPORT],
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Chỉ cộng các module cấp cao nhất (tên không thụt lề) để không đếm trùng
+        if not name.startswith('  '):
+            total_us += int(cumulative)
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return total_us / 1e6, wall, loaded
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark thời gian khởi động")
+    parser.add_argument('--repeat', type=int, default=5, help="Số lần đo, lấy giá trị nhỏ nhất")
+    args = parser.parse_args()
+
+    print(f"{'Trường hợp':<34}{'Import (ms)':>12}{'Tiến trình (ms)':>17}  Thư viện nặng đã nạp")
+    for name, code in TARGETS.items():
+        try:
+            runs = [import_time(code) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{name:<34}lỗi: {e}")
+            continue
+        imports = min(r[0] for r in runs)
+        wall = min(r[1] for r in runs)
+        print(f"{name:<34}{imports * 1000:>12.1f}{wall * 1000:>17.1f}  {', '.join(runs[0][2]) or '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+So sánh SVC (kernel RBF chính xác) với ApproxKernelSVM (RFF / Nystroem + SGD) theo
+kích thước tập huấn luyện: thời gian huấn luyện, độ trễ dự đoán và độ chính xác.
+
+Chạy từ thư mục gốc của dự án:
+    python -m benchmarks.bench_svm --seconds 60 300 1200 --svc-limit 20000
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.svm import SVC
+
+from audio_utils import extract_features
+from data_utils import create_training_data
+from models import ApproxKernelSVM
+from benchmarks.synthetic import synthetic_speech
+
+def build_dataset(seconds, seed):
+    """
+    Tạo dữ liệu theo cửa sổ từ âm thanh tổng hợp, chia 80% huấn luyện / 20% kiểm tra
+    """
+    X, y = create_training_data(extract_features(synthetic_speech(seconds, seed=seed)))
+    split = int(0.8 * len(X))
+    return X[:split], y[:split], X[split:], y[split:]
+
+def measure(model, X_train, y_train, X_test, y_test):
+    """
+    Đo thời gian huấn luyện, độ trễ dự đoán trên 1000 mẫu và độ chính xác
+    """
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = model.predict(X_test)
+    predict_ms = (time.perf_counter() - start) * 1000 * 1000 / max(len(X_test), 1)
+    return fit_s, predict_ms, float(np.mean(y_pred == y_test))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SVM chính xác và xấp xỉ")
+    parser.add_argument('--seconds', type=float, nargs='+', default=[60, 300, 1200],
+                        help="Độ dài âm thanh tổng hợp của từng kích thước dữ liệu (giây)")
+    parser.add_argument('--svc-limit', type=int, default=20000,
+                        help="Bỏ qua SVC khi tập huấn luyện lớn hơn số mẫu này")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'Mẫu':>8} {'Mô hình':<10}{'Huấn luyện (s)':>16}{'Dự đoán (ms/1k)':>18}{'Chính xác':>11}")
+    for seconds in args.seconds:
+        X_train, y_train, X_test, y_test = build_dataset(seconds, args.seed)
+        models = [('rff', ApproxKernelSVM(method='rff')),
+                  ('nystroem', ApproxKernelSVM(method='nystroem'))]
+        if len(X_train) <= args.svc_limit:
+            models.insert(0, ('svc', SVC(kernel='rbf', random_state=42)))
+        for name, model in models:
+            fit_s, predict_ms, accuracy = measure(model, X_train, y_train, X_test, y_test)
+            print(f"{len(X_train):>8} {name:<10}{fit_s:>16.2f}{predict_ms:>18.2f}{accuracy:>11.4f}")
+        if len(X_train) > args.svc_limit:
+            print(f"{len(X_train):>8} {'svc':<10}{'(bỏ qua, vượt --svc-limit)':>45}")
+
+if __name__ == "__main__":
+    main()
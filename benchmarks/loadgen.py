@@ -0,0 +1,122 @@
+"""
+Bộ sinh tải cho server suy luận (server.py): mở nhiều phiên đồng thời, mỗi phiên phát lại
+một file WAV theo từng khối, đo thông lượng và độ trễ (p50, p99) từ lúc gửi khối đến lúc
+nhận kết quả.
+
+Chạy server trước, rồi chạy từ thư mục gốc của dự án:
+    python main.py --serve 127.0.0.1:8765 --max-batch 256 --max-wait-ms 5
+    python -m benchmarks.loadgen recordings/*.wav --clients 32 --chunk-ms 100 --realtime
+
+Không có file WAV thì dùng âm thanh tổng hợp (--seconds).
+"""
+import argparse
+import asyncio
+import json
+import time
+import wave
+
+import numpy as np
+
+from audio_utils import SAMPLE_RATE
+from server import AUDIO, END, STATS, encode_message
+from benchmarks.synthetic import synthetic_speech
+
+def read_pcm(path):
+    """
+    Đọc file WAV mono 16-bit thành bytes PCM
+    """
+    with wave.open(path, 'rb') as wf:
+        if wf.getsampwidth() != 2 or wf.getnchannels() != 1 or wf.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{path}: cần WAV mono 16-bit {SAMPLE_RATE} Hz")
+        return wf.readframes(wf.getnframes())
+
+async def run_client(host, port, pcm, chunk_bytes, realtime, latencies):
+    """
+    Một phiên: gửi lần lượt các khối (theo nhịp thời gian thực nếu realtime) và đọc
+    kết quả song song, ghi lại độ trễ của từng khối
+
+    Trả về:
+        int: Số cửa sổ đã nhận kết quả
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    chunks = [pcm[i:i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+    sent_at = []
+
+    async def send():
+        start = time.perf_counter()
+        for i, chunk in enumerate(chunks):
+            if realtime:
+                delay = start + i * chunk_bytes / (2 * SAMPLE_RATE) - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            sent_at.append(time.perf_counter())
+            writer.write(encode_message(AUDIO, chunk))
+            await writer.drain()
+
+    async def receive():
+        n_windows = 0
+        for _ in chunks:
+            reply = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent_at[reply['seq']])
+            n_windows += len(reply['labels'][0])
+        return n_windows
+
+    _, n_windows = await asyncio.gather(send(), receive())
+    writer.write(encode_message(END))
+    await writer.drain()
+    writer.close()
+    return n_windows
+
+async def server_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(encode_message(STATS))
+    stats = json.loads(await reader.readline())
+    writer.write(encode_message(END))
+    writer.close()
+    return stats
+
+async def run(args, recordings):
+    latencies = []
+    chunk_bytes = 2 * int(SAMPLE_RATE * args.chunk_ms / 1000)
+    before = await server_stats(args.host, args.port)
+    start = time.perf_counter()
+    n_windows = await asyncio.gather(*(
+        run_client(args.host, args.port, recordings[i % len(recordings)], chunk_bytes,
+                   args.realtime, latencies)
+        for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    after = await server_stats(args.host, args.port)
+
+    audio_seconds = sum(len(recordings[i % len(recordings)]) for i in range(args.clients)) / (2 * SAMPLE_RATE)
+    latencies = np.array(latencies) * 1000
+    n_batches = after['n_batches'] - before['n_batches']
+    batch_windows = after['n_windows'] - before['n_windows']
+    print(f"{args.clients} phiên, {audio_seconds:.1f} s âm thanh trong {elapsed:.2f} s "
+          f"({audio_seconds / elapsed:.1f}x thời gian thực, {sum(n_windows) / elapsed:.0f} cửa sổ/s)")
+    print(f"Độ trễ mỗi khối {args.chunk_ms:g} ms: p50 {np.percentile(latencies, 50):.1f} ms, "
+          f"p99 {np.percentile(latencies, 99):.1f} ms, max {latencies.max():.1f} ms")
+    if n_batches:
+        print(f"Server: {n_batches} lô, trung bình {batch_windows / n_batches:.1f} cửa sổ/lô "
+              f"(lô tối đa {after['max_batch']}, chờ tối đa {after['max_wait'] * 1000:g} ms)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Sinh tải cho server suy luận nhiều phiên")
+    parser.add_argument('wavs', nargs='*', help="Các file WAV mono 16-bit để phát lại")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=16, help="Số phiên đồng thời")
+    parser.add_argument('--chunk-ms', type=float, default=100.0, help="Độ dài mỗi khối gửi đi (ms)")
+    parser.add_argument('--realtime', action='store_true', help="Gửi theo nhịp thời gian thực")
+    parser.add_argument('--seconds', type=float, default=10.0,
+                        help="Độ dài âm thanh tổng hợp khi không có file WAV")
+    args = parser.parse_args()
+
+    if args.wavs:
+        recordings = [read_pcm(path) for path in args.wavs]
+    else:
+        recordings = [(synthetic_speech(args.seconds, seed=seed) * 32767).astype('<i2').tobytes()
+                      for seed in range(4)]
+    asyncio.run(run(args, recordings))
+
+if __name__ == "__main__":
+    main()
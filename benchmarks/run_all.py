@@ -0,0 +1,231 @@
+"""
+Benchmark toàn bộ pipeline trên âm thanh tổng hợp có seed cố định, không cần microphone
+hay màn hình. Với mỗi độ dài âm thanh, đo thời gian và bộ nhớ đỉnh (tracemalloc) của từng
+bước: extract_features, create_training_data, CustomHMM.fit/predict, GaussianHMM.fit,
+SVC.fit/predict, evaluate_models, plot_results và save_to_text.
+
+Kết quả được ghi ra JSON kèm mã commit git để so sánh giữa các phiên bản.
+
+Chạy từ thư mục gốc của dự án:
+    python -m benchmarks.run_all --seconds 1 10 60 600 --output bench.json
+    python -m benchmarks.run_all --compare bench_old.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+import matplotlib
+matplotlib.use('Agg')  # Vẽ không cần màn hình
+
+import numpy as np
+
+from audio_utils import extract_features
+from data_utils import create_training_data, evaluate_models, save_to_text
+from models import ModelFactory
+from visualization import plot_results
+from results_store import ResultsStore, ResultRecord
+from benchmarks.synthetic import synthetic_speech
+
+def git_revision():
+    """
+    Mã commit hiện tại và trạng thái có thay đổi chưa commit hay không
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+def measure(func, repeat=1, memory=True, setup=None):
+    """
+    Đo một bước: thời gian nhỏ nhất sau repeat lần (không bật tracemalloc để không làm sai lệch
+    thời gian), sau đó chạy thêm một lần dưới tracemalloc để lấy bộ nhớ đỉnh
+
+    Tham số:
+        setup (callable): Nếu có, được gọi trước mỗi lần chạy (ngoài phần đo) và kết quả được
+                          truyền cho func, ví dụ để mỗi lần fit dùng một mô hình mới chưa huấn luyện
+
+    Trả về:
+        tuple: (kết quả của func, dict {'seconds', 'peak_bytes'})
+    """
+    times = []
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    record = {'seconds': min(times)}
+
+    if memory:
+        args = (setup(),) if setup else ()
+        tracemalloc.start()
+        try:
+            func(*args)
+            record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, record
+
+def run_duration(seconds, seed, repeat, memory, svc_limit, workdir):
+    """
+    Chạy toàn bộ pipeline trên một đoạn âm thanh tổng hợp dài seconds giây
+
+    Trả về:
+        dict: Thông tin dữ liệu và kết quả đo của từng bước
+    """
+    # Nhiễu của create_training_data và khởi tạo HMM dùng np.random toàn cục
+    np.random.seed(seed)
+    audio = synthetic_speech(seconds, seed=seed)
+    stages = {}
+
+    def stage(name, func, setup=None):
+        result, stages[name] = measure(func, repeat, memory, setup)
+        return result
+
+    def untrained(i):
+        """
+        setup cho bước fit: mô hình thứ i mới, chưa huấn luyện, cùng khởi tạo ngẫu nhiên mỗi lần
+        """
+        def setup():
+            np.random.seed(seed)
+            return ModelFactory.create_models()[i]
+        return setup
+
+    features = stage('extract_features', lambda: extract_features(audio))
+    X, y = stage('create_training_data', lambda: create_training_data(features))
+    train_size = int(0.8 * len(X))
+    X_train, X_test = X[:train_size], X[train_size:]
+    y_train, y_test = y[:train_size], y[train_size:]
+
+    # Mô hình được tạo ngoài phần đo (lần gọi đầu nạp scikit-learn/hmmlearn), chỉ đo fit
+    hmm_custom = stage('CustomHMM.fit', lambda model: model.fit(X_train), untrained(0))
+    y_pred1 = stage('CustomHMM.predict', lambda: hmm_custom.predict(X_test))
+    hmm_lib = stage('GaussianHMM.fit', lambda model: model.fit(X_train), untrained(1))
+    y_pred2 = hmm_lib.predict(X_test)
+
+    # SVC có độ phức tạp bậc hai đến bậc ba theo số mẫu: bỏ qua khi dữ liệu quá lớn
+    if len(X_train) <= svc_limit:
+        svm = stage('SVC.fit', lambda model: model.fit(X_train, y_train), untrained(2))
+        y_pred3 = stage('SVC.predict', lambda: svm.predict(X_test))
+    else:
+        reason = f"{len(X_train)} mẫu vượt --svc-limit {svc_limit}"
+        stages['SVC.fit'] = stages['SVC.predict'] = {'skipped': reason}
+        y_pred3 = np.zeros_like(y_test)
+
+    # Ẩn phần in kết quả và cảnh báo độ đo không xác định (khi SVC bị bỏ qua)
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        metrics = stage('evaluate_models', lambda: evaluate_models(y_test, y_pred1, y_pred2, y_pred3))
+
+        # plot_results ghi vào thư mục plots/ tương đối: chạy trong thư mục tạm
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            stage('plot_results', lambda: plot_results(metrics, f'bench_{seconds:g}s'))
+        finally:
+            os.chdir(cwd)
+
+        predictions = [y_pred1[:1], y_pred2[:1], y_pred3[:1]]
+        stage('save_to_text', lambda: save_to_text(
+            'benchmark', 'văn bản mẫu', predictions, filename=os.path.join(workdir, 'speech_output.txt')))
+        record = ResultRecord(time='2000-01-01T00:00:00', transcript='văn bản mẫu', models=['a', 'b', 'c'],
+                              predictions=[int(p[0]) for p in predictions], metrics=metrics)
+        stage('results_store.append', lambda: _append_records(os.path.join(workdir, 'results'), record))
+
+    return {
+        'audio_seconds': seconds,
+        'n_frames': int(len(features)),
+        'n_windows': int(len(X)),
+        'stages': stages,
+    }
+
+def _append_records(directory, record, n=100):
+    """
+    Ghi n bản ghi vào kho kết quả (ghi theo lô) để đo chi phí mỗi lượt
+    """
+    with ResultsStore(directory) as store:
+        for _ in range(n):
+            store.append(record)
+
+def compare(current, baseline):
+    """
+    In tỷ lệ thời gian của lần chạy hiện tại so với một file kết quả cũ
+    """
+    old = {r['audio_seconds']: r['stages'] for r in baseline['runs']}
+    print(f"\nSo sánh với commit {str(baseline.get('git_commit'))[:10]} (tỷ lệ thời gian mới / cũ):")
+    for run in current['runs']:
+        previous = old.get(run['audio_seconds'])
+        if previous is None:
+            continue
+        for name, record in run['stages'].items():
+            before = previous.get(name, {})
+            if 'seconds' in record and before.get('seconds'):
+                ratio = record['seconds'] / before['seconds']
+                flag = '  <-- chậm hơn' if ratio > 1.1 else ''
+                print(f"{run['audio_seconds']:>8g}s {name:<22}{ratio:>8.2f}x{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark toàn bộ pipeline trên âm thanh tổng hợp")
+    parser.add_argument('--seconds', type=float, nargs='+', default=[1, 10, 60, 600],
+                        help="Các độ dài âm thanh cần đo (giây)")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Giá trị khởi tạo của âm thanh tổng hợp và của np.random")
+    parser.add_argument('--repeat', type=int, default=3, help="Số lần lặp lại để lấy thời gian nhỏ nhất")
+    parser.add_argument('--no-memory', action='store_true', help="Không đo bộ nhớ đỉnh")
+    parser.add_argument('--svc-limit', type=int, default=20000,
+                        help="Bỏ qua SVC khi tập huấn luyện lớn hơn số mẫu này")
+    parser.add_argument('--output', default=None,
+                        help="File JSON kết quả (mặc định benchmark_<commit>.json)")
+    parser.add_argument('--compare', metavar='JSON', help="File kết quả cũ để so sánh")
+    args = parser.parse_args()
+
+    commit, dirty = git_revision()
+    report = {
+        'git_commit': commit,
+        'git_dirty': dirty,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'runs': [],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for seconds in args.seconds:
+            run = run_duration(seconds, args.seed, args.repeat, not args.no_memory, args.svc_limit, workdir)
+            report['runs'].append(run)
+            print(f"\nÂm thanh {seconds:g} s: {run['n_frames']} khung, {run['n_windows']} cửa sổ")
+            for name, record in run['stages'].items():
+                if 'skipped' in record:
+                    print(f"  {name:<22}bỏ qua ({record['skipped']})")
+                else:
+                    peak = record.get('peak_bytes')
+                    peak_text = f"{peak / 2**20:10.1f} MiB" if peak is not None else ''
+                    print(f"  {name:<22}{record['seconds'] * 1000:12.1f} ms{peak_text}")
+
+    output = args.output or f"benchmark_{(commit or 'unknown')[:10]}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nĐã lưu kết quả vào {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Sinh âm thanh tổng hợp có seed cố định cho các benchmark: xen kẽ các đoạn "tiếng nói"
+(sóng hài điều biên cộng nhiễu) và các đoạn im lặng (nhiễu nền nhỏ).
+"""
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+def synthetic_speech(seconds, seed=0, sample_rate=SAMPLE_RATE, segment_seconds=1.0):
+    """
+    Tạo tín hiệu tổng hợp
+
+    Tham số:
+        seconds (float): Độ dài tín hiệu (giây)
+        seed (int): Giá trị khởi tạo ngẫu nhiên, cùng seed cho cùng tín hiệu
+        sample_rate (int): Tần số lấy mẫu (Hz)
+        segment_seconds (float): Độ dài trung bình mỗi đoạn tiếng nói / im lặng
+
+    Trả về:
+        array: Tín hiệu float32 trong khoảng [-1, 1], shape (số_mẫu,)
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sample_rate)
+    t = np.arange(n, dtype=np.float32) / sample_rate
+
+    # Độ dài các đoạn ngẫu nhiên quanh segment_seconds, đoạn chẵn là tiếng nói
+    n_segments = int(seconds / segment_seconds) + 2
+    boundaries = np.cumsum(rng.uniform(0.5, 1.5, n_segments) * segment_seconds * sample_rate)
+    envelope = (np.searchsorted(boundaries, np.arange(n), side='right') % 2 == 0).astype(np.float32)
+
+    pitch = rng.uniform(120, 260)
+    signal = 0.01 * rng.standard_normal(n, dtype=np.float32)
+    voiced = np.sin(2 * np.pi * pitch * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    voiced += 0.3 * np.sin(2 * np.pi * 3 * pitch * t)
+    signal += envelope * (0.3 * voiced + 0.05 * rng.standard_normal(n, dtype=np.float32))
+    return np.clip(signal, -1, 1)
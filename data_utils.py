@@ -1,27 +1,155 @@
 import numpy as np
 from datetime import datetime
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
-from audio_utils import SAMPLE_RATE, extract_features
+from metrics import compute_metrics
+from results_store import ResultRecord, as_label, format_legacy
+from instrumentation import instrumentation
 
-def prepare_data():
+# Tên các mô hình khi in kết quả đánh giá, theo thứ tự của ModelFactory.create_models
+MODEL_NAMES = ['HMM tự cài đặt', 'HMM thư viện', 'SVM']
+
+# Các phép gộp được hỗ trợ khi tạo đặc trưng theo cửa sổ trượt
+WINDOW_AGGREGATIONS = ('mean', 'std', 'energy')
+
+# Số hàng mỗi lần sinh nhiễu trong create_training_data (mảng tạm float64 nhỏ, cố định)
+NOISE_CHUNK_ROWS = 256
+
+@instrumentation.timed('data.prepare')
+def prepare_data(seed=None, cache=None, n_samples=100, batch_size=1024, workers=1):
     """
     Chuẩn bị dữ liệu huấn luyện (giả lập)
+    
+    Dữ liệu được tạo bởi dataset.iter_synthetic_batches và gom lại thành một mảng. Với
+    tập dữ liệu lớn, dùng trực tiếp iter_synthetic_batches để huấn luyện theo từng lô.
+    
+    Tham số:
+        seed (int): Hạt giống ngẫu nhiên; cố định seed để tạo lại đúng các đoạn âm thanh cũ
+        cache (FeatureCache): Bộ nhớ đệm đặc trưng, dùng lại MFCC khi dữ liệu không đổi
+        n_samples (int): Số đoạn âm thanh (2 giây)
+        batch_size (int): Số đoạn mỗi lô
+        workers (int): Số tiến trình sinh dữ liệu; 1 để chạy ngay trong tiến trình này
+    """
+    from dataset import iter_synthetic_batches
+    batches = list(iter_synthetic_batches(n_samples, batch_size=batch_size, seed=seed, workers=workers,
+                                          cache_dir=cache.directory if cache is not None else None))
+    X = np.vstack([X for X, _ in batches])
+    y = np.concatenate([y for _, y in batches])
+    return X, y
+
+def energy_labels(features, k=0.5):
+    """
+    Gán nhãn từng khung theo năng lượng: khung có năng lượng vượt ngưỡng
+    trung bình + k * độ lệch chuẩn được xem là có tiếng nói
+    
+    Tham số:
+        features (array): Đặc trưng MFCC, shape (số_khung, số_đặc_trưng)
+        k (float): Hệ số của độ lệch chuẩn trong ngưỡng
+        
+    Trả về:
+        array: Nhãn 0/1 cho từng khung
+    """
+    energy = np.sum(np.square(features), axis=1)
+    threshold = np.mean(energy) + k * np.std(energy)
+    return (energy > threshold).astype(int)
+
+def sliding_window_features(features, labels=None, window_size=5, hop=1,
+                            aggregations=('mean',), dtype=np.float64):
+    """
+    Tạo đặc trưng theo cửa sổ trượt trên các khung MFCC mà không lặp Python theo từng cửa sổ.
+    
+    Các cửa sổ được lấy bằng sliding_window_view (không sao chép dữ liệu), các phép gộp
+    được tính vector hóa trên toàn bộ cửa sổ, còn nhãn đa số dùng tổng tích lũy.
+    
+    Các phép gộp hỗ trợ:
+    - 'mean': Trung bình từng đặc trưng trong cửa sổ
+    - 'std': Độ lệch chuẩn từng đặc trưng trong cửa sổ
+    - 'energy': Năng lượng trung bình của các khung trong cửa sổ (một cột)
+    
+    Tham số:
+        features (array): Đặc trưng MFCC, shape (số_khung, số_đặc_trưng)
+        labels (array): Nhãn 0/1 của từng khung, None nếu không cần nhãn
+        window_size (int): Số khung trong mỗi cửa sổ
+        hop (int): Bước nhảy giữa hai cửa sổ liên tiếp
+        aggregations (tuple): Các phép gộp, nối theo thứ tự thành vector đặc trưng
+        dtype: Kiểu dữ liệu của kết quả (np.float32 để giảm một nửa bộ nhớ)
+        
+    Trả về:
+        tuple: (X, y)
+            - X: shape (số_cửa_sổ, số_cột_đặc_trưng)
+            - y: Nhãn của mỗi cửa sổ (1 nếu đa số khung có tiếng nói), None nếu labels là None
     """
-    # Sử dụng độ dài mẫu cố định cho dữ liệu huấn luyện (2 giây)
-    TRAINING_DURATION = 2
-    X = []
-    y = []
-    for i in range(100):
-        audio = np.random.randn(SAMPLE_RATE * TRAINING_DURATION)
-        features = extract_features(audio)
-        # Lấy giá trị trung bình của các đặc trưng
-        features_mean = np.mean(features, axis=0)
-        X.append(features_mean)
-        y.append(i % 2)  # 2 lớp: 0 và 1
-    return np.array(X), np.array(y)
+    for name in aggregations:
+        if name not in WINDOW_AGGREGATIONS:
+            raise ValueError(f"Phép gộp không được hỗ trợ: {name}")
+    
+    features = np.asarray(features, dtype=dtype)
+    n_windows = max(0, (len(features) - window_size) // hop + 1)
+    if n_windows == 0:
+        n_columns = sum(1 if name == 'energy' else features.shape[1] for name in aggregations)
+        return np.zeros((0, n_columns), dtype=dtype), None if labels is None else np.zeros(0, dtype=int)
+    
+    # View (số_cửa_sổ, số_đặc_trưng, window_size) trên dữ liệu gốc
+    windows = np.lib.stride_tricks.sliding_window_view(
+        features, window_size, axis=0)[::hop][:n_windows]
+    
+    columns = []
+    for name in aggregations:
+        if name == 'mean':
+            # Tổng rồi chia tại chỗ: np.mean ở float32 cấp phát thêm mảng tạm lớn hơn kết quả
+            mean = np.add.reduce(windows, axis=-1, dtype=dtype)
+            mean /= window_size
+            columns.append(mean)
+        elif name == 'std':
+            columns.append(windows.std(axis=-1, dtype=dtype))
+        elif name == 'energy':
+            frame_energy = np.sum(np.square(features), axis=1, dtype=dtype)
+            energy_windows = np.lib.stride_tricks.sliding_window_view(
+                frame_energy, window_size)[::hop][:n_windows]
+            columns.append(energy_windows.mean(axis=-1, dtype=dtype)[:, np.newaxis])
+    X = np.concatenate(columns, axis=1) if len(columns) > 1 else columns[0]
+    
+    y = None
+    if labels is not None:
+        # Số khung có tiếng nói trong mỗi cửa sổ bằng hiệu của tổng tích lũy
+        csum = np.concatenate(([0], np.cumsum(labels)))
+        starts = np.arange(n_windows) * hop
+        votes = csum[starts + window_size] - csum[starts]
+        y = (votes > window_size / 2).astype(int)
+    
+    return X, y
 
-def evaluate_models(y_true, y_pred1, y_pred2, y_pred3):
+@instrumentation.timed('data.windows')
+def create_training_data(features, window_size=5, hop=1, aggregations=('mean',), dtype=np.float64):
+    """
+    Tạo dữ liệu huấn luyện từ đặc trưng MFCC thực tế
+    
+    Tham số:
+        features (array): Đặc trưng MFCC, shape (số_khung, số_đặc_trưng)
+        window_size (int): Số khung trong mỗi cửa sổ trượt
+        hop (int): Bước nhảy giữa hai cửa sổ
+        aggregations (tuple): Các phép gộp trên cửa sổ ('mean', 'std', 'energy')
+        dtype: Kiểu dữ liệu của X (np.float32 để giảm một nửa bộ nhớ)
+    """
+    # Gán nhãn dựa trên năng lượng để phân biệt giọng nói và im lặng
+    labels = energy_labels(features)
+    
+    # Sử dụng cửa sổ trượt để tạo mẫu; nhãn là 1 nếu phần lớn khung thời gian có giọng nói
+    X, y = sliding_window_features(features, labels, window_size=window_size, hop=hop,
+                                   aggregations=aggregations, dtype=dtype)
+    
+    # Thêm nhiễu nhỏ để tăng tính đa dạng (theo từng khối hàng: cùng dãy số của np.random như
+    # khi sinh một lần, nhưng không cần mảng tạm float64 cỡ X)
+    for start in range(0, len(X), NOISE_CHUNK_ROWS):
+        rows = X[start:start + NOISE_CHUNK_ROWS]
+        rows += 0.001 * np.random.standard_normal(rows.shape)
+    
+    # Chuẩn hóa dữ liệu (tại chỗ, độ lệch chuẩn tính trên X đã trừ trung bình nên không cần mảng tạm)
+    X -= np.mean(X, axis=0)
+    X /= np.sqrt(np.einsum('ij,ij->j', X, X) / max(len(X), 1)) + 1e-10
+    
+    return X, y
+
+@instrumentation.timed('data.evaluate')
+def evaluate_models(y_true, *y_preds, names=None):
     """
     Đánh giá hiệu suất của các mô hình bằng nhiều độ đo khác nhau.
     
@@ -47,59 +175,41 @@ def evaluate_models(y_true, y_pred1, y_pred2, y_pred3):
        - Tỷ lệ phát hiện đúng các trường hợp dương tính thực
        - Công thức: TP / (TP + FN)
     
+    Ma trận nhầm lẫn của tất cả mô hình được tính trong một lần duyệt (metrics.compute_metrics),
+    sau đó suy ra các độ đo; precision, recall và F1 là trung bình có trọng số theo số mẫu mỗi lớp.
+    
     Tham số:
         y_true (array): Nhãn thực tế
-        y_pred1 (array): Dự đoán của HMM tự cài đặt
-        y_pred2 (array): Dự đoán của HMM thư viện
-        y_pred3 (array): Dự đoán của SVM
+        *y_preds (array): Dự đoán của từng mô hình (mặc định theo thứ tự HMM tự cài đặt,
+                          HMM thư viện, SVM), hoặc một ma trận (số_mô_hình, số_mẫu)
+        names (list): Tên các mô hình khi in kết quả
     
     Trả về:
         dict: Dictionary chứa các độ đo cho từng mô hình
     """
-    metrics = {
-        'accuracy': [],
-        'f1_score': [],
-        'precision': [],
-        'recall': []
-    }
-    
-    for y_pred in [y_pred1, y_pred2, y_pred3]:
-        # Chuyển đổi các dự đoán thành mảng numpy
-        if isinstance(y_pred, list):
-            y_pred = np.array(y_pred)
-        
-        # Tính toán các độ đo
-        metrics['accuracy'].append(accuracy_score(y_true, y_pred))
-        metrics['f1_score'].append(f1_score(y_true, y_pred, average='weighted'))
-        metrics['precision'].append(precision_score(y_true, y_pred, average='weighted'))
-        metrics['recall'].append(recall_score(y_true, y_pred, average='weighted'))
+    if len(y_preds) == 1 and np.ndim(y_preds[0]) == 2:
+        y_preds = y_preds[0]
+    metrics = compute_metrics(y_true, np.array(y_preds))
+    
+    if names is None:
+        names = MODEL_NAMES if len(y_preds) == len(MODEL_NAMES) else [f"Mô hình {i + 1}" for i in range(len(y_preds))]
     
     # In kết quả chi tiết
     print("\nKết quả đánh giá chi tiết:")
-    
-    print("\nHMM tự cài đặt:")
-    print(f"  Accuracy: {metrics['accuracy'][0]:.3f}")
-    print(f"  F1-score: {metrics['f1_score'][0]:.3f}")
-    print(f"  Precision: {metrics['precision'][0]:.3f}")
-    print(f"  Recall: {metrics['recall'][0]:.3f}")
-    
-    print("\nHMM thư viện:")
-    print(f"  Accuracy: {metrics['accuracy'][1]:.3f}")
-    print(f"  F1-score: {metrics['f1_score'][1]:.3f}")
-    print(f"  Precision: {metrics['precision'][1]:.3f}")
-    print(f"  Recall: {metrics['recall'][1]:.3f}")
-    
-    print("\nSVM:")
-    print(f"  Accuracy: {metrics['accuracy'][2]:.3f}")
-    print(f"  F1-score: {metrics['f1_score'][2]:.3f}")
-    print(f"  Precision: {metrics['precision'][2]:.3f}")
-    print(f"  Recall: {metrics['recall'][2]:.3f}")
+    for i, name in enumerate(names):
+        print(f"\n{name}:")
+        print(f"  Accuracy: {metrics['accuracy'][i]:.3f}")
+        print(f"  F1-score: {metrics['f1_score'][i]:.3f}")
+        print(f"  Precision: {metrics['precision'][i]:.3f}")
+        print(f"  Recall: {metrics['recall'][i]:.3f}")
     
     return metrics
 
+@instrumentation.timed('data.save_text')
 def save_to_text(timestamp, speech_text, ml_predictions, filename="speech_output.txt"):
     """
-    Lưu kết quả nhận dạng và dự đoán vào file text.
+    Lưu kết quả nhận dạng và dự đoán vào file text (định dạng cũ; kho kết quả có cấu trúc
+    là results_store.ResultsStore, có thể xuất lại ra định dạng này bằng export_text).
     
     Định dạng lưu trữ:
     - Thời gian ghi âm (timestamp)
@@ -115,12 +225,8 @@ def save_to_text(timestamp, speech_text, ml_predictions, filename="speech_output
         ml_predictions (list): Kết quả dự đoán của 3 mô hình
         filename (str): Tên file để lưu kết quả
     """
+    record = ResultRecord(time=timestamp, transcript=speech_text, models=MODEL_NAMES,
+                          predictions=[as_label(p) for p in ml_predictions])
     with open(filename, "a", encoding="utf-8") as f:
-        f.write(f"\n--- Ghi âm lúc: {timestamp} ---\n")
-        f.write(f"Nội dung nói: {speech_text}\n")
-        f.write(f"Kết quả nhận dạng ML:\n")
-        f.write(f"- HMM tự cài đặt: Trạng thái {ml_predictions[0]} ({'Có tiếng nói' if ml_predictions[0] == 1 else 'Không có tiếng nói'})\n")
-        f.write(f"- HMM thư viện: Trạng thái {ml_predictions[1]} ({'Có tiếng nói' if ml_predictions[1] == 1 else 'Không có tiếng nói'})\n")
-        f.write(f"- SVM: Trạng thái {ml_predictions[2]} ({'Có tiếng nói' if ml_predictions[2] == 1 else 'Không có tiếng nói'})\n")
-        f.write("-" * 40 + "\n")
+        f.write(format_legacy(record))
     print(f"Đã lưu kết quả vào file {filename}")
\ No newline at end of file
@@ -0,0 +1,138 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_utils import SAMPLE_RATE, MFCC_FEATURES, extract_features
+from instrumentation import instrumentation
+
+def synthesize_clips(rng, n_clips, seconds, labels, noise_levels=(0.05, 0.5), gains=(0.25, 1.0)):
+    """
+    Tạo các đoạn âm thanh giả lập cùng độ dài: nhãn 1 là "tiếng nói" (sóng hài điều biên với
+    cao độ ngẫu nhiên) cộng nhiễu, nhãn 0 chỉ có nhiễu nền
+
+    Tham số:
+        rng (Generator): Bộ sinh số ngẫu nhiên của lô
+        n_clips (int): Số đoạn
+        seconds (float): Độ dài mỗi đoạn (giây)
+        labels (array): Nhãn 0/1 của từng đoạn
+        noise_levels (tuple): Khoảng (min, max) biên độ nhiễu so với tín hiệu
+        gains (tuple): Khoảng (min, max) hệ số khuếch đại cả đoạn (cắt về [-1, 1])
+
+    Trả về:
+        array: shape (n_clips, số_mẫu)
+    """
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = rng.uniform(100, 300, (n_clips, 1))
+    rate = rng.uniform(2, 6, (n_clips, 1))
+    voiced = np.sin(2 * np.pi * pitch * t) * (1 + 0.5 * np.sin(2 * np.pi * rate * t))
+    voiced += 0.3 * np.sin(2 * np.pi * 3 * pitch * t)
+    clips = 0.3 * voiced * np.asarray(labels, dtype=float)[:, None]
+    clips += rng.uniform(*noise_levels, (n_clips, 1)) * 0.3 * rng.standard_normal(clips.shape)
+    clips *= rng.uniform(*gains, (n_clips, 1))
+    return np.clip(clips, -1, 1, out=clips)
+
+# Số đoạn tối đa được tạo và trích xuất MFCC cùng lúc trong một lô (giới hạn bộ nhớ tạm
+# của các khung MFCC, khoảng 100 MB với đoạn 3 giây)
+CLIPS_PER_CHUNK = 64
+
+# Bộ nhớ đệm đặc trưng của tiến trình worker hiện tại (tạo một lần trong _init_worker)
+_worker_cache = None
+
+def generate_batch(seed, batch_size, durations=(2.0,), noise_levels=(0.05, 0.5), gains=(0.25, 1.0),
+                   cache=None):
+    """
+    Sinh một lô dữ liệu huấn luyện: các đoạn âm thanh giả lập, MFCC và vector trung bình
+    của mỗi đoạn. Lô chỉ phụ thuộc seed, nên cùng seed luôn cho cùng dữ liệu dù chạy ở
+    tiến trình nào.
+
+    Tham số:
+        seed (SeedSequence/int): Hạt giống của lô
+        batch_size (int): Số đoạn trong lô
+        durations (tuple): Các độ dài đoạn có thể chọn (giây); các đoạn cùng độ dài được
+                           trích xuất MFCC cùng nhau, tối đa CLIPS_PER_CHUNK đoạn mỗi lần
+        noise_levels (tuple): Khoảng biên độ nhiễu (xem synthesize_clips)
+        gains (tuple): Khoảng hệ số khuếch đại (xem synthesize_clips)
+        cache (FeatureCache): Bộ nhớ đệm đặc trưng; mặc định dùng bộ đệm của worker (nếu có)
+
+    Trả về:
+        tuple: (X, y)
+            - X: shape (batch_size, 13), float32
+            - y: Nhãn 0/1 xen kẽ (hai lớp cân bằng)
+    """
+    rng = np.random.default_rng(seed)
+    cache = cache or _worker_cache
+    y = np.arange(batch_size) % 2
+    X = np.empty((batch_size, MFCC_FEATURES), dtype=np.float32)
+    lengths = rng.choice(np.asarray(durations, dtype=float), batch_size)
+    for seconds in np.unique(lengths):
+        same_length = np.flatnonzero(lengths == seconds)
+        for start in range(0, len(same_length), CLIPS_PER_CHUNK):
+            index = same_length[start:start + CLIPS_PER_CHUNK]
+            audio = synthesize_clips(rng, len(index), seconds, y[index], noise_levels, gains)
+            X[index] = np.mean(extract_features(audio, cache=cache), axis=1)
+    return X, y
+
+def _init_worker(cache_dir):
+    """
+    Khởi tạo worker: một luồng BLAS mỗi tiến trình và mở bộ nhớ đệm đặc trưng một lần
+    """
+    global _worker_cache
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+    if cache_dir:
+        from feature_cache import FeatureCache
+        _worker_cache = FeatureCache(cache_dir)
+
+def iter_synthetic_batches(n_samples, batch_size=1024, seed=None, workers=None, max_in_flight=None,
+                           durations=(2.0,), noise_levels=(0.05, 0.5), gains=(0.25, 1.0),
+                           cache_dir=None):
+    """
+    Sinh dần các lô dữ liệu huấn luyện giả lập (X, y) trên một process pool.
+
+    Mỗi lô có luồng ngẫu nhiên riêng, tách từ SeedSequence(seed).spawn, nên kết quả chỉ
+    phụ thuộc seed và batch_size, không phụ thuộc số worker hay thứ tự hoàn thành.
+    Các lô được trả về theo thứ tự, và chỉ tối đa max_in_flight lô được tính trước,
+    nên bộ nhớ bị giới hạn dù n_samples lớn tới hàng triệu. Các lô dùng trực tiếp được
+    cho huấn luyện tăng dần, ví dụ ApproxKernelSVM.fit_stream.
+
+    Tham số:
+        n_samples (int): Tổng số mẫu
+        batch_size (int): Số mẫu mỗi lô
+        seed (int): Hạt giống; None để lấy ngẫu nhiên từ hệ điều hành
+        workers (int): Số tiến trình (mặc định bằng số lõi CPU); 1 để chạy ngay trong tiến trình này
+        max_in_flight (int): Số lô tối đa đã gửi nhưng chưa được lấy ra (mặc định 2 * workers)
+        durations, noise_levels, gains: Tham số tăng cường dữ liệu (xem generate_batch)
+        cache_dir (str): Thư mục bộ nhớ đệm đặc trưng (FeatureCache), None để tắt
+
+    Trả về:
+        generator: Các tuple (X, y), lô cuối có thể nhỏ hơn batch_size
+    """
+    sizes = [min(batch_size, n_samples - start) for start in range(0, n_samples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    options = dict(durations=durations, noise_levels=noise_levels, gains=gains)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        cache = None
+        if cache_dir:
+            from feature_cache import FeatureCache
+            cache = FeatureCache(cache_dir)
+        for batch_seed, size in zip(seeds, sizes):
+            with instrumentation.span('dataset.batch'):
+                batch = generate_batch(batch_seed, size, cache=cache, **options)
+            yield batch
+        return
+
+    max_in_flight = max_in_flight or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache_dir,)) as pool:
+        pending = deque()
+        for batch_seed, size in zip(seeds, sizes):
+            # Chờ lô cũ nhất khi số lô đang tính đã đạt giới hạn
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            pending.append(pool.submit(generate_batch, batch_seed, size, **options))
+        while pending:
+            yield pending.popleft().result()
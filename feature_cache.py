@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Chỉ mục được quét lại từ thư mục sau chừng này lần ghi hoặc giây (để thấy các mục do tiến
+# trình khác ghi/xóa), hoặc ngay khi tổng dung lượng theo dõi vượt max_bytes
+RESCAN_EVERY = 256
+RESCAN_SECONDS = 10.0
+# Khi phải xóa, xóa đến còn tỷ lệ này của max_bytes để các lần ghi kế tiếp không quét lại ngay
+EVICT_TO = 0.9
+
+class FeatureCache:
+    """
+    Bộ nhớ đệm đặc trưng trên đĩa, định địa chỉ theo nội dung.
+
+    Khóa là mã băm SHA-256 của dữ liệu âm thanh (bytes, dtype, shape) cùng các tham số trích xuất,
+    nên cùng một đoạn âm thanh với cùng cấu hình luôn dùng lại kết quả đã tính.
+    Mỗi mục được lưu thành một file .npy và được nạp lại bằng memory map (không sao chép).
+    Khi tổng dung lượng vượt max_bytes, các mục ít được dùng gần đây nhất (LRU) bị xóa cho đến
+    khi còn EVICT_TO * max_bytes.
+
+    Chỉ mục LRU được cập nhật dần trong bộ nhớ ở mỗi lần ghi. Nó được quét lại từ thư mục (thứ
+    tự theo thời điểm sửa đổi, được cập nhật khi đọc) trước mỗi lần xóa, và sau RESCAN_EVERY lần
+    ghi hoặc RESCAN_SECONDS giây. Vì vậy, khi nhiều tiến trình cùng ghi vào một thư mục, giới
+    hạn áp dụng cho cả thư mục nhưng có thể bị vượt tạm thời bởi các mục mà mỗi tiến trình ghi
+    giữa hai lần quét.
+
+    Thuộc tính:
+        directory (str): Thư mục lưu các file .npy
+        max_bytes (int): Dung lượng tối đa của thư mục
+        hits (int): Số lần tìm thấy trong bộ đệm
+        misses (int): Số lần phải tính lại
+        evictions (int): Số mục đã bị xóa để giải phóng dung lượng
+    """
+    def __init__(self, directory=".feature_cache", max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    @staticmethod
+    def make_key(audio, params):
+        """
+        Tạo khóa từ nội dung âm thanh và tham số trích xuất
+
+        Tham số:
+            audio (array): Dữ liệu âm thanh
+            params (dict): Các tham số ảnh hưởng đến kết quả (tần số lấy mẫu, số hệ số, ...)
+
+        Trả về:
+            str: Chuỗi hex SHA-256
+        """
+        audio = np.ascontiguousarray(audio)
+        digest = hashlib.sha256()
+        digest.update(f"{audio.dtype.str}{audio.shape}".encode())
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        digest.update(memoryview(audio).cast('B'))
+        return digest.hexdigest()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _scan(self):
+        """
+        Dựng lại chỉ mục LRU từ thư mục: tên file -> kích thước, theo thứ tự dùng gần nhất ở cuối
+        (kể cả các mục do tiến trình khác ghi hoặc xóa)
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                try:
+                    stat = os.stat(self._path(name))
+                except OSError:
+                    continue  # Vừa bị tiến trình khác xóa
+                entries.append((stat.st_mtime, name, stat.st_size))
+        self._index = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self._total_bytes = sum(self._index.values())
+        self._writes_since_scan = 0
+        self._scanned_at = time.monotonic()
+
+    def get(self, key):
+        """
+        Lấy đặc trưng theo khóa
+
+        Trả về:
+            array: Mảng memory map chỉ đọc, hoặc None nếu không có trong bộ đệm
+        """
+        name = key + '.npy'
+        try:
+            features = np.load(self._path(name), mmap_mode='r')
+            os.utime(self._path(name))  # Cập nhật thời điểm dùng gần nhất (dùng chung giữa các tiến trình)
+            size = os.path.getsize(self._path(name))
+        except (OSError, ValueError):
+            # Không có, bị xóa (có thể bởi tiến trình khác) hoặc hỏng: coi như không có
+            with self._lock:
+                self._forget(name)
+                self.misses += 1
+            return None
+        with self._lock:
+            if name not in self._index:
+                # Mục do tiến trình khác ghi
+                self._index[name] = size
+                self._total_bytes += size
+            self._index.move_to_end(name)
+            self.hits += 1
+        return features
+
+    def put(self, key, features):
+        """
+        Lưu đặc trưng vào bộ đệm (ghi file tạm rồi đổi tên để tránh file dở dang)
+        """
+        name = key + '.npy'
+        path = self._path(name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(features))
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            self._forget(name)
+            self._index[name] = size
+            self._total_bytes += size
+            self._writes_since_scan += 1
+            if (self._total_bytes > self.max_bytes or self._writes_since_scan >= RESCAN_EVERY
+                    or time.monotonic() - self._scanned_at >= RESCAN_SECONDS):
+                self._scan()
+                if name in self._index:
+                    self._index.move_to_end(name)
+                if self._total_bytes > self.max_bytes:
+                    self._evict(EVICT_TO * self.max_bytes)
+
+    def get_or_compute(self, audio, params, compute):
+        """
+        Trả về đặc trưng từ bộ đệm nếu có, nếu không thì tính bằng compute(audio) và lưu lại
+        """
+        key = self.make_key(audio, params)
+        features = self.get(key)
+        if features is None:
+            features = compute(audio)
+            self.put(key, features)
+        return features
+
+    def _forget(self, name):
+        size = self._index.pop(name, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self, target):
+        """
+        Xóa các mục ít được dùng gần đây nhất cho đến khi dung lượng không vượt target (byte)
+        """
+        while self._total_bytes > target and len(self._index) > 1:
+            name, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+    def stats(self):
+        """
+        Thống kê sử dụng bộ đệm
+
+        Trả về:
+            dict: hits, misses, evictions, hit_rate, entries, bytes
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._index),
+                'bytes': self._total_bytes,
+            }
@@ -0,0 +1,154 @@
+import numpy as np
+
+from audio_utils import SAMPLE_RATE, MFCC_FEATURES
+from mfcc_engine import get_plan
+from instrumentation import instrumentation
+
+class EnergyGate:
+    """
+    Cổng lọc rẻ tiền đặt trước MFCC và các mô hình: năng lượng ngắn hạn và tỷ lệ qua điểm 0
+    (ZCR) của từng khung được tính vector hóa trên chính các khung mà MFCC sẽ dùng.
+
+    Khung có năng lượng từ nền nhiễu + margin_db trở lên luôn được giữ, khung thấp hơn
+    nền nhiễu + margin_db / 2 bị loại (im lặng rõ ràng). Khung ở vùng lưng chừng giữa hai
+    ngưỡng chỉ được giữ khi ZCR vượt zcr_max (năng lượng thấp nhưng ZCR cao, như âm xát 's').
+    Mỗi vùng được giữ được nới thêm hangover khung hai bên để các cửa sổ trượt ở biên
+    tiếng nói vẫn có đủ khung.
+
+    Thuộc tính:
+        margin_db (float): Khoảng cách (dB) trên nền nhiễu để một khung được coi là có tín hiệu
+        floor_percentile (float): Bách phân vị của năng lượng khung dùng làm nền nhiễu
+        zcr_max (float): ZCR tối đa của một khung im lặng ở vùng lưng chừng (0..1, tính trên
+                         tín hiệu đã tiền nhấn nên nhiễu trắng có ZCR khoảng 0.6)
+        hangover (int): Số khung giữ thêm hai bên mỗi vùng được giữ
+    """
+    def __init__(self, margin_db=6.0, floor_percentile=10.0, zcr_max=0.7, hangover=5):
+        self.margin_db = margin_db
+        self.floor_percentile = floor_percentile
+        self.zcr_max = zcr_max
+        self.hangover = hangover
+
+    def measure(self, frames):
+        """
+        Năng lượng (dB) và ZCR của từng khung
+
+        Tham số:
+            frames (array): shape (n_frames, frame_len)
+
+        Trả về:
+            tuple: (energy_db, zcr), mỗi mảng shape (n_frames,)
+        """
+        energy = np.einsum('ij,ij->i', frames, frames) / frames.shape[1]
+        energy_db = 10 * np.log10(energy + 1e-12)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frames.shape[1] - 1)
+        return energy_db, zcr
+
+    def keep_mask(self, frames):
+        """
+        Các khung cần trích xuất MFCC và chấm điểm
+
+        Trả về:
+            array: Mặt nạ bool, shape (n_frames,)
+        """
+        energy_db, zcr = self.measure(frames)
+        floor = np.percentile(energy_db, self.floor_percentile)
+        keep = energy_db >= floor + self.margin_db
+        ambiguous = ~keep & (energy_db >= floor + self.margin_db / 2)
+        keep |= ambiguous & (zcr > self.zcr_max)
+        if self.hangover > 0 and keep.any():
+            kernel = np.ones(2 * self.hangover + 1)
+            keep = np.convolve(keep, kernel, mode='same') > 0
+        return keep
+
+def extract_gated_features(audio, gate, silence_sample=32, dtype=np.float64):
+    """
+    Trích xuất MFCC như extract_features nhưng chỉ cho các khung được cổng năng lượng giữ lại.
+
+    Các khung bị loại nhận MFCC trung bình của một mẫu nhỏ (silence_sample khung) các khung
+    im lặng, nên thống kê chuẩn hóa và nhãn năng lượng trên toàn bản ghi gần như không đổi.
+
+    Tham số:
+        audio (array): Tín hiệu 1D
+        gate (EnergyGate): Cổng năng lượng
+        silence_sample (int): Số khung im lặng được tính MFCC để làm mẫu đại diện
+        dtype: Độ chính xác của phép tính (như extract_features)
+
+    Trả về:
+        tuple: (features, keep)
+            - features: Đặc trưng MFCC, shape (số_khung, 13), cùng số khung với extract_features
+            - keep: Mặt nạ bool của các khung được giữ
+    """
+    audio = np.nan_to_num(np.asarray(audio, dtype=dtype))
+    std = np.std(audio)
+    if std > 0:
+        audio = (audio - np.mean(audio)) / std
+
+    plan = get_plan(samplerate=SAMPLE_RATE, numcep=MFCC_FEATURES, nfilt=26, nfft=512)
+    padded = np.zeros(plan.padded_length(len(audio)), dtype=audio.dtype)
+    plan.preemphasis(audio, out=padded[:len(audio)])
+    frames = plan.frame(padded)
+
+    with instrumentation.span('gate.measure'):
+        keep = gate.keep_mask(frames)
+    features = np.empty((len(frames), plan.numcep), dtype=audio.dtype)
+    with instrumentation.span('features.mfcc'):
+        if keep.any():
+            features[keep] = plan.frames_to_mfcc(frames[keep])
+        skipped = np.flatnonzero(~keep)
+        if len(skipped):
+            sample = skipped[np.linspace(0, len(skipped) - 1, min(silence_sample, len(skipped))).astype(int)]
+            features[skipped] = plan.frames_to_mfcc(frames[sample]).mean(axis=0)
+    instrumentation.count('gate.frames', len(frames))
+    instrumentation.count('gate.skipped_frames', len(skipped))
+    return np.nan_to_num(features), keep
+
+def active_windows(keep, window_size=5):
+    """
+    Cửa sổ trượt cần chấm điểm: các cửa sổ có ít nhất một khung được giữ
+
+    Trả về:
+        array: Mặt nạ bool, shape (số_khung - window_size + 1,)
+    """
+    if len(keep) < window_size:
+        return np.zeros(0, dtype=bool)
+    return np.lib.stride_tricks.sliding_window_view(keep, window_size).any(axis=1)
+
+def cascade_predict(models, X, active):
+    """
+    Chạy các mô hình chỉ trên những cửa sổ được cổng giữ lại. Các cửa sổ còn lại chỉ gồm
+    khung im lặng đại diện nên giống hệt nhau: mỗi mô hình chấm điểm một đoạn ngắn các cửa sổ
+    này và nhãn của cửa sổ cuối (không còn bị xác suất trạng thái đầu của HMM chi phối) được
+    gán cho tất cả, vì HMM không giám sát có thể đánh số trạng thái im lặng là 0 hoặc 1.
+    Hai HMM nhận độ dài từng vùng liên tục để giải mã Viterbi không nối qua các vùng im lặng
+    đã bỏ.
+
+    Tham số:
+        models (tuple): (hmm_custom, hmm_lib, svm)
+        X (array): Đặc trưng theo cửa sổ, shape (số_cửa_sổ, số_đặc_trưng)
+        active (array): Mặt nạ bool của các cửa sổ cần chấm điểm
+
+    Trả về:
+        tuple: Dự đoán của từng mô hình, mỗi mảng shape (số_cửa_sổ,)
+    """
+    hmm_custom, hmm_lib, svm = models
+    predictions = [np.zeros(len(X), dtype=int) for _ in models]
+    skipped = np.flatnonzero(~active)
+    if len(skipped):
+        silence = X[skipped[:16]]
+        for prediction, model in zip(predictions, models):
+            prediction[skipped] = model.predict(silence)[-1]
+    index = np.flatnonzero(active)
+    if len(index) == 0:
+        return tuple(predictions)
+
+    # Độ dài các vùng cửa sổ liên tục
+    breaks = np.flatnonzero(np.diff(index) != 1) + 1
+    lengths = np.diff(np.concatenate(([0], breaks, [len(index)])))
+    X_active = X[index]
+    predictions[0][index] = hmm_custom.predict(X_active, lengths)
+    with instrumentation.span('hmm_lib.predict'):
+        predictions[1][index] = hmm_lib.predict(X_active, lengths)
+    with instrumentation.span('svm.predict'):
+        predictions[2][index] = svm.predict(X_active)
+    return tuple(predictions)
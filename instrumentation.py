@@ -0,0 +1,260 @@
+import bisect
+import cProfile
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+# Ngưỡng (giây) của các ô histogram thời gian, theo kiểu Prometheus
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """
+    Histogram tích lũy với các ô cố định (đếm số giá trị <= mỗi ngưỡng)
+
+    Thuộc tính:
+        buckets (tuple): Các ngưỡng tăng dần
+        counts (list): Số giá trị rơi vào từng ô (ô cuối cho giá trị lớn hơn mọi ngưỡng)
+        count (int): Tổng số giá trị
+        total (float): Tổng các giá trị
+    """
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def cumulative(self):
+        """
+        Số giá trị tích lũy theo từng ngưỡng, kể cả +Inf
+        """
+        result, running = [], 0
+        for count in self.counts:
+            running += count
+            result.append(running)
+        return result
+
+class Instrumentation:
+    """
+    Đo đạc nhẹ cho pipeline: span (khoảng thời gian của một bước), counter và histogram.
+
+    Mỗi span cập nhật histogram thời gian theo tên bước. Khi bật ghi trace, mỗi span còn
+    được ghi thành một dòng JSON. Chế độ profile (tắt mặc định) chạy cProfile cho toàn bộ
+    chương trình và ghi thêm thay đổi bộ nhớ (tracemalloc) của từng span; khi tắt, một span
+    chỉ tốn hai lần đọc đồng hồ và một lần cập nhật histogram.
+
+    Thuộc tính:
+        counters (dict): Tên -> giá trị
+        histograms (dict): Tên -> Histogram
+        last (dict): Tên span -> thời gian (giây) của lần chạy gần nhất
+    """
+    def __init__(self):
+        self.counters = OrderedDict()
+        self.histograms = OrderedDict()
+        self.last = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._trace_file = None
+        self._profiler = None
+        self._tracemalloc = False
+
+    def configure(self, trace_path=None, profile=False):
+        """
+        Bật ghi trace JSONL và/hoặc chế độ profile
+
+        Tham số:
+            trace_path (str): File JSONL để ghi các span (ghi nối tiếp), None để tắt
+            profile (bool): Chạy cProfile và ghi thay đổi bộ nhớ của từng span bằng tracemalloc
+        """
+        self.close()
+        if trace_path:
+            self._trace_file = open(trace_path, 'a', encoding='utf-8', buffering=64 * 1024)
+        if profile:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracemalloc = True
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def span(self, name, **attrs):
+        """
+        Context manager đo một bước: with instrumentation.span('features.mfcc'): ...
+        """
+        return _Span(self, name, attrs)
+
+    def timed(self, name):
+        """
+        Decorator đo mỗi lần gọi hàm như một span
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with _Span(self, name, None):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, value=1):
+        """
+        Tăng counter
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value, buckets=DURATION_BUCKETS):
+        """
+        Ghi một giá trị vào histogram
+        """
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def _finish(self, span, duration):
+        with self._lock:
+            histogram = self.histograms.get(span.name)
+            if histogram is None:
+                histogram = self.histograms[span.name] = Histogram()
+            histogram.observe(duration)
+            self.last[span.name] = duration
+            if self._trace_file is not None and span.traced:
+                record = {'name': span.name, 'start': span.wall_start, 'duration': duration,
+                          'parent': span.parent, 'thread': threading.current_thread().name}
+                if span.attrs:
+                    record['attrs'] = span.attrs
+                if span.memory_start is not None and tracemalloc.is_tracing():
+                    record['memory_delta_bytes'] = tracemalloc.get_traced_memory()[0] - span.memory_start
+                self._trace_file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def prometheus_text(self, prefix='speech'):
+        """
+        Xuất counter và histogram theo định dạng văn bản của Prometheus
+        """
+        lines = []
+        with self._lock:
+            for name, value in self.counters.items():
+                metric = f"{prefix}_{_metric_name(name)}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+
+            metric = f"{prefix}_span_seconds"
+            if self.histograms:
+                lines.append(f"# TYPE {metric} histogram")
+            for name, histogram in self.histograms.items():
+                label = f'span="{name}"'
+                for le, count in zip(histogram.buckets + ('+Inf',), histogram.cumulative()):
+                    lines.append(f'{metric}_bucket{{{label},le="{le}"}} {count}')
+                lines.append(f"{metric}_sum{{{label}}} {histogram.total}")
+                lines.append(f"{metric}_count{{{label}}} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def export_prometheus(self, path):
+        """
+        Ghi prometheus_text() ra file
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+
+    def summary(self):
+        """
+        Bảng tóm tắt: số lần, tổng, trung bình và lớn nhất của từng span
+
+        Trả về:
+            str: Bảng văn bản để in ra màn hình
+        """
+        lines = [f"{'Bước':<28}{'Số lần':>8}{'Tổng (s)':>12}{'TB (ms)':>12}{'Max (ms)':>12}"]
+        with self._lock:
+            for name, h in self.histograms.items():
+                mean = h.total / h.count if h.count else 0.0
+                lines.append(f"{name:<28}{h.count:>8}{h.total:>12.3f}{mean * 1000:>12.1f}{h.max * 1000:>12.1f}")
+        return '\n'.join(lines)
+
+    def dump_profile(self, path):
+        """
+        Ghi kết quả cProfile (định dạng pstats) ra file; chỉ có tác dụng ở chế độ profile
+        """
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(path)
+            self._profiler.enable()
+
+    def dump_memory(self, path, limit=30):
+        """
+        Ghi các dòng mã cấp phát nhiều bộ nhớ nhất (tracemalloc); chỉ có tác dụng ở chế độ profile
+        """
+        if not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().statistics('lineno')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"Bộ nhớ hiện tại: {current / 2**20:.1f} MiB, đỉnh: {peak / 2**20:.1f} MiB\n")
+            for stat in stats[:limit]:
+                f.write(f"{stat}\n")
+
+    def close(self):
+        """
+        Đóng file trace và tắt chế độ profile
+        """
+        if self._trace_file is not None:
+            self._trace_file.close()
+            self._trace_file = None
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler = None
+        if self._tracemalloc:
+            tracemalloc.stop()
+            self._tracemalloc = False
+
+class _Span:
+    __slots__ = ('owner', 'name', 'attrs', 'parent', 'traced', 'start', 'wall_start', 'memory_start')
+
+    def __init__(self, owner, name, attrs):
+        self.owner = owner
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+        self.wall_start = None
+        self.memory_start = None
+
+    def __enter__(self):
+        owner = self.owner
+        # Chỉ theo dõi quan hệ cha-con, thời điểm bắt đầu và bộ nhớ khi đang ghi trace
+        self.traced = owner._trace_file is not None
+        if self.traced:
+            stack = owner._stack()
+            self.parent = stack[-1] if stack else None
+            stack.append(self.name)
+            self.wall_start = time.time()
+            if owner._profiler is not None:
+                self.memory_start = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if self.traced:
+            self.owner._stack().pop()
+        self.owner._finish(self, duration)
+        return False
+
+def _metric_name(name):
+    return ''.join(c if c.isalnum() else '_' for c in name)
+
+# Đối tượng dùng chung cho toàn bộ chương trình
+instrumentation = Instrumentation()
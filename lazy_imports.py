@@ -0,0 +1,83 @@
+import importlib
+import sys
+import threading
+
+# Các thư viện nặng hoặc phụ thuộc thiết bị: chỉ nạp khi được dùng lần đầu.
+# Tên module -> gợi ý cài đặt khi thiếu
+BACKENDS = {
+    'sounddevice': "pip install sounddevice (cần thư viện PortAudio và thiết bị âm thanh)",
+    'keyboard': "pip install keyboard",
+    'speech_recognition': "pip install SpeechRecognition",
+    'hmmlearn.hmm': "pip install hmmlearn",
+    'sklearn': "pip install scikit-learn",
+    'matplotlib': "pip install matplotlib",
+}
+
+def register_backend(module_name, install_hint):
+    """
+    Đăng ký một thư viện nạp trễ cùng gợi ý cài đặt
+    """
+    BACKENDS[module_name] = install_hint
+
+def load(module_name):
+    """
+    Nạp module (một lần), báo lỗi kèm gợi ý cài đặt nếu thiếu
+
+    Trả về:
+        module: Module đã nạp
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    try:
+        return importlib.import_module(module_name)
+    except (ImportError, OSError) as e:
+        # sounddevice báo OSError khi thiếu PortAudio
+        root = module_name.split('.')[0]
+        hint = BACKENDS.get(module_name) or BACKENDS.get(root, '')
+        raise ImportError(f"Không nạp được thư viện '{module_name}' cần cho chức năng này: {e}. {hint}") from e
+
+class LazyModule:
+    """
+    Đại diện cho một module chưa nạp: module thật chỉ được import ở lần truy cập thuộc tính
+    đầu tiên, nên import file chứa nó không kéo theo thư viện nặng hoặc thiết bị âm thanh
+    """
+    def __init__(self, module_name):
+        object.__setattr__(self, '_module_name', module_name)
+
+    def __getattr__(self, name):
+        return getattr(load(self._module_name), name)
+
+    def __setattr__(self, name, value):
+        setattr(load(self._module_name), name, value)
+
+    def __repr__(self):
+        state = 'đã nạp' if self._module_name in sys.modules else 'chưa nạp'
+        return f"<LazyModule '{self._module_name}' ({state})>"
+
+def lazy_import(module_name):
+    """
+    Tạo đại diện nạp trễ cho module: sd = lazy_import('sounddevice')
+    """
+    return LazyModule(module_name)
+
+def preload(module_names):
+    """
+    Nạp trước các module trên một thread nền (ví dụ trong lúc chờ người dùng nhấn Enter);
+    lỗi thiếu thư viện được bỏ qua ở đây và sẽ được báo khi module thực sự được dùng
+    """
+    def run():
+        for module_name in module_names:
+            try:
+                load(module_name)
+            except ImportError:
+                pass
+    thread = threading.Thread(target=run, name='preload', daemon=True)
+    thread.start()
+    return thread
+
+def loaded_backends():
+    """
+    Các thư viện trong BACKENDS đã được nạp trong tiến trình hiện tại
+    """
+    return sorted(name for name in BACKENDS if name in sys.modules)
@@ -0,0 +1,166 @@
+import numpy as np
+
+from audio_utils import SAMPLE_RATE, MFCC_FEATURES, iter_features
+from batch import read_wav_memmap
+from data_utils import sliding_window_features
+from metrics import MetricsAccumulator
+from models import ModelFactory
+from instrumentation import instrumentation
+
+# Bước nhảy giữa hai khung MFCC (giây), giống StreamingMFCC
+FRAME_SECONDS = 0.01
+
+def extract_long_features(samples, chunk_seconds=60.0, features_path=None):
+    """
+    Trích xuất MFCC của một tín hiệu dài theo từng đoạn vào một mảng float32 cấp phát sẵn
+
+    Tham số:
+        samples (array): Tín hiệu 1D, thường là np.memmap của file WAV
+        chunk_seconds (float): Độ dài mỗi đoạn âm thanh được đọc (giây)
+        features_path (str): Nếu có, đặc trưng được ghi vào file .npy dạng memory map
+                             thay vì giữ trong bộ nhớ
+
+    Trả về:
+        array: Đặc trưng MFCC, shape (số_khung, 13)
+    """
+    frame_len, frame_step = int(0.025 * SAMPLE_RATE), int(FRAME_SECONDS * SAMPLE_RATE)
+    n_frames = max(0, 1 + (len(samples) - frame_len) // frame_step)
+    if features_path:
+        features = np.lib.format.open_memmap(features_path, mode='w+', dtype=np.float32,
+                                             shape=(n_frames, MFCC_FEATURES))
+    else:
+        features = np.empty((n_frames, MFCC_FEATURES), dtype=np.float32)
+
+    position = 0
+    for block in iter_features(samples, int(chunk_seconds * SAMPLE_RATE)):
+        features[position:position + len(block)] = block
+        position += len(block)
+    return features[:position]
+
+def _chunks(n_frames, chunk_frames, window_size):
+    """
+    Các đoạn khung (start, stop) sao cho cửa sổ trượt của các đoạn nối tiếp nhau không trùng,
+    không thiếu: đoạn sau bắt đầu window_size - 1 khung trước khi đoạn trước kết thúc
+    """
+    n_windows = max(0, n_frames - window_size + 1)
+    for first in range(0, n_windows, chunk_frames):
+        last = min(first + chunk_frames, n_windows)
+        yield first, last + window_size - 1
+
+def _energy_threshold(features, chunk_frames, k=0.5):
+    """
+    Ngưỡng năng lượng của energy_labels (trung bình + k * độ lệch chuẩn), tính theo từng đoạn
+    """
+    total, total_sq, count = 0.0, 0.0, 0
+    for start in range(0, len(features), chunk_frames):
+        energy = np.sum(np.square(features[start:start + chunk_frames], dtype=np.float64), axis=1)
+        total += energy.sum()
+        total_sq += np.dot(energy, energy)
+        count += len(energy)
+    mean = total / max(count, 1)
+    return mean + k * np.sqrt(max(total_sq / max(count, 1) - mean * mean, 0.0))
+
+def iter_windows(features, chunk_frames=6000, window_size=5, threshold=None):
+    """
+    Sinh đặc trưng theo cửa sổ trượt và nhãn năng lượng theo từng đoạn khung
+
+    Trả về:
+        generator: Các tuple (first_window, X, y)
+    """
+    if threshold is None:
+        threshold = _energy_threshold(features, chunk_frames)
+    for start, stop in _chunks(len(features), chunk_frames, window_size):
+        frames = features[start:stop]
+        labels = (np.sum(np.square(frames, dtype=np.float64), axis=1) > threshold).astype(int)
+        X, y = sliding_window_features(frames, labels, window_size=window_size)
+        yield start, X, y
+
+@instrumentation.timed('long.process')
+def process_long_recording(path, models=None, chunk_seconds=60.0, train_seconds=60.0,
+                           svm_backend='svc', window_size=5, features_path=None):
+    """
+    Phân tích một bản ghi dài (hàng giờ) theo từng đoạn mà không nạp toàn bộ tín hiệu vào bộ nhớ.
+
+    Tín hiệu được mở bằng memory map, MFCC được trích xuất theo từng đoạn, rồi các cửa sổ
+    trượt được tạo, chuẩn hóa và đưa qua cả ba mô hình theo từng đoạn khung. Nhãn năng lượng
+    và thống kê chuẩn hóa (như create_training_data) được tính trên toàn bộ bản ghi bằng các
+    lượt duyệt theo đoạn. Nếu chưa có mô hình, mô hình được huấn luyện trên tổng cộng
+    train_seconds giây lấy từ 10 đoạn rải đều trên bản ghi.
+
+    Tham số:
+        path (str): File WAV mono 16 kHz (PCM 16-bit hoặc float 32-bit)
+        models (tuple): (hmm_custom, hmm_lib, svm) đã huấn luyện; None để huấn luyện từ đầu bản ghi
+        chunk_seconds (float): Độ dài mỗi đoạn (giây)
+        train_seconds (float): Thời lượng dùng để huấn luyện khi chưa có mô hình (giây)
+        svm_backend (str): Loại SVM khi phải huấn luyện
+        window_size (int): Số khung mỗi cửa sổ trượt
+        features_path (str): File .npy để giữ đặc trưng trên đĩa thay vì trong bộ nhớ
+
+    Trả về:
+        dict: {'duration_s', 'n_frames', 'n_windows', 'trained_seconds', 'metrics',
+               'speech_ratio': [tỷ lệ cửa sổ có tiếng nói của từng mô hình],
+               'chunks': [{'start_s', 'end_s', 'n_windows', 'speech_ratio': [...]}, ...]}
+    """
+    samples, sample_rate = read_wav_memmap(path)
+    if sample_rate != SAMPLE_RATE:
+        raise ValueError(f"Tần số lấy mẫu {sample_rate} Hz, cần {SAMPLE_RATE} Hz")
+    features = extract_long_features(samples, chunk_seconds, features_path)
+    chunk_frames = max(1, int(chunk_seconds / FRAME_SECONDS))
+    threshold = _energy_threshold(features, chunk_frames)
+
+    # Thống kê chuẩn hóa của toàn bộ cửa sổ, cộng dồn theo đoạn
+    total = np.zeros(features.shape[1])
+    total_sq = np.zeros(features.shape[1])
+    n_windows = 0
+    for _, X, _ in iter_windows(features, chunk_frames, window_size, threshold):
+        total += X.sum(axis=0, dtype=np.float64)
+        total_sq += np.square(X, dtype=np.float64).sum(axis=0)
+        n_windows += len(X)
+    if n_windows == 0:
+        raise ValueError("Bản ghi quá ngắn để tạo cửa sổ đặc trưng")
+    mean = total / n_windows
+    std = np.sqrt(np.maximum(total_sq / n_windows - mean * mean, 0.0)) + 1e-10
+
+    trained_seconds = 0.0
+    if models is None:
+        # Lấy mẫu huấn luyện rải đều trên bản ghi để có đủ cả hai lớp
+        span = max(window_size, int(train_seconds / FRAME_SECONDS) // 10)
+        starts = np.linspace(0, max(len(features) - span, 0), 10).astype(int)
+        parts = [next(iter_windows(features[start:start + span], span, window_size, threshold))[1:]
+                    for start in np.unique(starts)]
+        X = (np.vstack([X for X, _ in parts]) - mean) / std
+        y = np.concatenate([y for _, y in parts])
+        lengths = [len(X) for X, _ in parts]
+        if len(np.unique(y)) < 2:
+            raise ValueError("Dữ liệu huấn luyện chỉ có một lớp; cần mô hình đã lưu (--model-dir)")
+        hmm_custom, hmm_lib, svm = ModelFactory.create_models(svm_backend)
+        hmm_custom.fit(X, lengths)
+        hmm_lib.fit(X, lengths)
+        svm.fit(X, y)
+        models = (hmm_custom, hmm_lib, svm)
+        trained_seconds = len(X) * FRAME_SECONDS
+
+    accumulator = MetricsAccumulator(n_models=len(models))
+    speech = np.zeros(len(models))
+    chunks = []
+    for first, X, y in iter_windows(features, chunk_frames, window_size, threshold):
+        X = (X - mean) / std
+        y_preds = [model.predict(X) for model in models]
+        accumulator.update(y, y_preds)
+        speech += [np.sum(pred) for pred in y_preds]
+        chunks.append({
+            'start_s': first * FRAME_SECONDS,
+            'end_s': (first + len(X) + window_size - 1) * FRAME_SECONDS,
+            'n_windows': len(X),
+            'speech_ratio': [float(np.mean(pred)) for pred in y_preds],
+        })
+
+    return {
+        'duration_s': len(samples) / sample_rate,
+        'n_frames': len(features),
+        'n_windows': n_windows,
+        'trained_seconds': trained_seconds,
+        'metrics': accumulator.metrics(),
+        'speech_ratio': (speech / n_windows).tolist(),
+        'chunks': chunks,
+    }
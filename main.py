@@ -1,132 +1,492 @@
 import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import numpy as np
 
-from models import ModelFactory
-from audio_utils import record_audio, recognize_speech, extract_features
-from data_utils import prepare_data, evaluate_models, save_to_text
-from visualization import plot_results
+from models import ModelFactory, save_models, load_models, update_models
+from audio_utils import record_audio, extract_features
+from recognizers import get_recognizer, Transcription
+from data_utils import prepare_data, evaluate_models, create_training_data, MODEL_NAMES
+from gate import EnergyGate, extract_gated_features, active_windows, cascade_predict
+from results_store import ResultsStore, ResultRecord, as_label
+from metrics import MetricsAccumulator
+from visualization import PlotWorker
+from instrumentation import instrumentation
+from lazy_imports import preload
 
-def create_training_data(features):
+def load_or_create_models(model_dir=None, retrain=False, svm_backend='svc', dtype=np.float64):
     """
-    Tạo dữ liệu huấn luyện từ đặc trưng MFCC thực tế
-    """
-    # Tính toán ngưỡng năng lượng để phân biệt giọng nói và im lặng
-    energy = np.sum(features ** 2, axis=1)
-    threshold = np.mean(energy) + 0.5 * np.std(energy)
-    
-    # Gán nhãn dựa trên năng lượng
-    labels = (energy > threshold).astype(int)
+    Nạp mô hình đã lưu nếu có, ngược lại tạo mô hình mới
     
-    # Tạo chuỗi dữ liệu có cấu trúc thời gian
-    X = []
-    y = []
+    Trả về:
+        tuple: (hmm_custom, hmm_lib, svm, trained, n_recordings)
+    """
+    if model_dir and not retrain and os.path.exists(os.path.join(model_dir, 'manifest.json')):
+        hmm_custom, hmm_lib, svm, metadata = load_models(model_dir)
+        hmm_custom.dtype = dtype
+        n_recordings = metadata.get('n_recordings', 0)
+        print(f"Đã nạp mô hình từ {model_dir} (đã học từ {n_recordings} bản ghi)")
+        return hmm_custom, hmm_lib, svm, True, n_recordings
+    hmm_custom, hmm_lib, svm = ModelFactory.create_models(svm_backend, dtype=dtype)
+    return hmm_custom, hmm_lib, svm, False, 0
+
+def main(model_dir=None, update=False, retrain=False, svm_backend='svc', archive_dir=None,
+         recognizer='google', asr_timeout=15.0, plot_mode='each', plot_dpi=300, plot_format='png',
+         results_dir="results", gate=None, dtype=np.float64):
+    """
+    Vòng lặp ghi âm tương tác
     
-    # Sử dụng cửa sổ trượt để tạo mẫu
-    window_size = 5
-    for i in range(len(features) - window_size + 1):
-        window_features = features[i:i+window_size]
-        window_label = labels[i:i+window_size]
-        
-        # Tính đặc trưng trung bình của cửa sổ
-        X.append(np.mean(window_features, axis=0))
-        # Gán nhãn là 1 nếu phần lớn khung thời gian có giọng nói
-        y.append(1 if np.mean(window_label) > 0.5 else 0)
+    Tham số:
+        model_dir (str): Thư mục lưu mô hình; nếu đã có mô hình thì mỗi bản ghi chỉ cần suy luận
+        update (bool): Cập nhật tăng dần (warm start) mô hình bằng mỗi bản ghi mới rồi lưu lại
+        retrain (bool): Huấn luyện lại từ đầu trên mỗi bản ghi và không lưu mô hình
+        svm_backend (str): Loại SVM khi tạo mô hình mới ('svc', 'rff', 'nystroem')
+        archive_dir (str): Thư mục lưu mỗi bản ghi thành file WAV; None để chỉ giữ trong bộ nhớ
+        recognizer (str/SpeechRecognizer): Tên backend nhận dạng giọng nói đã đăng ký
+                                           ('google', 'offline') hoặc đối tượng SpeechRecognizer
+        asr_timeout (float): Thời gian chờ tối đa cho nhận dạng giọng nói mỗi bản ghi (giây)
+        plot_mode (str): 'each' (một biểu đồ mỗi bản ghi), 'dashboard' (một biểu đồ tổng hợp
+                         khi kết thúc phiên) hoặc 'off'
+        plot_dpi (int): Độ phân giải biểu đồ
+        plot_format (str): Định dạng file biểu đồ ('png', 'svg', 'pdf', ...)
+        results_dir (str): Thư mục kho kết quả (ResultsStore, mỗi ngày một file JSONL)
+        gate (EnergyGate): Cổng năng lượng/ZCR đặt trước MFCC và các mô hình khi đã có mô hình
+                           huấn luyện sẵn; None để xử lý mọi khung
+        dtype: Độ chính xác của MFCC và HMM tự cài đặt (np.float32 dùng khoảng một nửa bộ nhớ)
+    """
+    if archive_dir:
+        os.makedirs(archive_dir, exist_ok=True)
     
-    X = np.array(X)
-    y = np.array(y)
+    # Nhận dạng giọng nói chạy trên thread riêng, song song với trích xuất đặc trưng và mô hình
+    if isinstance(recognizer, str):
+        recognizer = get_recognizer(recognizer, timeout=asr_timeout)
+    asr_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='asr')
     
-    # Thêm nhiễu nhỏ để tăng tính đa dạng
-    noise = np.random.normal(0, 0.001, X.shape)
-    X = X + noise
+    # Biểu đồ được vẽ trên tiến trình nền, không chặn vòng lặp ghi âm
+    session_id = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    plotter = PlotWorker(mode=plot_mode, dpi=plot_dpi, fmt=plot_format)
     
-    # Chuẩn hóa dữ liệu
-    X = (X - np.mean(X, axis=0)) / (np.std(X, axis=0) + 1e-10)
+    # Kết quả mỗi lượt được ghi theo lô vào kho kết quả có cấu trúc
+    store = ResultsStore(results_dir)
     
-    return X, y
-
-def main():
-    # Tạo và huấn luyện các mô hình
+    # Tạo hoặc nạp các mô hình trên thread nền (kéo theo scikit-learn, hmmlearn) và nạp trước
+    # thư viện ghi âm, trong lúc chờ người dùng nhấn Enter
     print("Khởi tạo các mô hình...")
-    hmm_custom, hmm_lib, svm = ModelFactory.create_models()
+    models_future = asr_executor.submit(load_or_create_models, model_dir, retrain, svm_backend, dtype)
+    preload(['sounddevice', 'keyboard'])
+    # Ma trận nhầm lẫn cộng dồn qua các bản ghi của phiên này
+    session_metrics = MetricsAccumulator(n_models=3)
     
     # Demo: Ghi âm và nhận dạng
-    while True:
-        input("Nhấn Enter để bắt đầu ghi âm...")
-        audio, temp_wav = record_audio()
-        
-        # Nhận dạng giọng nói thành văn bản
-        speech_text = recognize_speech(temp_wav)
-        print(f"\nVăn bản nhận dạng được: {speech_text}")
-        
-        try:
-            # Trích xuất đặc trưng MFCC
-            features = extract_features(audio)
-            
-            # Kiểm tra tính hợp lệ của features
-            if len(features) == 0 or np.any(np.isnan(features)) or np.any(np.isinf(features)):
-                raise ValueError("Không thể trích xuất đặc trưng hợp lệ từ âm thanh")
-            
-            print(f"\nĐã trích xuất {len(features)} khung thời gian, mỗi khung có {features.shape[1]} đặc trưng MFCC")
-            
-            # Tạo dữ liệu huấn luyện từ đặc trưng MFCC
-            X, y = create_training_data(features)
-            print(f"Tạo được {len(X)} mẫu huấn luyện")
-            
-            # Kiểm tra phân bố của nhãn
-            n_speech = np.sum(y == 1)
-            n_silence = np.sum(y == 0)
-            print(f"Phân bố nhãn: {n_speech} mẫu có tiếng nói, {n_silence} mẫu không có tiếng nói")
-            
-            # Chia dữ liệu huấn luyện và kiểm tra
-            train_size = int(0.8 * len(X))
-            X_train, X_test = X[:train_size], X[train_size:]
-            y_train, y_test = y[:train_size], y[train_size:]
-            
-            # Huấn luyện các mô hình
-            print("\nĐang huấn luyện các mô hình...")
+    try:
+        while True:
+            input("Nhấn Enter để bắt đầu ghi âm...")
+            instrumentation.last.clear()
+            archive_path = None
+            if archive_dir:
+                archive_path = os.path.join(archive_dir, f"recording_{datetime.now():%Y-%m-%d_%H-%M-%S-%f}.wav")
+            audio, audio_data = record_audio(archive_path)
+            started = time.perf_counter()
             
-            print("1. Huấn luyện HMM tự cài đặt...")
-            hmm_custom.fit(X_train.reshape(-1, 1, X_train.shape[1]))
+            # Gửi yêu cầu nhận dạng giọng nói (dữ liệu trong bộ nhớ) chạy nền trong khi xử lý ML
+            transcription = Transcription(asr_executor, recognizer, audio_data, timeout=asr_timeout)
+            speech_text = None
+            predictions, metrics, error = [], {}, ''
             
-            print("2. Huấn luyện HMM thư viện...")
-            hmm_lib.fit(X_train)
+            try:
+                if models_future is not None:
+                    hmm_custom, hmm_lib, svm, trained, n_recordings = models_future.result()
+                    models_future = None
+                
+                # Trích xuất đặc trưng MFCC; với mô hình có sẵn, cổng năng lượng bỏ qua các khung im lặng
+                keep = None
+                if gate is not None and trained:
+                    features, keep = extract_gated_features(audio, gate, dtype=dtype)
+                else:
+                    features = extract_features(audio, dtype=dtype)
+                
+                # Kiểm tra tính hợp lệ của features
+                if len(features) == 0 or np.any(np.isnan(features)) or np.any(np.isinf(features)):
+                    raise ValueError("Không thể trích xuất đặc trưng hợp lệ từ âm thanh")
+                
+                print(f"\nĐã trích xuất {len(features)} khung thời gian, mỗi khung có {features.shape[1]} đặc trưng MFCC")
+                if keep is not None:
+                    print(f"Cổng năng lượng bỏ qua {1 - keep.mean():.1%} khung im lặng")
+                
+                # Tạo dữ liệu huấn luyện từ đặc trưng MFCC
+                X, y = create_training_data(features, dtype=dtype)
+                print(f"Tạo được {len(X)} mẫu huấn luyện")
+                
+                # Kiểm tra phân bố của nhãn
+                n_speech = np.sum(y == 1)
+                n_silence = np.sum(y == 0)
+                print(f"Phân bố nhãn: {n_speech} mẫu có tiếng nói, {n_silence} mẫu không có tiếng nói")
+                
+                # Chia dữ liệu huấn luyện và kiểm tra
+                train_size = int(0.8 * len(X))
+                X_train, X_test = X[:train_size], X[train_size:]
+                y_train, y_test = y[:train_size], y[train_size:]
+                
+                just_trained = not trained
+                if just_trained:
+                    # Huấn luyện các mô hình
+                    print("\nĐang huấn luyện các mô hình...")
+                    
+                    print("1. Huấn luyện HMM tự cài đặt...")
+                    hmm_custom.fit(X_train)
+                    
+                    print("2. Huấn luyện HMM thư viện...")
+                    with instrumentation.span('hmm_lib.fit'):
+                        hmm_lib.fit(X_train)
+                    
+                    print("3. Huấn luyện SVM...")
+                    with instrumentation.span('svm.fit'):
+                        svm.fit(X_train, y_train)
+                    
+                    if model_dir and not retrain:
+                        n_recordings = 1
+                        save_models(model_dir, hmm_custom, hmm_lib, svm, {'n_recordings': n_recordings})
+                        print(f"Đã lưu mô hình vào {model_dir}")
+                        trained = True
+                else:
+                    print("\nDùng mô hình đã huấn luyện, bỏ qua bước huấn luyện")
+                
+                # Dự đoán và đánh giá
+                print("\nĐang đánh giá các mô hình...")
+                if keep is not None:
+                    # Chỉ chấm điểm các cửa sổ có khung được cổng giữ lại, còn lại là im lặng
+                    y_pred1, y_pred2, y_pred3 = cascade_predict(
+                        (hmm_custom, hmm_lib, svm), X_test, active_windows(keep)[train_size:])
+                else:
+                    y_pred1 = hmm_custom.predict(X_test)
+                    with instrumentation.span('hmm_lib.predict'):
+                        y_pred2 = hmm_lib.predict(X_test)
+                    with instrumentation.span('svm.predict'):
+                        y_pred3 = svm.predict(X_test)
+                
+                # Đánh giá chi tiết và vẽ biểu đồ
+                metrics = evaluate_models(y_test, y_pred1, y_pred2, y_pred3)
+                session_metrics.update(y_test, [y_pred1, y_pred2, y_pred3])
+                if session_metrics.n_updates > 1:
+                    session_accuracy = session_metrics.metrics()['accuracy']
+                    print(f"\nAccuracy cộng dồn qua {session_metrics.n_updates} bản ghi: " + ", ".join(
+                        f"{name} {value:.3f}" for name, value in zip(MODEL_NAMES, session_accuracy)))
+                
+                # Lấy timestamp và lưu kết quả
+                timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+                plotter.submit(metrics, timestamp)
+                
+                # Dự đoán trạng thái cuối cùng
+                features_mean = np.mean(features, axis=0).reshape(1, -1)
+                pred1 = hmm_custom.predict(features_mean)
+                pred2 = hmm_lib.predict(features_mean)
+                pred3 = svm.predict(features_mean)
+                predictions = [as_label(p) for p in (pred1, pred2, pred3)]
+                
+                # Chờ kết quả nhận dạng, chỉ trong phần thời gian còn lại sau pipeline ML
+                speech_text = transcription.result()
+                print(f"\nVăn bản nhận dạng được: {speech_text}")
+                
+                # Cập nhật tăng dần mô hình bằng bản ghi này (sau khi đã trả kết quả)
+                if update and trained and not just_trained:
+                    update_models(hmm_custom, hmm_lib, svm, X, y)
+                    n_recordings += 1
+                    save_models(model_dir, hmm_custom, hmm_lib, svm, {'n_recordings': n_recordings})
+                    print(f"Đã cập nhật mô hình với bản ghi mới (tổng {n_recordings} bản ghi)")
+                
+            except Exception as e:
+                error = str(e)
+                print(f"\nLỗi trong quá trình xử lý: {str(e)}")
+                print("Đang tiếp tục...")
             
-            print("3. Huấn luyện SVM...")
-            svm.fit(X_train, y_train)
+            if speech_text is None:
+                speech_text = transcription.result()
+                print(f"\nVăn bản nhận dạng được: {speech_text}")
             
-            # Dự đoán và đánh giá
-            print("\nĐang đánh giá các mô hình...")
-            y_pred1 = [hmm_custom.predict(x.reshape(1, 1, -1)) for x in X_test]
-            y_pred2 = hmm_lib.predict(X_test)
-            y_pred3 = svm.predict(X_test)
+            # Thời gian của từng bước trong lượt này (các bước lồng nhau và ASR chạy song song nên
+            # không cộng lại được); 'total' là thời gian thực từ khi ghi âm xong đến khi có kết quả
+            timings = dict(instrumentation.last, total=time.perf_counter() - started)
+            print("\nThời gian các bước: " + ", ".join(
+                f"{name} {seconds:.3f}s" for name, seconds in timings.items()))
             
-            # Đánh giá chi tiết và vẽ biểu đồ
-            metrics = evaluate_models(y_test, y_pred1, y_pred2, y_pred3)
+            store.append(ResultRecord(
+                time=datetime.now().isoformat(timespec='seconds'), session=session_id,
+                transcript=speech_text, models=MODEL_NAMES, predictions=predictions,
+                metrics=metrics, timings=timings, error=error))
             
-            # Lấy timestamp và lưu kết quả
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            plot_results(metrics, timestamp)
-            
-            # Dự đoán trạng thái cuối cùng
-            features_mean = np.mean(features, axis=0).reshape(1, -1)
-            pred1 = hmm_custom.predict(features_mean.reshape(1, 1, -1))
-            pred2 = hmm_lib.predict(features_mean)
-            pred3 = svm.predict(features_mean)
-            
-            save_to_text(timestamp, speech_text, [pred1, pred2, pred3])
-            
-        except Exception as e:
-            print(f"\nLỗi trong quá trình xử lý: {str(e)}")
-            print("Đang tiếp tục...")
-        
-        # Xóa file WAV tạm
-        if os.path.exists(temp_wav):
-            os.remove(temp_wav)
-        
-        choice = input("\nTiếp tục? (y/n): ")
-        if choice.lower() != 'y':
-            break
+            choice = input("\nTiếp tục? (y/n): ")
+            if choice.lower() != 'y':
+                break
+    finally:
+        # Đóng cả khi thoát bằng Ctrl+C/EOF: ghi nốt các bản ghi và biểu đồ còn trong bộ đệm
+        asr_executor.shutdown(wait=False, cancel_futures=True)
+        plotter.close(session_id)
+        store.close()
+    print(f"Đã lưu {store.n_written} bản ghi vào {results_dir}/")
+
+def stream_main(args):
+    """
+    Chế độ phát hiện tiếng nói thời gian thực trên luồng âm thanh
+    (microphone hoặc phát lại file WAV khi dùng --replay)
+    """
+    from streaming import StreamingVAD, HMMScorer, SVMScorer, MicrophoneSource, FileReplaySource
+    
+    hmm_custom, _, svm = ModelFactory.create_models(args.svm_backend)
+    scorer = HMMScorer(hmm_custom) if args.scorer == 'hmm' else SVMScorer(svm)
+    vad = StreamingVAD(scorer, calibration_seconds=args.calibration)
+    
+    if args.replay:
+        source = FileReplaySource(args.replay, realtime=args.realtime)
+    else:
+        source = MicrophoneSource()
+        print("Đang nghe từ microphone... (Ctrl+C để dừng)")
+    
+    state = None
+    try:
+        for decision in vad.stream(source):
+            if decision.label != state:
+                state = decision.label
+                status = 'Có tiếng nói' if state == 1 else 'Không có tiếng nói'
+                print(f"[{decision.time:8.2f}s] {status} (điểm {decision.score:.3f})")
+    except KeyboardInterrupt:
+        pass
+    print(f"Đã xử lý {vad.mfcc.n_frames} khung, mất {vad.ring.overruns} mẫu do tràn bộ đệm")
+
+def batch_main(args):
+    """
+    Chế độ xử lý hàng loạt không tương tác trên thư mục hoặc manifest các file WAV
+    """
+    from batch import list_inputs, run_batch, save_results
+    
+    paths = list_inputs(args.batch)
+    print(f"Tìm thấy {len(paths)} file WAV")
+    
+    def progress(done, total):
+        if done == total or done % 100 == 0:
+            print(f"Đã xử lý {done}/{total} file")
+    
+    model_dir = args.model_dir if os.path.exists(os.path.join(args.model_dir, 'manifest.json')) else None
+    columns = run_batch(paths, workers=args.workers, cache_dir=args.cache_dir,
+                        model_dir=model_dir, progress=progress, svm_backend=args.svm_backend)
+    save_results(columns, args.output)
+    
+    n_errors = int(np.sum(columns['error'] != ''))
+    print(f"Đã lưu kết quả vào {args.output} ({n_errors} file lỗi)")
+
+def server_main(args):
+    """
+    Chế độ server: phục vụ nhiều luồng âm thanh qua TCP, dùng chung một bộ mô hình
+    """
+    from server import load_server_models, serve
+    
+    host, _, port = args.serve.rpartition(':')
+    models = load_server_models(args.model_dir, args.train_wav, args.svm_backend)
+    serve(models, host or '127.0.0.1', int(port), max_batch=args.max_batch,
+          max_wait=args.max_wait_ms / 1000)
+
+def long_main(args):
+    """
+    Chế độ bản ghi dài: ghi âm không giới hạn thẳng vào file (--capture) hoặc dùng file có sẵn
+    (--long), rồi phân tích theo từng đoạn mà không nạp toàn bộ tín hiệu vào bộ nhớ
+    """
+    from audio_utils import record_long
+    from long_audio import process_long_recording
+    
+    path = args.long
+    if args.capture:
+        record_long(args.capture, dtype=args.capture_dtype, max_seconds=args.max_seconds)
+        path = args.capture
+    
+    started = time.perf_counter()
+    models = None
+    if os.path.exists(os.path.join(args.model_dir, 'manifest.json')):
+        models = load_models(args.model_dir)[:3]
+    result = process_long_recording(path, models, chunk_seconds=args.chunk_seconds,
+                                    svm_backend=args.svm_backend)
+    if result['trained_seconds']:
+        print(f"Chưa có mô hình đã lưu: đã huấn luyện trên {result['trained_seconds']:.0f} giây rải đều trên bản ghi")
+    
+    print(f"\n{result['duration_s']:.1f} giây âm thanh, {result['n_windows']} cửa sổ")
+    print("Tỷ lệ có tiếng nói theo từng đoạn (" + ", ".join(MODEL_NAMES) + "):")
+    for chunk in result['chunks']:
+        ratios = ", ".join(f"{ratio:.0%}" for ratio in chunk['speech_ratio'])
+        print(f"  {chunk['start_s'] / 60:7.2f} - {chunk['end_s'] / 60:7.2f} phút: {ratios}")
+    print("Accuracy so với nhãn năng lượng: " + ", ".join(
+        f"{name} {value:.3f}" for name, value in zip(MODEL_NAMES, result['metrics']['accuracy'])))
+    
+    with ResultsStore(args.results_dir) as store:
+        store.append(ResultRecord(
+            time=datetime.now().isoformat(timespec='seconds'), transcript=os.path.basename(path),
+            models=MODEL_NAMES, predictions=[int(ratio > 0.5) for ratio in result['speech_ratio']],
+            metrics=result['metrics'],
+            timings=dict(instrumentation.last, total=time.perf_counter() - started)))
+
+def select_main(args):
+    """
+    Chọn mô hình: kiểm định chéo một lưới cấu hình trên các file WAV và in bảng xếp hạng
+    """
+    from batch import list_inputs
+    from model_selection import load_recordings, run_selection, leaderboard, format_leaderboard, save_leaderboard
+    
+    cache = None
+    if args.cache_dir:
+        from feature_cache import FeatureCache
+        cache = FeatureCache(args.cache_dir)
+    X, y, lengths = load_recordings(list_inputs(args.select), cache=cache)
+    print(f"Đã trích xuất {len(X)} cửa sổ từ {len(lengths)} file WAV")
+    
+    def progress(done, total):
+        if done == total or done % 20 == 0:
+            print(f"Đã đánh giá {done}/{total} tác vụ (cấu hình x fold)")
+    
+    results = run_selection(X, y, lengths, n_folds=args.folds, cv=args.cv, workers=args.workers,
+                            progress=progress)
+    rows = leaderboard(results)
+    print("\n" + format_leaderboard(rows))
+    if args.leaderboard:
+        save_leaderboard(rows, args.leaderboard)
+        print(f"Đã lưu bảng xếp hạng vào {args.leaderboard}")
+
+def results_main(args):
+    """
+    Truy vấn kho kết quả: bảng tổng hợp theo ngày và/hoặc xuất ra văn bản định dạng cũ
+    """
+    store = ResultsStore(args.results_dir)
+    if args.summary:
+        summary = store.aggregate(args.since, args.until, by=args.summary)
+        print(f"{'Nhóm':<22}{'Số bản ghi':>11}{'Lỗi':>6}{'TB (s)':>9}  Accuracy ({', '.join(MODEL_NAMES)})")
+        for key, group in summary.items():
+            accuracy = ', '.join(f"{value:.3f}" for value in group.get('accuracy', []))
+            seconds = '-' if group['mean_seconds'] is None else f"{group['mean_seconds']:.2f}"
+            print(f"{key:<22}{group['n_records']:>11}{group['n_errors']:>6}"
+                  f"{seconds:>9}  {accuracy or '-'}")
+    if args.export_text:
+        count = store.export_text(args.export_text, args.since, args.until)
+        print(f"Đã xuất {count} bản ghi ra {args.export_text}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Nhận dạng giọng nói sử dụng Machine Learning")
+    parser.add_argument('--stream', action='store_true',
+                        help="Phát hiện tiếng nói thời gian thực thay vì ghi âm từng đoạn")
+    parser.add_argument('--replay', metavar='WAV',
+                        help="Phát lại file WAV thay cho microphone (dùng với --stream)")
+    parser.add_argument('--realtime', action='store_true',
+                        help="Phát lại với tốc độ thời gian thực")
+    parser.add_argument('--scorer', choices=['hmm', 'svm'], default='hmm',
+                        help="Mô hình dùng để chấm điểm trong chế độ luồng")
+    parser.add_argument('--calibration', type=float, default=3.0,
+                        help="Số giây đầu luồng dùng để hiệu chỉnh mô hình")
+    parser.add_argument('--batch', metavar='PATH',
+                        help="Xử lý hàng loạt một thư mục hoặc file manifest các file WAV")
+    parser.add_argument('--capture', metavar='WAV',
+                        help="Ghi âm không giới hạn độ dài thẳng vào file WAV rồi phân tích theo từng đoạn")
+    parser.add_argument('--capture-dtype', choices=['int16', 'float32'], default='int16',
+                        help="Định dạng mẫu của file ghi âm dài")
+    parser.add_argument('--max-seconds', type=float, default=None,
+                        help="Thời lượng tối đa của bản ghi dài (mặc định không giới hạn)")
+    parser.add_argument('--long', metavar='WAV',
+                        help="Phân tích một file WAV dài theo từng đoạn (memory map, bộ nhớ cố định)")
+    parser.add_argument('--chunk-seconds', type=float, default=60.0,
+                        help="Độ dài mỗi đoạn khi phân tích bản ghi dài (giây)")
+    parser.add_argument('--select', metavar='PATH',
+                        help="Chọn mô hình: kiểm định chéo lưới cấu hình trên thư mục hoặc manifest các file WAV")
+    parser.add_argument('--cv', choices=['blocked', 'kfold'], default='blocked',
+                        help="Kiểu kiểm định chéo: chuỗi thời gian theo khối hoặc k-fold theo đoạn liên tiếp")
+    parser.add_argument('--folds', type=int, default=5,
+                        help="Số fold của kiểm định chéo")
+    parser.add_argument('--leaderboard', metavar='FILE',
+                        help="Ghi bảng xếp hạng cấu hình ra file .csv hoặc .json")
+    parser.add_argument('--output', default='batch_results.npz',
+                        help="File kết quả của chế độ hàng loạt (.npz hoặc .csv)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Số tiến trình xử lý song song (mặc định bằng số lõi CPU)")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Thư mục bộ nhớ đệm đặc trưng MFCC")
+    parser.add_argument('--serve', metavar='HOST:PORT',
+                        help="Chạy server suy luận nhiều phiên qua TCP (ví dụ 127.0.0.1:8765)")
+    parser.add_argument('--max-batch', type=int, default=256,
+                        help="Số cửa sổ tối đa trong một lô suy luận của server")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help="Thời gian chờ tối đa để gom một lô suy luận (ms)")
+    parser.add_argument('--train-wav', nargs='+', default=[], metavar='WAV',
+                        help="File WAV để huấn luyện mô hình cho server khi chưa có mô hình đã lưu")
+    parser.add_argument('--gate', action='store_true',
+                        help="Bật cổng năng lượng/ZCR: bỏ qua MFCC và mô hình cho các khung im lặng rõ ràng")
+    parser.add_argument('--gate-margin-db', type=float, default=6.0,
+                        help="Khoảng cách (dB) trên nền nhiễu để một khung được giữ")
+    parser.add_argument('--gate-zcr', type=float, default=0.7,
+                        help="Ngưỡng ZCR giữ lại các khung năng lượng thấp như âm xát")
+    parser.add_argument('--float32', action='store_true',
+                        help="Tính MFCC và HMM tự cài đặt ở float32 (khoảng một nửa bộ nhớ mỗi bản ghi)")
+    parser.add_argument('--model-dir', default='saved_models',
+                        help="Thư mục lưu và nạp mô hình đã huấn luyện")
+    parser.add_argument('--update', action='store_true',
+                        help="Cập nhật tăng dần mô hình đã lưu bằng mỗi bản ghi mới")
+    parser.add_argument('--retrain', action='store_true',
+                        help="Huấn luyện lại từ đầu trên mỗi bản ghi, không dùng mô hình đã lưu")
+    parser.add_argument('--asr', default='google',
+                        help="Bộ nhận dạng giọng nói: google hoặc offline (giả lập, không cần mạng)")
+    parser.add_argument('--asr-timeout', type=float, default=15.0,
+                        help="Thời gian chờ tối đa cho nhận dạng giọng nói mỗi bản ghi (giây)")
+    parser.add_argument('--plot', choices=['each', 'dashboard', 'off'], default='each',
+                        help="Vẽ biểu đồ cho mỗi bản ghi, một biểu đồ tổng hợp cho cả phiên, hoặc tắt")
+    parser.add_argument('--plot-dpi', type=int, default=300,
+                        help="Độ phân giải biểu đồ")
+    parser.add_argument('--plot-format', default='png',
+                        help="Định dạng file biểu đồ (png, svg, pdf, ...)")
+    parser.add_argument('--archive-dir', default=None,
+                        help="Lưu mỗi bản ghi thành file WAV trong thư mục này (mặc định không lưu)")
+    parser.add_argument('--svm-backend', choices=['svc', 'rff', 'nystroem'], default='svc',
+                        help="SVM kernel RBF chính xác (svc) hoặc xấp xỉ, huấn luyện tăng dần (rff, nystroem)")
+    parser.add_argument('--results-dir', default='results',
+                        help="Thư mục kho kết quả (mỗi ngày một file JSONL)")
+    parser.add_argument('--summary', nargs='?', const='day', choices=['day', 'month', 'session'],
+                        help="In bảng tổng hợp kết quả theo ngày (mặc định), tháng hoặc phiên rồi thoát")
+    parser.add_argument('--export-text', metavar='FILE',
+                        help="Xuất kết quả ra file văn bản theo định dạng cũ (speech_output.txt) rồi thoát")
+    parser.add_argument('--since', metavar='DATE',
+                        help="Chỉ lấy kết quả từ thời điểm này (YYYY-MM-DD hoặc ISO 8601)")
+    parser.add_argument('--until', metavar='DATE',
+                        help="Chỉ lấy kết quả đến thời điểm này (YYYY-MM-DD là hết ngày đó)")
+    parser.add_argument('--trace', metavar='JSONL',
+                        help="Ghi thời gian của từng bước (span) vào file JSONL")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="Ghi counter và histogram thời gian theo định dạng Prometheus khi kết thúc")
+    parser.add_argument('--profile', metavar='PREFIX',
+                        help="Bật cProfile và tracemalloc, ghi PREFIX.pstats và PREFIX.memory.txt khi kết thúc")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    instrumentation.configure(trace_path=args.trace, profile=bool(args.profile))
+    try:
+        if args.summary or args.export_text:
+            results_main(args)
+        elif args.capture or args.long:
+            long_main(args)
+        elif args.select:
+            select_main(args)
+        elif args.serve:
+            server_main(args)
+        elif args.batch:
+            batch_main(args)
+        elif args.stream or args.replay:
+            stream_main(args)
+        else:
+            main(model_dir=args.model_dir, update=args.update, retrain=args.retrain,
+                 svm_backend=args.svm_backend, archive_dir=args.archive_dir,
+                 recognizer=args.asr, asr_timeout=args.asr_timeout, plot_mode=args.plot,
+                 plot_dpi=args.plot_dpi, plot_format=args.plot_format, results_dir=args.results_dir,
+                 gate=EnergyGate(args.gate_margin_db, zcr_max=args.gate_zcr) if args.gate else None,
+                 dtype=np.float32 if args.float32 else np.float64)
+    finally:
+        if args.metrics:
+            instrumentation.export_prometheus(args.metrics)
+        if args.profile:
+            instrumentation.dump_profile(args.profile + '.pstats')
+            instrumentation.dump_memory(args.profile + '.memory.txt')
+        instrumentation.close()
+        if instrumentation.histograms:
+            print("\n" + instrumentation.summary())
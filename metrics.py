@@ -0,0 +1,126 @@
+import numpy as np
+
+def _label_indices(labels, classes):
+    """
+    Đổi nhãn sang chỉ số lớp trong classes (đã sắp xếp)
+    """
+    labels = np.asarray(labels).ravel()
+    idx = np.searchsorted(classes, labels)
+    idx = np.minimum(idx, len(classes) - 1)
+    if not np.array_equal(classes[idx], labels):
+        unknown = np.setdiff1d(labels, classes)
+        raise ValueError(f"Nhãn không nằm trong danh sách lớp {classes.tolist()}: {unknown.tolist()}")
+    return idx
+
+def confusion_matrices(y_true, y_preds, classes=None):
+    """
+    Ma trận nhầm lẫn của nhiều mô hình, tính trong một lần bincount
+
+    Tham số:
+        y_true (array): Nhãn thực tế, shape (n_samples,)
+        y_preds (array): Dự đoán, shape (n_models, n_samples)
+        classes (array): Danh sách lớp; mặc định là hợp các nhãn xuất hiện
+
+    Trả về:
+        tuple: (cm, classes)
+            - cm: shape (n_models, n_classes, n_classes), cm[m, i, j] là số mẫu
+                  có nhãn thực classes[i] được mô hình m dự đoán là classes[j]
+            - classes: Danh sách lớp
+    """
+    y_true = np.asarray(y_true).ravel()
+    y_preds = np.asarray(y_preds).reshape(-1, len(y_true))
+    if classes is None:
+        classes = np.union1d(y_true, y_preds)
+    classes = np.asarray(classes)
+    n_models, n_classes = len(y_preds), len(classes)
+
+    true_idx = _label_indices(y_true, classes)
+    pred_idx = _label_indices(y_preds, classes).reshape(n_models, -1)
+    # Mã hóa (mô hình, nhãn thực, nhãn dự đoán) thành một chỉ số phẳng
+    flat = (np.arange(n_models)[:, None] * n_classes + true_idx) * n_classes + pred_idx
+    cm = np.bincount(flat.ravel(), minlength=n_models * n_classes * n_classes)
+    return cm.reshape(n_models, n_classes, n_classes), classes
+
+def metrics_from_confusion(cm):
+    """
+    Tính accuracy và precision, recall, F1 (trung bình có trọng số theo số mẫu mỗi lớp,
+    giống average='weighted' của scikit-learn; lớp không có dự đoán nào cho giá trị 0)
+
+    Tham số:
+        cm (array): Ma trận nhầm lẫn, shape (n_models, n_classes, n_classes)
+
+    Trả về:
+        dict: {'accuracy', 'f1_score', 'precision', 'recall'}, mỗi độ đo là list theo mô hình
+    """
+    cm = np.asarray(cm, dtype=float)
+    tp = np.diagonal(cm, axis1=1, axis2=2)
+    support = cm.sum(axis=2)      # Số mẫu thực tế của mỗi lớp
+    predicted = cm.sum(axis=1)    # Số mẫu được dự đoán là mỗi lớp
+    total = support.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, tp / predicted, 0.0)
+        recall = np.where(support > 0, tp / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        weights = np.where(total[:, None] > 0, support / total[:, None], 0.0)
+        accuracy = np.where(total > 0, tp.sum(axis=1) / total, 0.0)
+
+    return {
+        'accuracy': accuracy.tolist(),
+        'f1_score': (f1 * weights).sum(axis=1).tolist(),
+        'precision': (precision * weights).sum(axis=1).tolist(),
+        'recall': (recall * weights).sum(axis=1).tolist(),
+    }
+
+def compute_metrics(y_true, y_preds, classes=None):
+    """
+    Các độ đo của nhiều mô hình trên cùng một tập nhãn
+
+    Tham số:
+        y_true (array): Nhãn thực tế, shape (n_samples,)
+        y_preds (array): Dự đoán, shape (n_models, n_samples)
+        classes (array): Danh sách lớp (mặc định là hợp các nhãn xuất hiện)
+
+    Trả về:
+        dict: Như metrics_from_confusion
+    """
+    cm, _ = confusion_matrices(y_true, y_preds, classes)
+    return metrics_from_confusion(cm)
+
+class MetricsAccumulator:
+    """
+    Cộng dồn ma trận nhầm lẫn qua nhiều bản ghi để tính độ đo trên toàn bộ tập dữ liệu
+    mà không cần giữ lại các dự đoán
+
+    Thuộc tính:
+        classes (array): Danh sách lớp cố định
+        confusion (array): Ma trận nhầm lẫn cộng dồn, shape (n_models, n_classes, n_classes)
+        n_updates (int): Số lần cập nhật
+    """
+    def __init__(self, n_models, classes=(0, 1)):
+        self.classes = np.sort(np.asarray(classes))
+        self.confusion = np.zeros((n_models, len(self.classes), len(self.classes)), dtype=np.int64)
+        self.n_updates = 0
+
+    def update(self, y_true, y_preds):
+        """
+        Thêm dự đoán của một bản ghi
+
+        Tham số:
+            y_true (array): Nhãn thực tế, shape (n_samples,)
+            y_preds (array): Dự đoán, shape (n_models, n_samples)
+        """
+        cm, _ = confusion_matrices(y_true, y_preds, self.classes)
+        self.confusion += cm
+        self.n_updates += 1
+        return self
+
+    def metrics(self):
+        """
+        Độ đo trên toàn bộ dữ liệu đã cộng dồn
+        """
+        return metrics_from_confusion(self.confusion)
+
+    def reset(self):
+        self.confusion[...] = 0
+        self.n_updates = 0
@@ -0,0 +1,231 @@
+import functools
+
+import numpy as np
+
+def hz2mel(hz):
+    """
+    Đổi tần số Hz sang thang Mel
+    """
+    return 2595 * np.log10(1 + hz / 700.)
+
+def mel2hz(mel):
+    """
+    Đổi giá trị thang Mel sang tần số Hz
+    """
+    return 700 * (10 ** (mel / 2595.0) - 1)
+
+class MFCCPlan:
+    """
+    Kế hoạch tính MFCC cho một cấu hình cố định.
+
+    Bộ lọc Mel, cửa sổ và ma trận DCT (đã gộp hệ số lifter) được tính một lần khi tạo plan
+    và dùng lại cho mọi tín hiệu. Kết quả trùng với python_speech_features.mfcc
+    (cùng cách chia khung, đệm 0 ở cuối, phổ công suất và thay hệ số đầu bằng log năng lượng).
+
+    Thuộc tính:
+        frame_len (int): Số mẫu mỗi khung
+        frame_step (int): Số mẫu giữa hai khung liên tiếp
+        window (array): Hàm cửa sổ, shape (frame_len,)
+        filterbank (array): Bộ lọc Mel, shape (nfilt, nfft // 2 + 1)
+        dct_matrix (array): Ma trận DCT-II trực chuẩn nhân lifter, shape (nfilt, numcep)
+    """
+    def __init__(self, samplerate=16000, nfft=512, nfilt=26, numcep=13, winlen=0.025, winstep=0.01,
+                 preemph=0.97, ceplifter=22, lowfreq=0, highfreq=None, append_energy=True):
+        self.samplerate = samplerate
+        self.nfft = nfft
+        self.nfilt = nfilt
+        self.numcep = numcep
+        self.preemph = preemph
+        self.append_energy = append_energy
+        # Làm tròn nửa lên giống python_speech_features
+        self.frame_len = int(np.floor(winlen * samplerate + 0.5))
+        self.frame_step = int(np.floor(winstep * samplerate + 0.5))
+
+        self.window = np.ones(self.frame_len)
+        self._rectangular = True
+        self.filterbank = self._build_filterbank(lowfreq, highfreq or samplerate / 2)
+        self.dct_matrix = self._build_dct(ceplifter)
+        self._fb_matrix = np.ascontiguousarray(self.filterbank.T / nfft)
+        self._matrices = {np.dtype(np.float64): (self._fb_matrix, self.dct_matrix)}
+
+    def _build_filterbank(self, lowfreq, highfreq):
+        """
+        Xây dựng các bộ lọc tam giác cách đều trên thang Mel
+        """
+        melpoints = np.linspace(hz2mel(lowfreq), hz2mel(highfreq), self.nfilt + 2)
+        bins = np.floor((self.nfft + 1) * mel2hz(melpoints) / self.samplerate)
+        left, center, right = bins[:-2, None], bins[1:-1, None], bins[2:, None]
+        i = np.arange(self.nfft // 2 + 1)[None, :]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rising = np.where((i >= left) & (i < center), (i - left) / (center - left), 0.0)
+            falling = np.where((i >= center) & (i < right), (right - i) / (right - center), 0.0)
+        return rising + falling
+
+    def _build_dct(self, ceplifter):
+        """
+        Ma trận DCT-II chuẩn hóa trực giao (norm='ortho'), chỉ giữ numcep hệ số đầu
+        và nhân sẵn hệ số lifter
+        """
+        n = np.arange(self.nfilt)[:, None]
+        k = np.arange(self.numcep)[None, :]
+        dct = np.cos(np.pi * k * (2 * n + 1) / (2 * self.nfilt)) * np.sqrt(2.0 / self.nfilt)
+        dct[:, 0] /= np.sqrt(2)
+        if ceplifter > 0:
+            dct *= 1 + (ceplifter / 2.) * np.sin(np.pi * np.arange(self.numcep) / ceplifter)
+        return dct
+
+    def matrices(self, dtype):
+        """
+        Bộ lọc Mel (đã chia nfft) và ma trận DCT ở độ chính xác dtype, ép kiểu một lần rồi lưu lại,
+        để phép nhân ma trận với phổ float32 không bị nâng lên float64
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in self._matrices:
+            self._matrices[dtype] = (self._fb_matrix.astype(dtype), self.dct_matrix.astype(dtype))
+        return self._matrices[dtype]
+
+    def num_frames(self, n_samples):
+        """
+        Số khung thu được từ tín hiệu có n_samples mẫu
+        """
+        if n_samples <= self.frame_len:
+            return 1
+        return 1 + int(np.ceil((n_samples - self.frame_len) / self.frame_step))
+
+    def preemphasis(self, signals, out=None):
+        """
+        Bộ lọc tiền nhấn y[n] = x[n] - preemph * x[n-1] theo trục cuối
+        """
+        if out is None:
+            out = np.empty_like(signals)
+        out[..., 0] = signals[..., 0]
+        np.multiply(signals[..., :-1], -self.preemph, out=out[..., 1:])
+        out[..., 1:] += signals[..., 1:]
+        return out
+
+    def padded_length(self, n_samples):
+        """
+        Độ dài tín hiệu sau khi đệm 0 để khung cuối cùng đủ frame_len mẫu
+        """
+        return max(n_samples, (self.num_frames(n_samples) - 1) * self.frame_step + self.frame_len)
+
+    def frame(self, signals):
+        """
+        Chia tín hiệu thành các khung chồng lấp bằng stride (không sao chép dữ liệu khung)
+
+        Tham số:
+            signals (array): shape (..., n_samples)
+
+        Trả về:
+            array: View shape (..., n_frames, frame_len)
+        """
+        n_samples = signals.shape[-1]
+        n_frames = self.num_frames(n_samples)
+        padlen = self.padded_length(n_samples)
+        if padlen > n_samples:
+            pad = [(0, 0)] * (signals.ndim - 1) + [(0, padlen - n_samples)]
+            signals = np.pad(signals, pad)
+        windows = np.lib.stride_tricks.sliding_window_view(signals, self.frame_len, axis=-1)
+        return windows[..., ::self.frame_step, :][..., :n_frames, :]
+
+    def frames_to_mfcc(self, frames, chunk_frames=1024):
+        """
+        Tính MFCC cho các khung đã tiền nhấn
+
+        Tham số:
+            frames (array): shape (..., n_frames, frame_len)
+            chunk_frames (int): Số khung xử lý mỗi lượt để giới hạn bộ nhớ tạm của FFT
+
+        Trả về:
+            array: shape (..., n_frames, numcep)
+        """
+        lead_shape = frames.shape[:-1]
+        frames = frames.reshape((-1,) + frames.shape[-2:])
+        dtype = np.result_type(frames.dtype, np.float32)
+        out = np.empty((frames.shape[0] * frames.shape[1], self.numcep), dtype=dtype)
+        eps = np.finfo(float).eps
+        fb_matrix, dct_matrix = self.matrices(dtype)
+        rfft = np.fft.rfft
+        if dtype == np.float32:
+            # numpy tính FFT float32 qua các mảng tạm lớn hơn cả float64; scipy.fft (đã có sẵn
+            # cùng scikit-learn) tính trực tiếp ở float32, nhanh hơn và dùng một nửa bộ nhớ
+            from scipy.fft import rfft
+
+        start = 0
+        for block in self._blocks(frames, chunk_frames):
+            if not self._rectangular:
+                block = block * self.window
+            spectrum = rfft(block, self.nfft, axis=-1)
+            # Bình phương biên độ (chưa chia nfft; hệ số 1/nfft đã gộp vào _fb_matrix)
+            pspec = np.square(spectrum.real)
+            pspec += np.square(spectrum.imag)
+
+            feat = pspec @ fb_matrix
+            feat[feat == 0] = eps
+            ceps = np.log(feat, out=feat) @ dct_matrix
+            if self.append_energy:
+                energy = pspec.sum(axis=1) / self.nfft
+                energy[energy == 0] = eps
+                ceps[:, 0] = np.log(energy)
+            out[start:start + len(block)] = ceps
+            start += len(block)
+
+        return out.reshape(lead_shape + (self.numcep,))
+
+    @staticmethod
+    def _blocks(frames, chunk_frames):
+        """
+        Chia các khung (n_signals, n_frames, frame_len) thành các khối tối đa chunk_frames khung.
+        Khối là view trên từng tín hiệu; chỉ các tín hiệu rất ngắn mới được gom
+        (và sao chép) thành một khối chung để giảm số lần gọi FFT
+        """
+        n_signals, n_frames, frame_len = frames.shape
+        if n_frames >= 64:
+            for b in range(n_signals):
+                for start in range(0, n_frames, chunk_frames):
+                    yield frames[b, start:start + chunk_frames]
+        else:
+            per_block = max(1, chunk_frames // n_frames)
+            for b in range(0, n_signals, per_block):
+                yield frames[b:b + per_block].reshape(-1, frame_len)
+
+    def compute(self, signals):
+        """
+        Tính MFCC cho một tín hiệu hoặc một lô tín hiệu cùng độ dài
+
+        Tham số:
+            signals (array): shape (n_samples,) hoặc (batch, n_samples)
+
+        Trả về:
+            array: shape (n_frames, numcep) hoặc (batch, n_frames, numcep)
+        """
+        signals = np.asarray(signals)
+        dtype = signals.dtype if np.issubdtype(signals.dtype, np.floating) else np.float64
+
+        # Tiền nhấn ghi thẳng vào bộ đệm đã đệm 0, tránh sao chép thêm khi chia khung
+        n_samples = signals.shape[-1]
+        padded = np.zeros(signals.shape[:-1] + (self.padded_length(n_samples),), dtype=dtype)
+        if self.preemph:
+            self.preemphasis(signals, out=padded[..., :n_samples])
+        else:
+            padded[..., :n_samples] = signals
+        return self.frames_to_mfcc(self.frame(padded))
+
+@functools.lru_cache(maxsize=None)
+def get_plan(samplerate=16000, nfft=512, nfilt=26, numcep=13, winlen=0.025, winstep=0.01,
+             preemph=0.97, ceplifter=22):
+    """
+    Lấy MFCCPlan đã lưu trong bộ nhớ đệm cho cấu hình cho trước (tạo mới nếu chưa có)
+    """
+    return MFCCPlan(samplerate=samplerate, nfft=nfft, nfilt=nfilt, numcep=numcep,
+                    winlen=winlen, winstep=winstep, preemph=preemph, ceplifter=ceplifter)
+
+def mfcc(signals, samplerate=16000, numcep=13, nfilt=26, nfft=512, winlen=0.025, winstep=0.01,
+         preemph=0.97, ceplifter=22):
+    """
+    Tính MFCC với cùng tham số như python_speech_features.mfcc, dùng plan đã lưu đệm.
+    Chấp nhận một tín hiệu 1D hoặc lô tín hiệu 2D cùng độ dài.
+    """
+    plan = get_plan(samplerate, nfft, nfilt, numcep, winlen, winstep, preemph, ceplifter)
+    return plan.compute(signals)
@@ -0,0 +1,341 @@
+import csv
+import itertools
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from metrics import compute_metrics
+from models import ModelFactory
+
+# Lưới cấu hình mặc định cho từng mô hình: tên tham số -> các giá trị cần thử
+DEFAULT_GRID = {
+    'hmm_custom': {'n_states': [2, 3, 4]},
+    'hmm_lib': {'n_states': [2, 3, 4], 'covariance_type': ['diag', 'full']},
+    'svm': {'svm_backend': ['svc'], 'C': [0.1, 1.0, 10.0], 'gamma': ['scale', 0.01, 0.1]},
+}
+
+# Một cấu hình cần đánh giá: tên mô hình và các tham số của nó
+Candidate = namedtuple('Candidate', ['model', 'params'])
+
+# Kết quả của một cấu hình trên một fold
+FoldResult = namedtuple('FoldResult', ['candidate', 'fold', 'accuracy', 'f1_score',
+                                       'fit_seconds', 'predict_seconds', 'n_test', 'error'])
+
+def expand_grid(grid=None):
+    """
+    Liệt kê mọi tổ hợp tham số của lưới
+
+    Tham số:
+        grid (dict): {tên_mô_hình: {tên_tham_số: [giá_trị, ...]}}, mặc định DEFAULT_GRID
+
+    Trả về:
+        list: Các Candidate
+    """
+    candidates = []
+    for model, space in (grid or DEFAULT_GRID).items():
+        names = list(space)
+        for values in itertools.product(*(space[name] for name in names)):
+            candidates.append(Candidate(model, dict(zip(names, values))))
+    return candidates
+
+def build_model(candidate):
+    """
+    Tạo mô hình của một cấu hình qua ModelFactory.create_models
+    """
+    params = dict(candidate.params)
+    n_states = params.pop('n_states', 2)
+    covariance_type = params.pop('covariance_type', 'diag')
+    svm_backend = params.pop('svm_backend', 'svc')
+    models = ModelFactory.create_models(svm_backend, n_states=n_states, covariance_type=covariance_type,
+                                        svm_params=params if candidate.model == 'svm' else None)
+    return models[('hmm_custom', 'hmm_lib', 'svm').index(candidate.model)]
+
+def kfold_splits(n_samples, n_folds=5):
+    """
+    Chia k-fold theo các đoạn liên tiếp (không xáo trộn): mỗi fold lần lượt làm tập kiểm tra,
+    phần còn lại (trước và sau nó) làm tập huấn luyện
+
+    Trả về:
+        list: Các tuple (train_ranges, test_range), mỗi range là (start, stop)
+    """
+    bounds = np.linspace(0, n_samples, n_folds + 1).astype(int)
+    splits = []
+    for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        train = [r for r in ((0, start), (stop, n_samples)) if r[1] > r[0]]
+        splits.append((train, (start, stop)))
+    return splits
+
+def blocked_splits(n_samples, n_folds=5, gap=0):
+    """
+    Kiểm định chéo chuỗi thời gian theo khối (cửa sổ mở rộng): dữ liệu được chia thành
+    n_folds + 1 khối, fold thứ i huấn luyện trên các khối trước khối i + 1 và kiểm tra trên
+    khối đó; gap mẫu ngay trước khối kiểm tra bị bỏ để các cửa sổ trượt chồng nhau không
+    làm lộ dữ liệu kiểm tra vào tập huấn luyện
+
+    Trả về:
+        list: Các tuple (train_ranges, test_range)
+    """
+    bounds = np.linspace(0, n_samples, n_folds + 2).astype(int)
+    splits = []
+    for start, stop in zip(bounds[1:-1].tolist(), bounds[2:].tolist()):
+        train_stop = max(0, start - gap)
+        if train_stop > 0:
+            splits.append(([(0, train_stop)], (start, stop)))
+    return splits
+
+def _lengths(ranges, boundaries):
+    """
+    Độ dài các chuỗi liên tục trong ranges, tách tại ranh giới giữa các bản ghi
+    """
+    lengths = []
+    for start, stop in ranges:
+        cuts = [b for b in boundaries if start < b < stop]
+        edges = [start] + cuts + [stop]
+        lengths.extend(b - a for a, b in zip(edges[:-1], edges[1:]))
+    return lengths
+
+def _take(array, ranges):
+    return np.concatenate([array[start:stop] for start, stop in ranges])
+
+def _state_labels(states, y, n_states):
+    """
+    Gán mỗi trạng thái HMM với nhãn chiếm đa số trong các mẫu huấn luyện thuộc trạng thái đó
+    (trạng thái không xuất hiện: 1 nếu là trạng thái cao nhất, ngược lại 0)
+    """
+    mapping = (np.arange(n_states) == n_states - 1).astype(int)
+    for state in np.unique(states):
+        mapping[state] = int(np.mean(y[states == state]) > 0.5)
+    return mapping
+
+# Dữ liệu dùng chung của tiến trình worker (gắn vào shared memory trong _init_worker)
+_worker_arrays = None
+_worker_blocks = None
+_worker_boundaries = None
+
+def _init_worker(specs, boundaries):
+    """
+    Gắn các mảng đặc trưng trong shared memory (không sao chép) và giới hạn một luồng BLAS
+    """
+    global _worker_arrays, _worker_blocks, _worker_boundaries
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+    _worker_blocks = {name: shared_memory.SharedMemory(name=spec[0]) for name, spec in specs.items()}
+    _worker_arrays = {name: np.ndarray(shape, dtype=dtype, buffer=_worker_blocks[name].buf)
+                      for name, (_, shape, dtype) in specs.items()}
+    _worker_boundaries = boundaries
+
+def evaluate_fold(candidate, fold, train_ranges, test_range, arrays=None, boundaries=None):
+    """
+    Huấn luyện và đánh giá một cấu hình trên một fold
+
+    Tham số:
+        candidate (Candidate): Cấu hình cần đánh giá
+        fold (int): Số thứ tự fold
+        train_ranges (list): Các đoạn (start, stop) của tập huấn luyện
+        test_range (tuple): Đoạn (start, stop) của tập kiểm tra
+        arrays (dict): {'X': ..., 'y': ...}; mặc định dùng mảng shared memory của worker
+        boundaries (list): Vị trí ranh giới giữa các bản ghi trong X
+
+    Trả về:
+        FoldResult
+    """
+    arrays = arrays or _worker_arrays
+    boundaries = _worker_boundaries if boundaries is None else boundaries
+    X, y = arrays['X'], arrays['y']
+    X_train, y_train = _take(X, train_ranges), _take(y, train_ranges)
+    X_test, y_test = X[test_range[0]:test_range[1]], y[test_range[0]:test_range[1]]
+    try:
+        model = build_model(candidate)
+        start = time.perf_counter()
+        if candidate.model == 'svm':
+            model.fit(X_train, y_train)
+        else:
+            model.fit(X_train, _lengths(train_ranges, boundaries))
+        fit_seconds = time.perf_counter() - start
+
+        if candidate.model == 'svm':
+            start = time.perf_counter()
+            y_pred = model.predict(X_test)
+            predict_seconds = time.perf_counter() - start
+        else:
+            # Trạng thái HMM không phải nhãn: ánh xạ theo tập huấn luyện (không tính vào thời gian)
+            mapping = _state_labels(model.predict(X_train, _lengths(train_ranges, boundaries)),
+                                    y_train, candidate.params.get('n_states', 2))
+            start = time.perf_counter()
+            y_pred = mapping[model.predict(X_test, _lengths([test_range], boundaries))]
+            predict_seconds = time.perf_counter() - start
+
+        metrics = compute_metrics(y_test, y_pred[np.newaxis], classes=(0, 1))
+        return FoldResult(candidate, fold, metrics['accuracy'][0], metrics['f1_score'][0],
+                          fit_seconds, predict_seconds, len(X_test), '')
+    except Exception as e:
+        return FoldResult(candidate, fold, np.nan, np.nan, np.nan, np.nan, len(X_test),
+                          f"{type(e).__name__}: {e}")
+
+def load_recordings(paths, cache=None):
+    """
+    Trích xuất đặc trưng theo cửa sổ của nhiều file WAV một lần, trước khi đánh giá.
+    Các file lỗi hoặc khác tần số lấy mẫu bị bỏ qua.
+
+    Trả về:
+        tuple: (X, y, lengths) với lengths là số cửa sổ của từng file
+    """
+    from batch import iter_training_batches
+
+    Xs, ys, lengths = [], [], []
+    for path in paths:
+        batches = list(iter_training_batches([path], batch_size=np.iinfo(np.int32).max, cache=cache))
+        if batches and len(batches[0][0]):
+            X, y = batches[0]
+            Xs.append(X)
+            ys.append(y)
+            lengths.append(len(X))
+    if not Xs:
+        raise ValueError("Không có file WAV hợp lệ để đánh giá")
+    return np.vstack(Xs), np.concatenate(ys), lengths
+
+def _share(arrays):
+    """
+    Chép các mảng vào shared memory một lần
+
+    Trả về:
+        tuple: (blocks, specs) với specs = {tên: (tên_block, shape, dtype)} gửi cho worker
+    """
+    blocks, specs = [], {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+def run_selection(X, y, lengths=None, grid=None, n_folds=5, cv='blocked', gap=5, workers=None,
+                  progress=None):
+    """
+    Đánh giá mọi cấu hình của lưới bằng kiểm định chéo trên một process pool.
+
+    X và y được chép vào shared memory một lần; mỗi tác vụ chỉ gửi cấu hình và chỉ số fold,
+    worker đọc trực tiếp các mảng dùng chung thay vì nhận bản pickle của dữ liệu.
+
+    Tham số:
+        X (array): Đặc trưng theo cửa sổ, shape (số_cửa_sổ, số_đặc_trưng)
+        y (array): Nhãn 0/1
+        lengths (list): Số cửa sổ của từng bản ghi trong X (theo thứ tự thời gian)
+        grid (dict): Lưới cấu hình (mặc định DEFAULT_GRID)
+        n_folds (int): Số fold
+        cv (str): 'kfold' (các đoạn liên tiếp) hoặc 'blocked' (chuỗi thời gian, cửa sổ mở rộng)
+        gap (int): Số mẫu bỏ giữa tập huấn luyện và tập kiểm tra khi cv='blocked'
+                   (mặc định bằng độ dài cửa sổ trượt)
+        workers (int): Số tiến trình (mặc định bằng số lõi CPU)
+        progress (callable): Hàm gọi lại progress(số_tác_vụ_đã_xong, tổng_số_tác_vụ)
+
+    Trả về:
+        list: Các FoldResult
+    """
+    if cv == 'kfold':
+        splits = kfold_splits(len(X), n_folds)
+    elif cv == 'blocked':
+        splits = blocked_splits(len(X), n_folds, gap)
+    else:
+        raise ValueError(f"Kiểu kiểm định chéo không hợp lệ: {cv}")
+    boundaries = list(np.cumsum(lengths)[:-1]) if lengths is not None else []
+    candidates = expand_grid(grid)
+    tasks = [(candidate, fold, train, test) for candidate in candidates
+             for fold, (train, test) in enumerate(splits)]
+
+    blocks, specs = _share({'X': X, 'y': np.asarray(y)})
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_worker,
+                                 initargs=(specs, boundaries)) as pool:
+            futures = [pool.submit(evaluate_fold, *task) for task in tasks]
+            for future in as_completed(futures):
+                results.append(future.result())
+                if progress is not None:
+                    progress(len(results), len(tasks))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return results
+
+def leaderboard(results):
+    """
+    Bảng xếp hạng các cấu hình: accuracy trung bình qua các fold so với chi phí huấn luyện
+    và suy luận. Cấu hình Pareto là cấu hình không bị cấu hình nào khác vượt trội đồng thời
+    về accuracy, thời gian huấn luyện và thời gian suy luận.
+
+    Trả về:
+        list: Các dict đã sắp xếp theo accuracy giảm dần (cùng accuracy: huấn luyện nhanh hơn trước)
+    """
+    groups = {}
+    for result in results:
+        key = (result.candidate.model, json.dumps(result.candidate.params, sort_keys=True))
+        groups.setdefault(key, []).append(result)
+
+    rows = []
+    for (model, params), folds in groups.items():
+        ok = [r for r in folds if not r.error]
+        accuracy = np.array([r.accuracy for r in ok])
+        n_test = sum(r.n_test for r in ok)
+        rows.append({
+            'model': model,
+            'params': params,
+            'accuracy': float(accuracy.mean()) if ok else np.nan,
+            'accuracy_std': float(accuracy.std()) if ok else np.nan,
+            'f1_score': float(np.mean([r.f1_score for r in ok])) if ok else np.nan,
+            'fit_seconds': float(np.mean([r.fit_seconds for r in ok])) if ok else np.nan,
+            'predict_ms_per_1k': 1e6 * sum(r.predict_seconds for r in ok) / n_test if n_test else np.nan,
+            'n_folds': len(ok),
+            'errors': '; '.join(sorted({r.error for r in folds if r.error})),
+        })
+
+    valid = [r for r in rows if not np.isnan(r['accuracy'])]
+    for row in rows:
+        row['pareto'] = not np.isnan(row['accuracy']) and not any(
+            other['accuracy'] >= row['accuracy'] and other['fit_seconds'] <= row['fit_seconds']
+            and other['predict_ms_per_1k'] <= row['predict_ms_per_1k']
+            and (other['accuracy'], other['fit_seconds'], other['predict_ms_per_1k'])
+            != (row['accuracy'], row['fit_seconds'], row['predict_ms_per_1k'])
+            for other in valid)
+
+    rows.sort(key=lambda r: (-np.nan_to_num(r['accuracy'], nan=-1.0),
+                             np.nan_to_num(r['fit_seconds'], nan=np.inf)))
+    return rows
+
+def format_leaderboard(rows):
+    """
+    Bảng xếp hạng dạng văn bản để in ra màn hình (* đánh dấu cấu hình Pareto)
+    """
+    lines = [f"{'#':>3}  {'Mô hình':<11}{'Tham số':<48}{'Accuracy':>14}{'F1':>7}"
+             f"{'Fit (s)':>9}{'Predict (ms/1k)':>17}"]
+    for rank, row in enumerate(rows, 1):
+        params = ', '.join(f"{k}={v}" for k, v in json.loads(row['params']).items())
+        accuracy = f"{row['accuracy']:.3f}±{row['accuracy_std']:.3f}"
+        line = (f"{rank:>3}{'*' if row['pareto'] else ' '} {row['model']:<11}{params:<48}{accuracy:>14}"
+                f"{row['f1_score']:>7.3f}{row['fit_seconds']:>9.3f}{row['predict_ms_per_1k']:>17.2f}")
+        if row['errors']:
+            line += f"  lỗi: {row['errors']}"
+        lines.append(line)
+    return '\n'.join(lines)
+
+def save_leaderboard(rows, output):
+    """
+    Ghi bảng xếp hạng ra file .csv hoặc .json
+    """
+    if output.endswith('.json'):
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        return
+    columns = ['model', 'params', 'accuracy', 'accuracy_std', 'f1_score', 'fit_seconds',
+               'predict_ms_per_1k', 'n_folds', 'pareto', 'errors']
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
@@ -1,86 +1,600 @@
+import os
+import json
+import pickle
+from datetime import datetime
 import numpy as np
-from sklearn.svm import SVC
-from hmmlearn import hmm
+
+from instrumentation import instrumentation
+from lazy_imports import lazy_import
+
+# hmmlearn và scikit-learn chỉ được nạp khi tạo hoặc nạp mô hình lần đầu
+hmm = lazy_import('hmmlearn.hmm')
+
+# Phiên bản định dạng lưu mô hình trên đĩa; tăng khi thay đổi cấu trúc file
+MODEL_FORMAT_VERSION = 1
+
+def _logsumexp(a, axis):
+    """
+    Tính log(sum(exp(a))) theo trục cho trước một cách ổn định số học
+    """
+    a_max = np.max(a, axis=axis, keepdims=True)
+    a_max = np.where(np.isfinite(a_max), a_max, 0.0)
+    out = np.log(np.sum(np.exp(a - a_max), axis=axis, keepdims=True)) + a_max
+    return np.squeeze(out, axis=axis)
+
+def _log_matmul(X, Y):
+    """
+    Nhân ma trận theo lô trong không gian log: out[n, i, j] = logsumexp_k(X[n, i, k] + Y[n, k, j])
+    
+    Số trạng thái K nhỏ nên vòng lặp chạy trên k, còn mọi phép toán được vector hóa theo n.
+    """
+    terms = [X[:, :, k, np.newaxis] + Y[:, np.newaxis, k, :] for k in range(X.shape[2])]
+    t_max = terms[0].copy()
+    for term in terms[1:]:
+        np.maximum(t_max, term, out=t_max)
+    t_max[~np.isfinite(t_max)] = 0.0
+    total = np.zeros_like(t_max)
+    for term in terms:
+        total += np.exp(term - t_max)
+    return np.log(total) + t_max
+
+def _max_matmul(X, Y):
+    """
+    Nhân ma trận theo lô trong đại số max-plus: out[n, i, j] = max_k(X[n, i, k] + Y[n, k, j])
+    """
+    out = X[:, :, 0, np.newaxis] + Y[:, np.newaxis, 0, :]
+    for k in range(1, X.shape[2]):
+        np.maximum(out, X[:, :, k, np.newaxis] + Y[:, np.newaxis, k, :], out=out)
+    return out
+
+def _compose_maps(F, G):
+    """
+    Hợp thành theo lô của các ánh xạ trạng thái: out[n, x] = G[n, F[n, x]]
+    (áp dụng F trước rồi đến G)
+    """
+    return np.take_along_axis(G, F, axis=1)
+
+def _segmented_scan(M, reset, combine=_log_matmul):
+    """
+    Tích tiền tố (prefix product) có phân đoạn của một dãy phần tử theo phép kết hợp combine.
+    
+    P[t] = M[t] nếu reset[t], ngược lại P[t] = combine(P[t-1], M[t]).
+    Dùng phép quét ghép cặp đệ quy nên chỉ có O(log T) bước Python,
+    mỗi bước được vector hóa trên toàn bộ các khung thời gian.
+    
+    Tham số:
+        M (array): Dãy phần tử, ví dụ ma trận log shape (T, K, K)
+        reset (array): Cờ bắt đầu phân đoạn, shape (T,)
+        combine (callable): Phép kết hợp có tính kết hợp, mặc định là nhân ma trận log
+        
+    Trả về:
+        array: Các tích tiền tố, cùng shape với M
+    """
+    n = len(M)
+    if n == 1:
+        return M.copy()
+    
+    mask_shape = (-1,) + (1,) * (M.ndim - 1)
+    m = n // 2
+    left, right = M[0:2 * m:2], M[1:2 * m:2]
+    reset_right = reset[1:2 * m:2]
+    pairs = np.where(reset_right.reshape(mask_shape), right, combine(left, right))
+    pair_reset = reset[0:2 * m:2] | reset_right
+    P = _segmented_scan(pairs, pair_reset, combine)
+    
+    out = np.empty_like(M)
+    out[0] = M[0]
+    out[1:2 * m:2] = P
+    even = M[2:n:2]
+    if len(even):
+        reset_even = reset[2:n:2]
+        out[2:n:2] = np.where(reset_even.reshape(mask_shape), even,
+                              combine(P[:len(even)], even))
+    return out
+
+def _viterbi(log_B, log_A, log_start, lengths):
+    """
+    Giải mã Viterbi song song cho các chuỗi được nối liền (xem CustomHMM.decode)
+    
+    Tham số:
+        log_B (array): Log mật độ phát xạ, shape (n_samples, n_states)
+        log_A (array): Log ma trận chuyển trạng thái, shape (n_states, n_states)
+        log_start (array): Log trọng số trạng thái tại khung đầu mỗi chuỗi, shape (n_states,)
+                           dùng chung hoặc (số_chuỗi, n_states) riêng cho từng chuỗi
+        lengths (array): Độ dài của từng chuỗi
+        
+    Trả về:
+        tuple: (log_delta, states)
+            - log_delta: Log xác suất đường đi tốt nhất kết thúc ở mỗi trạng thái,
+                         shape (n_samples, n_states)
+            - states: Trạng thái trên đường đi tốt nhất của mọi khung, shape (n_samples,)
+    """
+    n_samples, n_states = log_B.shape
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    
+    # Truyền tiến: delta_t = delta_{t-1} ⊗max (log A + log B_t)
+    is_start = np.zeros(n_samples, dtype=bool)
+    is_start[starts] = True
+    M = log_A[np.newaxis] + log_B[:, np.newaxis, :]
+    M[starts] = np.atleast_2d(log_start)[:, np.newaxis, :] + log_B[starts][:, np.newaxis, :]
+    log_delta = _segmented_scan(M, is_start, _max_matmul)[:, 0, :]
+    
+    # Con trỏ ngược: trạng thái tốt nhất tại t ứng với mỗi trạng thái tại t+1
+    is_end = np.zeros(n_samples, dtype=bool)
+    is_end[ends - 1] = True
+    back = np.empty((n_samples, n_states), dtype=np.intp)
+    back[:-1] = np.argmax(log_delta[:-1, :, np.newaxis] + log_A[np.newaxis], axis=1)
+    back[is_end] = np.arange(n_states)
+    
+    # Truy vết: hợp thành các con trỏ ngược từ cuối mỗi chuỗi về trước
+    paths = _segmented_scan(back[::-1], is_end[::-1], _compose_maps)[::-1]
+    last_states = np.argmax(log_delta[ends - 1], axis=1)
+    states = paths[np.arange(n_samples), np.repeat(last_states, lengths)]
+    return log_delta, states
 
 class CustomHMM:
     """
-    Cách 1: Tự cài đặt Hidden Markov Model
+    Cách 1: Tự cài đặt Hidden Markov Model với phân phối phát xạ Gaussian (hiệp phương sai đường chéo)
     
     Thuộc tính:
         n_states (int): Số trạng thái ẩn của mô hình
-        A (array): Ma trận chuyển trạng thái (transition matrix)
-        B (array): Ma trận phát xạ (emission matrix)
+        A (array): Ma trận chuyển trạng thái (transition matrix), shape (n_states, n_states)
+        means (array): Vector trung bình của phân phối phát xạ, shape (n_states, n_features)
+        covars (array): Phương sai (đường chéo) của phân phối phát xạ, shape (n_states, n_features)
         pi (array): Phân phối xác suất trạng thái ban đầu
+        log_likelihood_ (list): Log-likelihood của dữ liệu sau mỗi vòng lặp huấn luyện
+        dtype: Độ chính xác của các phép tính cỡ n_samples x n_features (mật độ phát xạ,
+               thống kê đủ); các phép truy hồi trong không gian log luôn dùng float64
     """
-    def __init__(self, n_states):
+    def __init__(self, n_states, min_covar=1e-3, dtype=np.float64):
         """
         Khởi tạo mô hình HMM với số trạng thái cho trước
         
         Tham số:
             n_states (int): Số trạng thái ẩn của mô hình
+            min_covar (float): Phương sai tối thiểu để tránh suy biến
+            dtype: np.float64, hoặc np.float32 để dùng X float32 mà không sao chép
         """
         self.n_states = n_states
+        self.min_covar = min_covar
+        self.dtype = dtype
         self.A = None  # Ma trận chuyển trạng thái
-        self.B = None  # Ma trận phát xạ
+        self.means = None  # Trung bình phát xạ
+        self.covars = None  # Phương sai phát xạ
         self.pi = None  # Phân phối trạng thái ban đầu
+        self.log_likelihood_ = []
+        self._stats = None  # Thống kê đủ của dữ liệu đã huấn luyện (dùng cho partial_fit)
 
-    def fit(self, X, n_iter=100):
+    @instrumentation.timed('hmm_custom.fit')
+    def fit(self, X, lengths=None, n_iter=100, tol=1e-4):
         """
-        Huấn luyện mô hình HMM sử dụng thuật toán Baum-Welch
+        Huấn luyện mô hình HMM sử dụng thuật toán Baum-Welch trong không gian log
         
         Tham số:
-            X (array): Dữ liệu huấn luyện, shape (n_samples, 1, n_features)
+            X (array): Các chuỗi đặc trưng được nối liền, shape (n_samples, n_features)
+                       (vẫn chấp nhận shape cũ (n_samples, 1, n_features))
+            lengths (array): Độ dài của từng chuỗi trong X; None nghĩa là X là một chuỗi duy nhất
             n_iter (int): Số vòng lặp tối đa cho thuật toán
+            tol (float): Dừng sớm khi log-likelihood tăng ít hơn ngưỡng này
+            
+        Trả về:
+            CustomHMM: Chính mô hình đã huấn luyện
         """
-        n_samples = len(X)
-        n_features = X[0].shape[1]
+        X, lengths = self._check_input(X, lengths)
+        self._init_params(X)
         
-        # Khởi tạo ngẫu nhiên các tham số
-        self.A = np.random.dirichlet(np.ones(self.n_states), size=self.n_states)
-        self.B = [np.random.randn(n_features) for _ in range(self.n_states)]
-        self.pi = np.random.dirichlet(np.ones(self.n_states))
-
+        self.log_likelihood_ = []
         for _ in range(n_iter):
-            # E-step: Tính toán gamma và xi
-            gamma = np.zeros((n_samples, self.n_states))
-            xi = np.zeros((n_samples - 1, self.n_states, self.n_states))
+            # E-step: Tính thống kê đủ (từ gamma và xi) bằng forward-backward
+            log_prob, stats = self._e_step(X, lengths)
+            self.log_likelihood_.append(log_prob)
             
             # M-step: Cập nhật các tham số
-            self.A = np.mean(xi, axis=0) + 1e-5  # Thêm một giá trị nhỏ để tránh 0
-            self.A = self.A / self.A.sum(axis=1, keepdims=True)  # Chuẩn hóa
-            self.pi = gamma[0] + 1e-5  # Thêm một giá trị nhỏ để tránh 0
-            self.pi = self.pi / self.pi.sum()  # Chuẩn hóa
+            self._m_step(stats)
+            self._stats = stats
+            
+            if len(self.log_likelihood_) > 1 and \
+                    abs(self.log_likelihood_[-1] - self.log_likelihood_[-2]) < tol:
+                break
+        
+        self._sort_states()
+        return self
 
-    def predict(self, X):
+    @instrumentation.timed('hmm_custom.partial_fit')
+    def partial_fit(self, X, lengths=None, n_iter=5, decay=1.0):
+        """
+        Cập nhật mô hình đã huấn luyện bằng dữ liệu mới (warm start, EM tăng dần).
+        
+        Thống kê đủ của dữ liệu cũ được giữ lại (nhân với decay) và cộng với thống kê
+        của dữ liệu mới, nên tham số phản ánh cả hai mà không cần giữ lại dữ liệu cũ.
+        
+        Tham số:
+            X (array): Các chuỗi đặc trưng mới, shape (n_samples, n_features)
+            lengths (array): Độ dài của từng chuỗi trong X
+            n_iter (int): Số vòng lặp EM trên dữ liệu mới
+            decay (float): Trọng số của thống kê cũ (1.0: giữ nguyên, < 1: ưu tiên dữ liệu mới)
+            
+        Trả về:
+            CustomHMM: Chính mô hình đã cập nhật
+        """
+        if self.A is None or self._stats is None:
+            return self.fit(X, lengths)
+        
+        X, lengths = self._check_input(X, lengths)
+        old_stats = {key: decay * value for key, value in self._stats.items()}
+        for _ in range(n_iter):
+            log_prob, stats = self._e_step(X, lengths)
+            self.log_likelihood_.append(log_prob)
+            stats = {key: old_stats[key] + stats[key] for key in stats}
+            self._m_step(stats)
+        
+        self._stats = stats
+        self._sort_states()
+        return self
+
+    def score(self, X, lengths=None):
+        """
+        Tính tổng log-likelihood của các chuỗi quan sát
+        
+        Tham số:
+            X (array): Các chuỗi đặc trưng được nối liền, shape (n_samples, n_features)
+            lengths (array): Độ dài của từng chuỗi trong X
+            
+        Trả về:
+            float: Logarit của xác suất quan sát
+        """
+        X, lengths = self._check_input(X, lengths)
+        _, _, seq_log_prob = self._forward_backward(self._log_emission(X), lengths)
+        return seq_log_prob.sum()
+
+    def predict_proba(self, X, lengths=None):
+        """
+        Tính xác suất hậu nghiệm của từng trạng thái tại mọi khung (posterior decoding)
+        
+        Tham số:
+            X (array): Các chuỗi đặc trưng được nối liền, shape (n_samples, n_features)
+            lengths (array): Độ dài của từng chuỗi trong X
+            
+        Trả về:
+            array: Xác suất hậu nghiệm, shape (n_samples, n_states)
+        """
+        X, lengths = self._check_input(X, lengths)
+        log_alpha, log_beta, seq_log_prob = self._forward_backward(self._log_emission(X), lengths)
+        log_gamma = log_alpha + log_beta - np.repeat(seq_log_prob, lengths)[:, np.newaxis]
+        return np.exp(log_gamma)
+
+    def decode(self, X, lengths=None):
+        """
+        Tìm chuỗi trạng thái ẩn có xác suất cao nhất bằng thuật toán Viterbi trong không gian log.
+        
+        Cả bước truyền tiến (max-plus) và bước truy vết đều được viết thành phép quét
+        song song trên mọi khung của mọi chuỗi, nên thời gian tăng tuyến tính theo số khung
+        và không có vòng lặp Python theo từng mẫu.
+        
+        Tham số:
+            X (array): Các chuỗi đặc trưng được nối liền, shape (n_samples, n_features)
+            lengths (array): Độ dài của từng chuỗi trong X
+            
+        Trả về:
+            tuple: (log_prob, states)
+                - log_prob: Tổng log xác suất của các đường đi tốt nhất
+                - states: Trạng thái dự đoán cho mọi khung, shape (n_samples,)
+        """
+        X, lengths = self._check_input(X, lengths)
+        log_B = self._log_emission(X)
+        log_delta, states = _viterbi(log_B, np.log(self.A), np.log(self.pi), lengths)
+        log_prob = log_delta[np.cumsum(lengths) - 1].max(axis=1).sum()
+        return log_prob, states
+
+    @instrumentation.timed('hmm_custom.predict')
+    def predict(self, X, lengths=None):
         """
         Dự đoán chuỗi trạng thái ẩn sử dụng thuật toán Viterbi
         
         Tham số:
-            X (array): Dữ liệu cần dự đoán, shape (n_samples, 1, n_features)
+            X (array): Dữ liệu cần dự đoán, shape (n_samples, n_features)
+            lengths (array): Độ dài của từng chuỗi trong X
             
         Trả về:
-            int: Trạng thái dự đoán (0: không có tiếng nói, 1: có tiếng nói)
+            array: Trạng thái dự đoán cho mọi khung (0: không có tiếng nói, 1: có tiếng nói)
         """
-        return np.argmax([self._compute_likelihood(x) for x in X])
+        return self.decode(X, lengths)[1]
 
-    def _compute_likelihood(self, x):
+    def filter(self, X, log_alpha=None):
         """
-        Tính logarit của xác suất quan sát chuỗi x
+        Lọc tiến trực tuyến (online forward filtering) cho một đoạn khung mới của luồng.
         
         Tham số:
-            x (array): Chuỗi quan sát, shape (1, n_features)
+            X (array): Các khung mới, shape (n_frames, n_features)
+            log_alpha (array): Log xác suất lọc tại khung cuối của đoạn trước,
+                               None nếu đây là đoạn đầu tiên của luồng
             
         Trả về:
-            float: Logarit của xác suất
+            tuple: (posteriors, log_alpha)
+                - posteriors: P(trạng thái | các khung đến hiện tại), shape (n_frames, n_states)
+                - log_alpha: Trạng thái lọc đã chuẩn hóa để truyền cho đoạn tiếp theo
+        """
+        X, _ = self._check_input(X, None)
+        log_B = self._log_emission(X)
+        log_A = np.log(self.A)
+        
+        M = log_A[np.newaxis] + log_B[:, np.newaxis, :]
+        if log_alpha is None:
+            M[0] = np.log(self.pi)[np.newaxis, :] + log_B[0][np.newaxis, :]
+        else:
+            M[0] = _logsumexp(log_alpha[:, np.newaxis] + log_A, axis=0) + log_B[0]
+        is_start = np.zeros(len(X), dtype=bool)
+        is_start[0] = True
+        log_alpha_seq = _segmented_scan(M, is_start)[:, 0, :]
+        
+        log_post = log_alpha_seq - _logsumexp(log_alpha_seq, axis=1)[:, np.newaxis]
+        return np.exp(log_post), log_post[-1]
+
+    def _check_input(self, X, lengths):
+        """
+        Chuẩn hóa dữ liệu đầu vào về dạng (n_samples, n_features) và kiểm tra lengths
+        """
+        X = np.asarray(X, dtype=self.dtype)
+        if X.ndim == 3:
+            X = X.reshape(-1, X.shape[-1])
+        if X.ndim != 2 or len(X) == 0:
+            raise ValueError("X phải có shape (n_samples, n_features) và không rỗng")
+        
+        if lengths is None:
+            lengths = np.array([len(X)])
+        lengths = np.asarray(lengths, dtype=int)
+        if np.any(lengths <= 0) or lengths.sum() != len(X):
+            raise ValueError("Tổng lengths phải bằng số khung của X và mỗi chuỗi phải khác rỗng")
+        return X, lengths
+
+    def _init_params(self, X):
+        """
+        Khởi tạo tham số: chia các khung theo hệ số đầu tiên (log năng lượng)
+        thành n_states nhóm để lấy trung bình và phương sai ban đầu
+        """
+        groups = np.array_split(np.argsort(X[:, 0], kind='stable'), self.n_states)
+        self.means = np.array([X[g].mean(axis=0) if len(g) else X.mean(axis=0) for g in groups])
+        self.covars = np.array([X[g].var(axis=0) if len(g) > 1 else X.var(axis=0) for g in groups])
+        self.covars = self.covars + self.min_covar
+        
+        self.pi = np.full(self.n_states, 1.0 / self.n_states)
+        if self.n_states > 1:
+            self.A = np.full((self.n_states, self.n_states), 0.1 / (self.n_states - 1))
+            np.fill_diagonal(self.A, 0.9)
+        else:
+            self.A = np.ones((1, 1))
+
+    def _log_emission(self, X):
+        """
+        Tính log mật độ Gaussian của mọi khung với mọi trạng thái
+        
+        Trả về:
+            array: shape (n_samples, n_states)
+        """
+        precisions = 1.0 / self.covars
+        log_det = np.sum(np.log(self.covars), axis=1)
+        # Tích với X tính ở dtype của X; kết quả (n_samples, n_states) được đưa về float64
+        mahalanobis = ((X ** 2) @ precisions.T.astype(X.dtype)
+                       - 2 * X @ (self.means * precisions).T.astype(X.dtype)
+                       + np.sum(self.means ** 2 * precisions, axis=1))
+        return -0.5 * (X.shape[1] * np.log(2 * np.pi) + log_det + mahalanobis)
+
+    def _forward_backward(self, log_B, lengths):
+        """
+        Thuật toán forward-backward trong không gian log cho nhiều chuỗi được nối liền.
+        
+        Biến forward/backward được viết thành tích tiền tố/hậu tố của các ma trận
+        log(A) + log(B_t) và tính bằng phép quét song song, nên toàn bộ các khung
+        của mọi chuỗi được xử lý cùng lúc thay vì lặp theo từng khung.
+        
+        Trả về:
+            tuple: (log_alpha, log_beta, seq_log_prob)
+        """
+        n_samples, K = log_B.shape
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        log_A = np.log(self.A)
+        
+        # Forward: alpha_t = alpha_{t-1} ⊗ (log A + log B_t), khởi đầu bằng log pi + log B_0
+        is_start = np.zeros(n_samples, dtype=bool)
+        is_start[starts] = True
+        M = log_A[np.newaxis] + log_B[:, np.newaxis, :]
+        M[starts] = np.log(self.pi)[np.newaxis, :] + log_B[starts][:, np.newaxis, :]
+        log_alpha = _segmented_scan(M, is_start)[:, 0, :]
+        
+        # Backward: beta_t = (log A + log B_{t+1}) ⊗ beta_{t+1}, beta tại khung cuối bằng 0
+        is_end = np.zeros(n_samples, dtype=bool)
+        is_end[ends - 1] = True
+        N = np.empty_like(M)
+        N[:-1] = log_A[np.newaxis] + log_B[1:, np.newaxis, :]
+        N[is_end] = 0.0
+        suffix = _segmented_scan(N[::-1].transpose(0, 2, 1), is_end[::-1])
+        log_beta = suffix[::-1].transpose(0, 2, 1)[:, :, 0]
+        
+        seq_log_prob = _logsumexp(log_alpha[ends - 1], axis=1)
+        return log_alpha, log_beta, seq_log_prob
+
+    def _e_step(self, X, lengths):
+        """
+        E-step: tính log-likelihood và thống kê đủ (từ gamma và xi) trên mọi chuỗi
+        
+        Trả về:
+            tuple: (log_prob, stats) với stats gồm 'start', 'trans', 'post', 'obs', 'obs2'
         """
-        return np.sum([self.pi[i] * self.A[i].sum() for i in range(self.n_states)])
+        log_B = self._log_emission(X)
+        log_alpha, log_beta, seq_log_prob = self._forward_backward(log_B, lengths)
+        frame_log_prob = np.repeat(seq_log_prob, lengths)
+        
+        gamma = np.exp(log_alpha + log_beta - frame_log_prob[:, np.newaxis])
+        
+        # xi chỉ tính cho các cặp khung (t, t+1) nằm trong cùng một chuỗi
+        ends = np.cumsum(lengths)
+        valid = np.ones(len(X), dtype=bool)
+        valid[ends - 1] = False
+        t = np.flatnonzero(valid)
+        log_xi = (log_alpha[t, :, np.newaxis] + np.log(self.A)[np.newaxis]
+                  + (log_B[t + 1] + log_beta[t + 1])[:, np.newaxis, :]
+                  - frame_log_prob[t, np.newaxis, np.newaxis])
+        
+        stats = {
+            'start': gamma[ends - lengths].sum(axis=0),
+            'trans': np.exp(log_xi).sum(axis=0),
+            'post': gamma.sum(axis=0),
+            'obs': (gamma.T.astype(X.dtype) @ X).astype(float),
+            'obs2': (gamma.T.astype(X.dtype) @ (X ** 2)).astype(float),
+        }
+        return seq_log_prob.sum(), stats
+
+    def _m_step(self, stats):
+        """
+        M-step: cập nhật tham số từ thống kê đủ
+        """
+        self.pi = stats['start'] + 1e-10  # Thêm một giá trị nhỏ để tránh 0
+        self.pi = self.pi / self.pi.sum()  # Chuẩn hóa
+        self.A = stats['trans'] + 1e-10
+        self.A = self.A / self.A.sum(axis=1, keepdims=True)  # Chuẩn hóa
+        
+        weights = stats['post'][:, np.newaxis] + 1e-10
+        self.means = stats['obs'] / weights
+        self.covars = stats['obs2'] / weights - self.means ** 2
+        self.covars = np.maximum(self.covars, 0) + self.min_covar
+
+    def _sort_states(self):
+        """
+        Sắp xếp các trạng thái theo hệ số đầu tiên (log năng lượng) tăng dần
+        để trạng thái 0 ứng với im lặng và trạng thái cao nhất ứng với tiếng nói
+        """
+        order = np.argsort(self.means[:, 0], kind='stable')
+        self.means = self.means[order]
+        self.covars = self.covars[order]
+        self.pi = self.pi[order]
+        self.A = self.A[np.ix_(order, order)]
+        if self._stats is not None:
+            self._stats = {key: value[np.ix_(order, order)] if key == 'trans' else value[order]
+                           for key, value in self._stats.items()}
+
+class ApproxKernelSVM:
+    """
+    SVM với kernel RBF xấp xỉ, huấn luyện tăng dần theo từng lô nhỏ (mini-batch).
+    
+    Đặc trưng được ánh xạ qua Random Fourier Features (RBFSampler) hoặc Nystroem, sau đó
+    một SVM tuyến tính (SGDClassifier với hinge loss) được học bằng partial_fit. Thời gian
+    huấn luyện tuyến tính theo số mẫu và bộ nhớ chỉ phụ thuộc kích thước lô, thay vì
+    bậc hai đến bậc ba như SVC.
+    
+    Thuộc tính:
+        method (str): 'rff' (Random Fourier Features) hoặc 'nystroem'
+        n_components (int): Số chiều của không gian đặc trưng xấp xỉ
+        gamma (float/str): Tham số RBF; 'scale' giống SVC: 1 / (n_features * X.var())
+        classes (array): Các lớp của bài toán (cần biết trước khi học tăng dần)
+    """
+    def __init__(self, method='rff', n_components=500, gamma='scale', alpha=1e-4,
+                 batch_size=4096, n_epochs=5, classes=(0, 1), random_state=42):
+        if method not in ('rff', 'nystroem'):
+            raise ValueError(f"Phương pháp xấp xỉ kernel không hợp lệ: {method}")
+        self.method = method
+        self.n_components = n_components
+        self.gamma = gamma
+        self.alpha = alpha
+        self.batch_size = batch_size
+        self.n_epochs = n_epochs
+        self.classes = np.asarray(classes)
+        self.random_state = random_state
+        self.feature_map_ = None
+        self.classifier_ = None
+
+    def _init_feature_map(self, X):
+        """
+        Khởi tạo ánh xạ đặc trưng từ lô dữ liệu đầu tiên
+        """
+        from sklearn.kernel_approximation import RBFSampler, Nystroem
+        gamma = self.gamma
+        if gamma == 'scale':
+            gamma = 1.0 / (X.shape[1] * X.var()) if X.var() > 0 else 1.0
+        if self.method == 'rff':
+            self.feature_map_ = RBFSampler(gamma=gamma, n_components=self.n_components,
+                                           random_state=self.random_state)
+        else:
+            self.feature_map_ = Nystroem(gamma=gamma, n_components=min(self.n_components, len(X)),
+                                         random_state=self.random_state)
+        self.feature_map_.fit(X)
+
+    def partial_fit(self, X, y):
+        """
+        Học thêm một lô dữ liệu
+        
+        Tham số:
+            X (array): Đặc trưng, shape (n_samples, n_features)
+            y (array): Nhãn
+        """
+        X = np.asarray(X, dtype=float)
+        if self.feature_map_ is None:
+            self._init_feature_map(X)
+        if self.classifier_ is None:
+            from sklearn.linear_model import SGDClassifier
+            self.classifier_ = SGDClassifier(loss='hinge', alpha=self.alpha,
+                                             random_state=self.random_state)
+        self.classifier_.partial_fit(self.feature_map_.transform(X), y, classes=self.classes)
+        return self
+
+    def fit_stream(self, batches):
+        """
+        Học từ một nguồn lô dữ liệu (X, y) được sinh dần, ví dụ đọc từ nhiều file trên đĩa;
+        chỉ một lô nằm trong bộ nhớ tại mỗi thời điểm
+        """
+        for X, y in batches:
+            self.partial_fit(X, y)
+        return self
+
+    def fit(self, X, y):
+        """
+        Huấn luyện lại từ đầu trên một mảng dữ liệu (giao diện giống SVC)
+        """
+        self.feature_map_ = None
+        self.classifier_ = None
+        rng = np.random.RandomState(self.random_state)
+        for _ in range(self.n_epochs):
+            order = rng.permutation(len(X))
+            for start in range(0, len(X), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                self.partial_fit(X[batch], y[batch])
+        return self
+
+    def decision_function(self, X):
+        """
+        Giá trị hàm quyết định, tính theo từng lô để giới hạn bộ nhớ
+        """
+        X = np.asarray(X, dtype=float)
+        return np.concatenate([
+            self.classifier_.decision_function(self.feature_map_.transform(X[start:start + self.batch_size]))
+            for start in range(0, len(X), self.batch_size)
+        ]) if len(X) else np.zeros(0)
+
+    def predict(self, X):
+        """
+        Dự đoán nhãn (0: không có tiếng nói, 1: có tiếng nói)
+        """
+        scores = self.decision_function(X)
+        return self.classifier_.classes_[(scores > 0).astype(int)]
 
 class ModelFactory:
     @staticmethod
-    def create_models():
+    def create_models(svm_backend='svc', n_states=2, covariance_type='diag', svm_params=None,
+                      dtype=np.float64):
         """
         Tạo các mô hình học máy
         
+        Tham số:
+            svm_backend (str): 'svc' (SVC kernel RBF chính xác), 'rff' hoặc 'nystroem'
+                               (kernel RBF xấp xỉ, huấn luyện tăng dần cho dữ liệu lớn)
+            n_states (int): Số trạng thái ẩn của hai mô hình HMM
+            covariance_type (str): Loại ma trận hiệp phương sai của HMM thư viện
+                                   ('diag', 'full', 'spherical', 'tied')
+            svm_params (dict): Siêu tham số của SVM (ví dụ {'C': 1.0, 'gamma': 'scale'} cho SVC,
+                               {'n_components': 500, 'alpha': 1e-4} cho rff/nystroem)
+            dtype: Độ chính xác của HMM tự cài đặt (np.float32 để dùng X float32 không sao chép)
+        
         Trả về:
             tuple: (hmm_custom, hmm_lib, svm)
                 - hmm_custom: HMM tự cài đặt (Cách 1)
@@ -88,12 +602,12 @@ class ModelFactory:
                 - svm: SVM từ thư viện (Cách 3)
         """
         # Cách 1: HMM tự cài đặt
-        hmm_custom = CustomHMM(n_states=2)
+        hmm_custom = CustomHMM(n_states=n_states, dtype=dtype)
         
         # Cách 2: HMM từ thư viện hmmlearn
         hmm_lib = hmm.GaussianHMM(
-            n_components=2,            # Số trạng thái
-            covariance_type='diag',    # Loại ma trận hiệp phương sai
+            n_components=n_states,     # Số trạng thái
+            covariance_type=covariance_type,  # Loại ma trận hiệp phương sai
             n_iter=100,               # Số vòng lặp tối đa
             init_params='',           # Không tự động khởi tạo tham số
             params='stmc'             # Cho phép cập nhật tất cả tham số
@@ -103,28 +617,187 @@ class ModelFactory:
         n_features = 13  # Số đặc trưng MFCC
         
         # Khởi tạo xác suất trạng thái ban đầu
-        hmm_lib.startprob_ = np.array([0.5, 0.5])
+        hmm_lib.startprob_ = np.full(n_states, 1.0 / n_states)
         
-        # Khởi tạo ma trận chuyển trạng thái
-        hmm_lib.transmat_ = np.array([
-            [0.7, 0.3],  # Xác suất chuyển từ trạng thái 0
-            [0.3, 0.7]   # Xác suất chuyển từ trạng thái 1
-        ])
+        # Khởi tạo ma trận chuyển trạng thái: giữ nguyên trạng thái với xác suất 0.7
+        # (với 2 trạng thái: [[0.7, 0.3], [0.3, 0.7]])
+        hmm_lib.transmat_ = np.full((n_states, n_states), 0.3 / max(n_states - 1, 1))
+        np.fill_diagonal(hmm_lib.transmat_, 0.7 if n_states > 1 else 1.0)
         
         # Khởi tạo means với giá trị ngẫu nhiên nhỏ
-        hmm_lib.means_ = np.random.randn(2, n_features) * 0.01
+        hmm_lib.means_ = np.random.randn(n_states, n_features) * 0.01
         
-        # Khởi tạo covars với giá trị đường chéo là 1
-        hmm_lib.covars_ = np.ones((2, n_features))
+        # Khởi tạo covars là ma trận đơn vị (theo dạng của covariance_type)
+        hmm_lib.covars_ = {
+            'diag': np.ones((n_states, n_features)),
+            'spherical': np.ones(n_states),
+            'full': np.tile(np.eye(n_features), (n_states, 1, 1)),
+            'tied': np.eye(n_features),
+        }[covariance_type]
         
         # Đảm bảo các ma trận xác suất được chuẩn hóa
         hmm_lib.startprob_ = hmm_lib.startprob_ / hmm_lib.startprob_.sum()
         hmm_lib.transmat_ = hmm_lib.transmat_ / hmm_lib.transmat_.sum(axis=1)[:, np.newaxis]
         
         # Cách 3: SVM từ thư viện scikit-learn
-        svm = SVC(
-            kernel='rbf',         # Hàm kernel RBF
-            random_state=42       # Giá trị khởi tạo ngẫu nhiên
+        if svm_backend == 'svc':
+            from sklearn.svm import SVC
+            svm = SVC(
+                kernel='rbf',         # Hàm kernel RBF
+                random_state=42,      # Giá trị khởi tạo ngẫu nhiên
+                **(svm_params or {})
+            )
+        else:
+            svm = ApproxKernelSVM(method=svm_backend, random_state=42, **(svm_params or {}))
+        
+        return hmm_custom, hmm_lib, svm
+
+@instrumentation.timed('models.save')
+def save_models(directory, hmm_custom, hmm_lib, svm, metadata=None):
+    """
+    Lưu ba mô hình đã huấn luyện vào một thư mục có đánh số phiên bản định dạng
+    
+    Cấu trúc thư mục:
+    - manifest.json: Phiên bản định dạng, thời điểm lưu và metadata
+    - hmm_custom.npz: Tham số và thống kê đủ của CustomHMM
+    - hmm_lib.npz: Tham số của GaussianHMM (hmmlearn)
+    - svm.pkl: Mô hình SVC (pickle)
+    
+    Tham số:
+        directory (str): Thư mục lưu mô hình
+        hmm_custom, hmm_lib, svm: Các mô hình đã huấn luyện
+        metadata (dict): Thông tin thêm (số bản ghi đã học, ...)
+    """
+    os.makedirs(directory, exist_ok=True)
+    
+    stats = hmm_custom._stats or {}
+    np.savez(os.path.join(directory, 'hmm_custom.npz'),
+             n_states=hmm_custom.n_states, min_covar=hmm_custom.min_covar,
+             pi=hmm_custom.pi, A=hmm_custom.A, means=hmm_custom.means, covars=hmm_custom.covars,
+             **{f'stats_{key}': value for key, value in stats.items()})
+    
+    np.savez(os.path.join(directory, 'hmm_lib.npz'),
+             n_components=hmm_lib.n_components, covariance_type=hmm_lib.covariance_type,
+             startprob=hmm_lib.startprob_, transmat=hmm_lib.transmat_,
+             means=hmm_lib.means_, covars=hmm_lib._covars_)
+    
+    with open(os.path.join(directory, 'svm.pkl'), 'wb') as f:
+        pickle.dump(svm, f, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    # Ghi manifest sau cùng để thư mục chỉ được coi là hợp lệ khi đã lưu đủ các file
+    manifest = {
+        'format_version': MODEL_FORMAT_VERSION,
+        'saved_at': datetime.now().isoformat(timespec='seconds'),
+        'models': {'hmm_custom': 'hmm_custom.npz', 'hmm_lib': 'hmm_lib.npz', 'svm': 'svm.pkl'},
+        'metadata': metadata or {},
+    }
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+@instrumentation.timed('models.load')
+def load_models(directory):
+    """
+    Nạp các mô hình đã lưu bằng save_models
+    
+    Tham số:
+        directory (str): Thư mục lưu mô hình
+        
+    Trả về:
+        tuple: (hmm_custom, hmm_lib, svm, metadata)
+    """
+    with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != MODEL_FORMAT_VERSION:
+        raise ValueError(f"Không hỗ trợ phiên bản định dạng mô hình {manifest.get('format_version')} "
+                         f"(cần {MODEL_FORMAT_VERSION})")
+    files = manifest['models']
+    
+    with np.load(os.path.join(directory, files['hmm_custom'])) as data:
+        hmm_custom = CustomHMM(n_states=int(data['n_states']), min_covar=float(data['min_covar']))
+        hmm_custom.pi, hmm_custom.A = data['pi'], data['A']
+        hmm_custom.means, hmm_custom.covars = data['means'], data['covars']
+        stats = {key[len('stats_'):]: data[key] for key in data.files if key.startswith('stats_')}
+        hmm_custom._stats = stats or None
+    
+    with np.load(os.path.join(directory, files['hmm_lib'])) as data:
+        hmm_lib = hmm.GaussianHMM(
+            n_components=int(data['n_components']),
+            covariance_type=str(data['covariance_type']),
+            n_iter=100,
+            init_params='',
+            params='stmc'
         )
+        hmm_lib.startprob_ = data['startprob']
+        hmm_lib.transmat_ = data['transmat']
+        hmm_lib.means_ = data['means']
+        hmm_lib.covars_ = data['covars']
+    
+    with open(os.path.join(directory, files['svm']), 'rb') as f:
+        svm = pickle.load(f)
+    
+    return hmm_custom, hmm_lib, svm, manifest.get('metadata', {})
+
+@instrumentation.timed('models.update')
+def update_models(hmm_custom, hmm_lib, svm, X, y, n_iter=5):
+    """
+    Cập nhật tăng dần (warm start) các mô hình đã huấn luyện bằng một bản ghi mới
+    
+    - CustomHMM: Gộp thống kê đủ của dữ liệu mới vào thống kê cũ (partial_fit)
+    - GaussianHMM: Chạy thêm n_iter vòng EM bắt đầu từ tham số hiện tại
+    - SVM: Huấn luyện lại trên các vector hỗ trợ cũ cộng với dữ liệu mới,
+      vì các vector hỗ trợ tóm tắt đủ thông tin của dữ liệu đã học cho biên quyết định;
+      ApproxKernelSVM chỉ cần học thêm dữ liệu mới bằng partial_fit
+    
+    Tham số:
+        X (array): Đặc trưng theo cửa sổ của bản ghi mới
+        y (array): Nhãn của các cửa sổ
+        n_iter (int): Số vòng lặp EM cho hai mô hình HMM
+    """
+    hmm_custom.partial_fit(X, n_iter=n_iter)
+    
+    max_iter = hmm_lib.n_iter
+    hmm_lib.n_iter = n_iter
+    hmm_lib.fit(X)
+    hmm_lib.n_iter = max_iter
+    
+    if hasattr(svm, 'partial_fit'):
+        svm.partial_fit(X, y)
+        return
+    if hasattr(svm, 'support_vectors_'):
+        sv_labels = np.repeat(svm.classes_, svm.n_support_)
+        X = np.vstack((svm.support_vectors_, X))
+        y = np.concatenate((sv_labels, y))
+    svm.fit(X, y)
+
+def viterbi_continue(model, X, lengths, log_deltas):
+    """
+    Giải mã Viterbi các đoạn mới của nhiều luồng, mỗi đoạn nối tiếp trạng thái Viterbi cuối của
+    đoạn trước cùng luồng thay vì bắt đầu lại từ xác suất trạng thái đầu, nên nhãn ở biên các
+    đoạn không phụ thuộc cách luồng được chia đoạn hay gộp lô. Nhãn đã trả về trước đó không
+    được sửa lại.
+    
+    Tham số:
+        model: CustomHMM hoặc GaussianHMM (hmmlearn) đã huấn luyện
+        X (array): Các đoạn được nối liền, shape (n_samples, n_features)
+        lengths (array): Độ dài của từng đoạn
+        log_deltas (list): Trạng thái Viterbi cuối của đoạn trước mỗi luồng (từ lần gọi trước),
+                           None cho đoạn đầu tiên của luồng
         
-        return hmm_custom, hmm_lib, svm
\ No newline at end of file
+    Trả về:
+        tuple: (states, log_deltas)
+            - states: Trạng thái của mọi khung, shape (n_samples,)
+            - log_deltas: Trạng thái Viterbi cuối của từng đoạn (đã chuẩn hóa) cho lần gọi sau
+    """
+    with np.errstate(divide='ignore'):
+        if isinstance(model, CustomHMM):
+            X, lengths = model._check_input(X, lengths)
+            log_B, log_A, log_pi = model._log_emission(X), np.log(model.A), np.log(model.pi)
+        else:
+            log_B = model._compute_log_likelihood(np.asarray(X, dtype=np.float64))
+            log_A, log_pi = np.log(model.transmat_), np.log(model.startprob_)
+    log_start = np.array([log_pi if delta is None else np.max(delta[:, np.newaxis] + log_A, axis=0)
+                          for delta in log_deltas])
+    log_delta, states = _viterbi(log_B, log_A, log_start, lengths)
+    last = log_delta[np.cumsum(lengths) - 1]
+    last = last - last.max(axis=1, keepdims=True)
+    return states, list(last)
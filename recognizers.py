@@ -0,0 +1,131 @@
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from audio_utils import SAMPLE_RATE, recognize_speech, to_audio_data
+from instrumentation import instrumentation
+
+class SpeechRecognizer:
+    """
+    Giao diện chung của các bộ nhận dạng giọng nói (backend ASR)
+    
+    Lớp con cài đặt recognize(audio_data) và trả về văn bản; lỗi mạng hoặc không nhận dạng
+    được phải được trả về thành thông báo thay vì ném ngoại lệ, giống recognize_speech.
+    
+    Thuộc tính:
+        timeout (float): Thời gian tối đa của một yêu cầu nhận dạng (giây), None để chờ mãi
+    """
+    name = None
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+
+    def recognize(self, audio_data):
+        """
+        Nhận dạng một bản ghi
+        
+        Tham số:
+            audio_data (sr.AudioData): Dữ liệu âm thanh trong bộ nhớ
+            
+        Trả về:
+            str: Văn bản được nhận dạng hoặc thông báo lỗi
+        """
+        raise NotImplementedError
+
+class GoogleRecognizer(SpeechRecognizer):
+    """
+    Google Speech Recognition (cần kết nối Internet)
+    """
+    name = 'google'
+
+    def __init__(self, language='vi-VN', timeout=None):
+        super().__init__(timeout)
+        self.language = language
+
+    def recognize(self, audio_data):
+        return recognize_speech(audio_data, language=self.language, timeout=self.timeout)
+
+class OfflineRecognizer(SpeechRecognizer):
+    """
+    Bộ nhận dạng giả lập chạy cục bộ, không cần mạng: trả về văn bản cố định hoặc mô tả
+    độ dài bản ghi sau một độ trễ giả lập. Dùng để chạy thử và đo hiệu năng pipeline.
+    """
+    name = 'offline'
+
+    def __init__(self, text=None, delay=0.0, timeout=None):
+        super().__init__(timeout)
+        self.text = text
+        self.delay = delay
+
+    @instrumentation.timed('asr.recognize')
+    def recognize(self, audio_data):
+        if self.timeout is not None and self.delay > self.timeout:
+            # Giả lập yêu cầu mạng bị quá hạn
+            time.sleep(self.timeout)
+            return "Lỗi kết nối đến dịch vụ nhận dạng giọng nói"
+        if self.delay:
+            time.sleep(self.delay)
+        if self.text is not None:
+            return self.text
+        duration = len(audio_data.frame_data) / (audio_data.sample_width * audio_data.sample_rate)
+        return f"[offline] {duration:.2f} giây âm thanh"
+
+# Bảng đăng ký backend: tên -> lớp
+RECOGNIZERS = {}
+
+def register_recognizer(cls):
+    """
+    Đăng ký một lớp backend theo thuộc tính name (dùng được như decorator)
+    """
+    RECOGNIZERS[cls.name] = cls
+    return cls
+
+register_recognizer(GoogleRecognizer)
+register_recognizer(OfflineRecognizer)
+
+def get_recognizer(name, **kwargs):
+    """
+    Tạo bộ nhận dạng theo tên đã đăng ký
+    
+    Tham số:
+        name (str): Tên backend ('google', 'offline', ...)
+        **kwargs: Tham số khởi tạo của backend
+    """
+    if name not in RECOGNIZERS:
+        raise ValueError(f"Không có bộ nhận dạng '{name}', các lựa chọn: {', '.join(sorted(RECOGNIZERS))}")
+    return RECOGNIZERS[name](**kwargs)
+
+class Transcription:
+    """
+    Một yêu cầu nhận dạng đang chạy nền trên thread pool, song song với pipeline ML.
+    
+    Thời hạn được tính từ lúc gửi yêu cầu, nên thời gian chờ ở result() chỉ là phần còn lại
+    sau khi pipeline ML đã xong. Khi hết hạn, kết quả bị bỏ qua; yêu cầu chưa bắt đầu sẽ bị hủy.
+    """
+    def __init__(self, executor, recognizer, audio_data, timeout=None):
+        if not hasattr(audio_data, 'frame_data'):
+            audio_data = to_audio_data(audio_data, SAMPLE_RATE)
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.future = executor.submit(recognizer.recognize, audio_data)
+
+    def result(self):
+        """
+        Chờ kết quả nhận dạng trong thời gian còn lại
+        
+        Trả về:
+            str: Văn bản nhận dạng, hoặc thông báo hết thời gian chờ
+        """
+        remaining = None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+        try:
+            return self.future.result(timeout=remaining)
+        except FutureTimeoutError:
+            self.cancel()
+            instrumentation.count('asr.timeouts')
+            return "Hết thời gian chờ nhận dạng giọng nói"
+        except Exception as e:
+            return f"Lỗi nhận dạng giọng nói: {e}"
+
+    def cancel(self):
+        """
+        Hủy yêu cầu nếu chưa chạy (yêu cầu đang chạy sẽ bị bỏ qua kết quả)
+        """
+        self.future.cancel()
@@ -0,0 +1,210 @@
+import json
+import os
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+import numpy as np
+
+# Một bản ghi kết quả của một lượt ghi âm
+#   time: Thời điểm (ISO 8601, đến giây)
+#   session: Mã phiên chạy chương trình
+#   transcript: Văn bản nhận dạng được
+#   models: Tên các mô hình, cùng thứ tự với predictions và các danh sách trong metrics
+#   predictions: Trạng thái dự đoán cuối cùng của từng mô hình (0/1)
+#   metrics: {'accuracy': [...], 'f1_score': [...], 'precision': [...], 'recall': [...]}
+#   timings: Thời gian từng bước (giây, các bước có thể lồng nhau hoặc chạy song song) và
+#            'total': thời gian thực xử lý cả lượt
+#   error: Thông báo lỗi nếu lượt xử lý thất bại
+ResultRecord = namedtuple('ResultRecord', ['time', 'session', 'transcript', 'models', 'predictions',
+                                           'metrics', 'timings', 'error'],
+                          defaults=('', '', [], [], {}, {}, ''))
+
+def as_label(prediction):
+    """
+    Đổi dự đoán (số, list hoặc mảng một phần tử) thành số nguyên, tránh in lẫn 0 và [0]
+    """
+    return int(np.ravel(prediction)[0])
+
+def format_legacy(record):
+    """
+    Định dạng một bản ghi theo kiểu văn bản cũ của speech_output.txt
+    """
+    lines = [f"\n--- Ghi âm lúc: {record.time.replace('T', '_').replace(':', '-')} ---",
+             f"Nội dung nói: {record.transcript}",
+             "Kết quả nhận dạng ML:"]
+    for name, label in zip(record.models, record.predictions):
+        lines.append(f"- {name}: Trạng thái {label} ({'Có tiếng nói' if label == 1 else 'Không có tiếng nói'})")
+    lines.append("-" * 40)
+    return '\n'.join(lines) + '\n'
+
+def _to_time(value):
+    """
+    Chuẩn hóa mốc thời gian (datetime, 'YYYY-MM-DD' hoặc ISO) thành chuỗi ISO để so sánh
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat(timespec='seconds')
+    return str(value)
+
+class ResultsStore:
+    """
+    Kho kết quả có cấu trúc, tối ưu cho ghi nối tiếp.
+
+    Mỗi ngày là một file JSONL (YYYY-MM-DD.jsonl), mỗi dòng là một ResultRecord. Tên file
+    đóng vai trò chỉ mục thời gian: khi quét theo khoảng thời gian chỉ các file của những ngày
+    liên quan được đọc. Bản ghi được giữ trong bộ đệm và ghi theo lô (mỗi file mở một lần
+    cho cả lô) khi đủ flush_every bản ghi, sau flush_seconds giây, hoặc khi đóng kho.
+
+    Thuộc tính:
+        directory (str): Thư mục chứa các file theo ngày
+        flush_every (int): Số bản ghi tối đa trong bộ đệm
+        flush_seconds (float): Thời gian tối đa một bản ghi nằm trong bộ đệm
+        n_written (int): Số bản ghi đã ghi xuống đĩa
+    """
+    def __init__(self, directory="results", flush_every=16, flush_seconds=30.0):
+        self.directory = directory
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self.n_written = 0
+        self._buffer = []
+        self._oldest = None
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def append(self, record):
+        """
+        Thêm một bản ghi vào bộ đệm (ghi xuống đĩa theo lô)
+        """
+        if not record.time:
+            record = record._replace(time=datetime.now().isoformat(timespec='seconds'))
+        self._buffer.append(record)
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        if len(self._buffer) >= self.flush_every or time.monotonic() - self._oldest >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """
+        Ghi toàn bộ bộ đệm xuống các file theo ngày
+        """
+        if not self._buffer:
+            return
+        partitions = OrderedDict()
+        for record in self._buffer:
+            partitions.setdefault(record.time[:10], []).append(record)
+        for day, records in partitions.items():
+            with open(self._partition_path(day), 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(r._asdict(), ensure_ascii=False) + '\n' for r in records)
+        self.n_written += len(self._buffer)
+        self._buffer = []
+        self._oldest = None
+
+    def close(self):
+        self.flush()
+
+    def _partition_path(self, day):
+        return os.path.join(self.directory, f"{day}.jsonl")
+
+    def partitions(self, start=None, end=None):
+        """
+        Các ngày có dữ liệu trong khoảng [start, end], theo thứ tự thời gian
+        """
+        start, end = _to_time(start), _to_time(end)
+        days = sorted(name[:-len('.jsonl')] for name in os.listdir(self.directory) if name.endswith('.jsonl'))
+        return [day for day in days
+                if (start is None or day >= start[:10]) and (end is None or day <= end[:10])]
+
+    def scan(self, start=None, end=None, session=None):
+        """
+        Duyệt các bản ghi trong khoảng thời gian [start, end] (bao gồm cả bộ đệm chưa ghi)
+
+        Tham số:
+            start, end (datetime/str): Mốc thời gian; chuỗi 'YYYY-MM-DD' được hiểu là cả ngày
+            session (str): Chỉ lấy bản ghi của một phiên
+
+        Trả về:
+            generator: Các ResultRecord
+        """
+        self.flush()
+        start, end = _to_time(start), _to_time(end)
+        if end is not None and len(end) == 10:
+            end += 'T23:59:59'
+        for day in self.partitions(start, end):
+            with open(self._partition_path(day), encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = ResultRecord(**json.loads(line))
+                    if start is not None and record.time < start:
+                        continue
+                    if end is not None and record.time > end:
+                        continue
+                    if session is not None and record.session != session:
+                        continue
+                    yield record
+
+    def aggregate(self, start=None, end=None, by='day'):
+        """
+        Tổng hợp theo ngày, tháng hoặc phiên: số bản ghi, số lỗi, trung bình các độ đo,
+        tỷ lệ dự đoán "có tiếng nói" của từng mô hình và thời gian xử lý trung bình mỗi lượt
+        (timings['total']; bản ghi cũ không có 'total' không được tính vào trung bình này)
+
+        Tham số:
+            by (str): 'day', 'month' hoặc 'session'
+
+        Trả về:
+            OrderedDict: Khóa nhóm -> dict thống kê
+        """
+        key_of = {'day': lambda r: r.time[:10], 'month': lambda r: r.time[:7],
+                  'session': lambda r: r.session}[by]
+        groups = OrderedDict()
+        for record in self.scan(start, end):
+            group = groups.setdefault(key_of(record), {
+                'models': record.models, 'n_records': 0, 'n_errors': 0, 'seconds': 0.0, 'n_timed': 0,
+                'sums': {}, 'n_metrics': 0, 'speech': np.zeros(len(record.models)), 'n_predictions': 0})
+            group['n_records'] += 1
+            group['n_errors'] += bool(record.error)
+            if 'total' in record.timings:
+                group['seconds'] += record.timings['total']
+                group['n_timed'] += 1
+            if record.metrics:
+                group['n_metrics'] += 1
+                for measure, values in record.metrics.items():
+                    group['sums'][measure] = group['sums'].get(measure, 0) + np.asarray(values)
+            if record.predictions:
+                group['speech'] += np.asarray(record.predictions)
+                group['n_predictions'] += 1
+
+        summary = OrderedDict()
+        for key, group in groups.items():
+            summary[key] = {
+                'models': group['models'],
+                'n_records': group['n_records'],
+                'n_errors': group['n_errors'],
+                'mean_seconds': group['seconds'] / group['n_timed'] if group['n_timed'] else None,
+                'speech_ratio': (group['speech'] / max(group['n_predictions'], 1)).tolist(),
+                **{measure: (total / group['n_metrics']).tolist() for measure, total in group['sums'].items()},
+            }
+        return summary
+
+    def export_text(self, filename="speech_output.txt", start=None, end=None):
+        """
+        Xuất các bản ghi ra file văn bản theo định dạng cũ của speech_output.txt
+
+        Trả về:
+            int: Số bản ghi đã xuất
+        """
+        count = 0
+        with open(filename, 'w', encoding='utf-8') as f:
+            for record in self.scan(start, end):
+                if record.predictions:
+                    f.write(format_legacy(record))
+                    count += 1
+        return count
@@ -0,0 +1,332 @@
+import asyncio
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_utils import SAMPLE_RATE, extract_features
+from data_utils import create_training_data, sliding_window_features
+from models import ModelFactory, load_models, viterbi_continue
+from streaming import StreamingMFCC
+from instrumentation import instrumentation
+
+# Giao thức: mỗi thông điệp từ client gồm header <loại (1 byte), độ dài (uint32)> và phần dữ liệu
+#   b'A': Khối âm thanh PCM 16-bit mono, SAMPLE_RATE Hz
+#   b'E': Kết thúc luồng
+#   b'S': Yêu cầu thống kê của bộ gộp lô
+# Server trả lời mỗi thông điệp bằng một dòng JSON
+MESSAGE_HEADER = struct.Struct('<cI')
+AUDIO, END, STATS = b'A', b'E', b'S'
+
+def encode_message(kind, payload=b''):
+    """
+    Đóng gói một thông điệp gửi tới server
+    """
+    return MESSAGE_HEADER.pack(kind, len(payload)) + payload
+
+async def read_message(reader):
+    """
+    Đọc một thông điệp của client
+
+    Trả về:
+        tuple: (loại, dữ liệu); (END, b'') khi client đóng kết nối
+    """
+    try:
+        header = await reader.readexactly(MESSAGE_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return END, b''
+    kind, size = MESSAGE_HEADER.unpack(header)
+    return kind, await reader.readexactly(size)
+
+def train_models(paths, svm_backend='svc'):
+    """
+    Huấn luyện ba mô hình trên các file WAV (khi chưa có mô hình đã lưu)
+
+    Trả về:
+        tuple: (hmm_custom, hmm_lib, svm)
+    """
+    from batch import read_wav_memmap
+
+    Xs, ys = [], []
+    for path in paths:
+        samples, sample_rate = read_wav_memmap(path)
+        if sample_rate != SAMPLE_RATE:
+            raise ValueError(f"{path}: tần số lấy mẫu {sample_rate} Hz, cần {SAMPLE_RATE} Hz")
+        X, y = create_training_data(extract_features(samples))
+        Xs.append(X)
+        ys.append(y)
+    if not Xs:
+        raise ValueError("Cần ít nhất một file WAV để huấn luyện")
+
+    X, y, lengths = np.vstack(Xs), np.concatenate(ys), [len(X) for X in Xs]
+    hmm_custom, hmm_lib, svm = ModelFactory.create_models(svm_backend)
+    hmm_custom.fit(X, lengths)
+    hmm_lib.fit(X, lengths)
+    svm.fit(X, y)
+    return hmm_custom, hmm_lib, svm
+
+class SessionFeatures:
+    """
+    Đặc trưng theo cửa sổ của một luồng âm thanh: MFCC tăng dần, cửa sổ trượt và chuẩn hóa.
+
+    Giống create_training_data, đặc trưng được chuẩn hóa theo thống kê của chính luồng đó:
+    warmup_seconds giây đầu được giữ lại để tính trung bình và độ lệch chuẩn, sau đó
+    mọi cửa sổ (kể cả các cửa sổ của đoạn đầu) được chuẩn hóa bằng thống kê này.
+
+    Thuộc tính:
+        hmm_state (list): Trạng thái Viterbi cuối của hai HMM trên luồng này (None trước đoạn đầu),
+                          được MicroBatcher cập nhật sau mỗi lần chấm điểm
+    """
+    def __init__(self, window_size=5, warmup_seconds=1.0):
+        self.mfcc = StreamingMFCC()
+        self.window_size = window_size
+        self.warmup_frames = max(window_size, int(warmup_seconds / self.mfcc.winstep))
+        self._frames = np.zeros((0, self.mfcc.numcep))
+        self._mean = None
+        self._std = None
+        self.hmm_state = [None, None]
+
+    def push(self, samples):
+        """
+        Thêm mẫu mới
+
+        Trả về:
+            tuple: (first_frame, X)
+                - first_frame: Chỉ số khung mới nhất của cửa sổ đầu tiên trong X
+                - X: Các cửa sổ đã chuẩn hóa, shape (số_cửa_sổ, số_đặc_trưng)
+        """
+        frames = np.vstack((self._frames, self.mfcc.push(samples)))
+        if self._mean is None and len(frames) < self.warmup_frames:
+            self._frames = frames
+            return self.mfcc.n_frames, np.zeros((0, self.mfcc.numcep))
+
+        windows, _ = sliding_window_features(frames, window_size=self.window_size)
+        self._frames = frames[len(frames) - self.window_size + 1:] if len(windows) else frames
+        if self._mean is None:
+            self._mean = windows.mean(axis=0)
+            self._std = windows.std(axis=0) + 1e-10
+        return self.mfcc.n_frames - len(windows), (windows - self._mean) / self._std
+
+class MicroBatcher:
+    """
+    Gộp các yêu cầu chấm điểm của mọi phiên thành một lần gọi predict cho mỗi mô hình.
+
+    Một lô được gửi đi khi đủ max_batch cửa sổ hoặc khi yêu cầu đầu tiên của lô đã chờ
+    max_wait giây. Hai HMM nhận lengths để mỗi phiên vẫn được giải mã Viterbi như một chuỗi
+    riêng, nối tiếp trạng thái Viterbi cuối của đoạn trước cùng phiên (viterbi_continue), nên
+    nhãn ở biên các đoạn không phụ thuộc cách các yêu cầu được gộp lô. Việc suy luận chạy trên
+    một thread riêng nên vòng lặp sự kiện vẫn nhận thêm yêu cầu, và các yêu cầu đến trong lúc
+    đó tạo thành lô kế tiếp.
+
+    Thuộc tính:
+        n_batches (int): Số lô đã chạy
+        n_windows (int): Tổng số cửa sổ đã chấm điểm
+    """
+    def __init__(self, models, max_batch=256, max_wait=0.005):
+        """
+        Tham số:
+            models (tuple): (hmm_custom, hmm_lib, svm) đã huấn luyện, dùng chung cho mọi phiên
+            max_batch (int): Số cửa sổ tối đa mỗi lô
+            max_wait (float): Thời gian chờ tối đa để gom lô (giây)
+        """
+        self.models = models
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.n_batches = 0
+        self.n_windows = 0
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='predict')
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, X, hmm_state=None):
+        """
+        Chấm điểm các cửa sổ của một phiên
+
+        Tham số:
+            X (array): Các cửa sổ mới của phiên
+            hmm_state (list): Trạng thái Viterbi của hai HMM sau đoạn trước của phiên
+                              (SessionFeatures.hmm_state), được cập nhật tại chỗ; None để giải
+                              mã đoạn này độc lập
+
+        Trả về:
+            array: Nhãn 0/1 của từng mô hình, shape (số_mô_hình, số_cửa_sổ)
+        """
+        if len(X) == 0:
+            return np.zeros((len(self.models), 0), dtype=int)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((X, hmm_state if hmm_state is not None else [None, None], future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            requests = [(X, hmm_state) for X, hmm_state, _ in batch]
+            try:
+                labels = await loop.run_in_executor(self._executor, self._predict, requests)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, _, future), result in zip(batch, labels):
+                if not future.done():
+                    future.set_result(result)
+
+    def _predict(self, requests):
+        """
+        Chạy cả ba mô hình trên một lô ghép từ nhiều phiên (trên thread suy luận) và cập nhật
+        trạng thái Viterbi của từng phiên
+        """
+        X = np.vstack([X for X, _ in requests])
+        lengths = [len(X) for X, _ in requests]
+        hmm_custom, hmm_lib, svm = self.models
+        with instrumentation.span('server.predict'):
+            rows = []
+            for i, model in enumerate((hmm_custom, hmm_lib)):
+                previous = [state[i] for _, state in requests]
+                states, deltas = viterbi_continue(model, X, lengths, previous)
+                for (_, state), delta in zip(requests, deltas):
+                    state[i] = delta
+                rows.append(states)
+            rows.append(svm.predict(X))
+            labels = np.vstack(rows).astype(int)
+        self.n_batches += 1
+        self.n_windows += len(X)
+        instrumentation.count('server.batches')
+        instrumentation.count('server.windows', len(X))
+        return np.split(labels, np.cumsum(lengths)[:-1], axis=1)
+
+    def stats(self):
+        return {
+            'n_batches': self.n_batches,
+            'n_windows': self.n_windows,
+            'mean_batch_size': self.n_windows / self.n_batches if self.n_batches else 0.0,
+            'max_batch': self.max_batch,
+            'max_wait': self.max_wait,
+        }
+
+class InferenceServer:
+    """
+    Server suy luận nhiều phiên trên TCP: mỗi kết nối là một luồng âm thanh với đặc trưng
+    riêng (SessionFeatures), còn mô hình và bộ gộp lô (MicroBatcher) được dùng chung
+    """
+    def __init__(self, models, host='127.0.0.1', port=8765, max_batch=256, max_wait=0.005,
+                 warmup_seconds=1.0):
+        self.models = models
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.warmup_seconds = warmup_seconds
+        self.n_sessions = 0
+        self.batcher = None
+        self._server = None
+
+    async def start(self):
+        self.batcher = MicroBatcher(self.models, self.max_batch, self.max_wait)
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Lấy lại cổng thật khi port=0 (hệ điều hành tự chọn)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self.batcher is not None:
+            await self.batcher.close()
+
+    async def _handle(self, reader, writer):
+        self.n_sessions += 1
+        instrumentation.count('server.sessions')
+        session = SessionFeatures(warmup_seconds=self.warmup_seconds)
+        seq = 0
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == STATS:
+                    reply = self.batcher.stats()
+                elif kind == AUDIO:
+                    samples = np.frombuffer(payload, dtype='<i2').astype(np.float32) / 32768.0
+                    first_frame, X = session.push(samples)
+                    labels = await self.batcher.submit(X, session.hmm_state)
+                    reply = {'seq': seq, 'first_frame': int(first_frame), 'labels': labels.tolist()}
+                    seq += 1
+                else:
+                    break
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+def load_server_models(model_dir=None, train_paths=(), svm_backend='svc'):
+    """
+    Nạp mô hình đã lưu (save_models), hoặc huấn luyện trên các file WAV nếu chưa có
+
+    Trả về:
+        tuple: (hmm_custom, hmm_lib, svm)
+    """
+    if model_dir and os.path.exists(os.path.join(model_dir, 'manifest.json')):
+        print(f"Nạp mô hình từ {model_dir}")
+        return load_models(model_dir)[:3]
+    if not train_paths:
+        raise ValueError(f"Chưa có mô hình trong {model_dir}: chạy chế độ tương tác với --model-dir "
+                         "để huấn luyện và lưu, hoặc truyền file WAV để huấn luyện")
+    print(f"Huấn luyện mô hình trên {len(train_paths)} file WAV...")
+    return train_models(train_paths, svm_backend)
+
+def serve(models, host='127.0.0.1', port=8765, max_batch=256, max_wait=0.005, warmup_seconds=1.0):
+    """
+    Chạy server cho đến khi bị ngắt (Ctrl+C)
+    """
+    async def run():
+        server = await InferenceServer(models, host, port, max_batch, max_wait, warmup_seconds).start()
+        print(f"Server đang lắng nghe tại {server.host}:{server.port} "
+              f"(lô tối đa {max_batch} cửa sổ, chờ tối đa {max_wait * 1000:g} ms)")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+            stats = server.batcher.stats()
+            print(f"Đã phục vụ {server.n_sessions} phiên, {stats['n_windows']} cửa sổ trong "
+                  f"{stats['n_batches']} lô (trung bình {stats['mean_batch_size']:.1f} cửa sổ/lô)")
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
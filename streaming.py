@@ -0,0 +1,392 @@
+import threading
+import time
+import wave
+from collections import namedtuple
+
+import numpy as np
+from audio_utils import SAMPLE_RATE, MFCC_FEATURES
+from data_utils import energy_labels, sliding_window_features
+from mfcc_engine import get_plan
+
+# Kết quả phát hiện cho một khung thời gian
+#   frame: Chỉ số khung mới nhất của cửa sổ quyết định (tính từ đầu luồng)
+#   time: Thời điểm kết thúc khung đó (giây)
+#   label: 0 (không có tiếng nói) / 1 (có tiếng nói)
+#   score: Xác suất có tiếng nói (HMM) hoặc giá trị hàm quyết định (SVM)
+Decision = namedtuple('Decision', ['frame', 'time', 'label', 'score'])
+
+class RingBuffer:
+    """
+    Bộ đệm vòng cho dữ liệu âm thanh, một luồng ghi (callback) và một luồng đọc.
+
+    Khi bộ đệm đầy, dữ liệu cũ nhất bị ghi đè và được đếm vào overruns. Sau close(),
+    các lần write_wait đang chờ chỗ trống kết thúc ngay và bỏ phần mẫu còn lại.
+    """
+    def __init__(self, capacity):
+        """
+        Tham số:
+            capacity (int): Số mẫu tối đa lưu trong bộ đệm
+        """
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._read = 0   # Tổng số mẫu đã đọc
+        self._write = 0  # Tổng số mẫu đã ghi
+        self._cond = threading.Condition()
+        self._closed = False
+        self.overruns = 0
+
+    def write(self, samples):
+        """
+        Ghi một khối mẫu vào bộ đệm (gọi từ callback của luồng âm thanh)
+        """
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if len(samples) > self.capacity:
+            samples = samples[-self.capacity:]
+        with self._cond:
+            start = self._write % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self._data[start:start + first] = samples[:first]
+            self._data[:len(samples) - first] = samples[first:]
+            self._write += len(samples)
+
+            # Ghi đè dữ liệu chưa đọc
+            lost = self._write - self._read - self.capacity
+            if lost > 0:
+                self._read += lost
+                self.overruns += lost
+            self._cond.notify_all()
+
+    def write_wait(self, samples):
+        """
+        Ghi một khối mẫu, chờ luồng đọc giải phóng chỗ thay vì ghi đè dữ liệu cũ
+        (dùng cho nguồn phát lại không cần thời gian thực)
+        """
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        for start in range(0, len(samples), self.capacity):
+            block = samples[start:start + self.capacity]
+            with self._cond:
+                # Chờ theo từng khoảng ngắn để luôn thoát được khi bộ đệm bị đóng
+                while not self._closed and self.capacity - (self._write - self._read) < len(block):
+                    self._cond.wait(timeout=0.1)
+                if self._closed:
+                    return
+            self.write(block)
+
+    def open(self):
+        """
+        Mở lại bộ đệm cho một luồng mới
+        """
+        with self._cond:
+            self._closed = False
+
+    def close(self):
+        """
+        Đóng bộ đệm và đánh thức các luồng ghi đang chờ chỗ trống
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def read(self, n, timeout=None):
+        """
+        Đọc đúng n mẫu, chờ tối đa timeout giây cho đến khi đủ dữ liệu.
+
+        Trả về:
+            array: Các mẫu đọc được; có thể ngắn hơn n nếu hết thời gian chờ
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._write - self._read >= n, timeout=timeout)
+            n = min(n, self._write - self._read)
+            start = self._read % self.capacity
+            idx = (start + np.arange(n)) % self.capacity
+            out = self._data[idx]
+            self._read += n
+            self._cond.notify_all()
+            return out
+
+    def __len__(self):
+        with self._cond:
+            return self._write - self._read
+
+class MicrophoneSource:
+    """
+    Nguồn âm thanh từ microphone qua callback của sd.InputStream
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE, block_size=512, device=None):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.device = device
+        self._stream = None
+
+    def start(self, callback):
+        """
+        Bắt đầu ghi âm, mỗi khối mẫu float32 được chuyển cho callback
+        """
+        import sounddevice as sd
+
+        def _on_audio(indata, frames, time_info, status):
+            callback(indata[:, 0])
+
+        self._stream = sd.InputStream(samplerate=self.sample_rate,
+                                      blocksize=self.block_size,
+                                      device=self.device,
+                                      channels=1,
+                                      dtype='float32',
+                                      callback=_on_audio)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    @property
+    def active(self):
+        return self._stream is not None and self._stream.active
+
+class FileReplaySource:
+    """
+    Nguồn âm thanh phát lại từ file WAV, thay thế microphone khi chạy không có thiết bị âm thanh
+    """
+    def __init__(self, path, block_size=512, realtime=False):
+        """
+        Tham số:
+            path (str): Đường dẫn file WAV mono 16-bit
+            block_size (int): Số mẫu mỗi khối, giống blocksize của InputStream
+            realtime (bool): Giả lập tốc độ thời gian thực giữa các khối
+        """
+        self.path = path
+        self.block_size = block_size
+        self.realtime = realtime
+        self.lossless = not realtime  # Không cần bỏ mẫu khi bộ xử lý chậm hơn nguồn
+        self._thread = None
+        self._stop = threading.Event()
+        with wave.open(path, 'rb') as wf:
+            self.sample_rate = wf.getframerate()
+
+    def start(self, callback):
+        """
+        Bắt đầu phát lại trên một luồng riêng, mỗi khối được chuyển cho callback
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback,), daemon=True)
+        self._thread.start()
+
+    def _run(self, callback):
+        block_duration = self.block_size / self.sample_rate
+        with wave.open(self.path, 'rb') as wf:
+            if wf.getsampwidth() != 2 or wf.getnchannels() != 1:
+                raise ValueError("Chỉ hỗ trợ file WAV mono 16-bit")
+            next_time = time.perf_counter()
+            while not self._stop.is_set():
+                raw = wf.readframes(self.block_size)
+                if not raw:
+                    break
+                callback(np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0)
+                if self.realtime:
+                    next_time += block_duration
+                    time.sleep(max(0.0, next_time - time.perf_counter()))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def active(self):
+        return self._thread is not None and self._thread.is_alive()
+
+class StreamingMFCC:
+    """
+    Trích xuất MFCC tăng dần: mỗi lần nhận thêm mẫu chỉ tính các khung mới đã đủ dữ liệu.
+
+    Tiền nhấn (pre-emphasis) được thực hiện ở đây, giữ lại mẫu cuối của khối trước,
+    để kết quả trùng với việc trích xuất trên toàn bộ tín hiệu.
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE, numcep=MFCC_FEATURES, nfilt=26, nfft=512,
+                 winlen=0.025, winstep=0.01, preemph=0.97):
+        self.sample_rate = sample_rate
+        self.numcep = numcep
+        self.winlen = winlen
+        self.winstep = winstep
+        self.preemph = preemph
+        # Tiền nhấn được làm ở push() nên plan không tiền nhấn lại
+        self.plan = get_plan(sample_rate, nfft, nfilt, numcep, winlen, winstep, preemph=0)
+        self.frame_len = self.plan.frame_len
+        self.frame_step = self.plan.frame_step
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._last_sample = None
+        self.n_frames = 0
+
+    def push(self, samples):
+        """
+        Thêm mẫu mới và trả về các khung MFCC vừa hoàn thành
+
+        Trả về:
+            array: shape (n_new_frames, numcep)
+        """
+        samples = np.asarray(samples, dtype=np.float32)
+        if len(samples):
+            emphasized = np.empty_like(samples)
+            emphasized[1:] = samples[1:] - self.preemph * samples[:-1]
+            emphasized[0] = samples[0] if self._last_sample is None \
+                else samples[0] - self.preemph * self._last_sample
+            self._last_sample = samples[-1]
+            self._pending = np.concatenate((self._pending, emphasized))
+
+        n_new = 0
+        if len(self._pending) >= self.frame_len:
+            n_new = 1 + (len(self._pending) - self.frame_len) // self.frame_step
+        if n_new == 0:
+            return np.zeros((0, self.numcep))
+
+        segment = self._pending[:self.frame_len + (n_new - 1) * self.frame_step]
+        features = self.plan.frames_to_mfcc(self.plan.frame(segment))
+        self._pending = self._pending[n_new * self.frame_step:]
+        self.n_frames += n_new
+        return np.nan_to_num(features)
+
+class HMMScorer:
+    """
+    Chấm điểm trực tuyến bằng lọc tiến của CustomHMM; trạng thái cao nhất ứng với tiếng nói
+    """
+    def __init__(self, model):
+        self.model = model
+        self._log_alpha = None
+
+    def fit(self, X, y):
+        self.model.fit(X)
+        self._log_alpha = None
+
+    def score(self, X):
+        posteriors, self._log_alpha = self.model.filter(X, self._log_alpha)
+        speech_prob = posteriors[:, -1]
+        return (speech_prob > 0.5).astype(int), speech_prob
+
+class SVMScorer:
+    """
+    Chấm điểm từng cửa sổ bằng SVM
+    """
+    def __init__(self, model):
+        self.model = model
+
+    def fit(self, X, y):
+        self.model.fit(X, y)
+
+    def score(self, X):
+        return self.model.predict(X), self.model.decision_function(X)
+
+class StreamingVAD:
+    """
+    Phát hiện tiếng nói thời gian thực: bộ đệm vòng -> MFCC tăng dần -> cửa sổ trượt -> mô hình.
+
+    Vài giây đầu của luồng được dùng để hiệu chỉnh: tính thống kê chuẩn hóa, gán nhãn
+    theo năng lượng (giống create_training_data) và huấn luyện mô hình. Sau đó mỗi bước
+    nhảy (hop) chỉ chấm điểm các khung mới, nên độ trễ quyết định bị chặn bởi
+    độ dài cửa sổ cộng với hop_frames khung.
+    """
+    def __init__(self, scorer, mfcc_stream=None, window_size=5, hop_frames=2,
+                 calibration_seconds=3.0, buffer_seconds=10.0):
+        """
+        Tham số:
+            scorer: HMMScorer hoặc SVMScorer
+            mfcc_stream (StreamingMFCC): Bộ trích xuất MFCC tăng dần
+            window_size (int): Số khung trong mỗi cửa sổ trung bình
+            hop_frames (int): Số khung mới cần có trước mỗi lần chấm điểm
+            calibration_seconds (float): Thời lượng âm thanh dùng để hiệu chỉnh
+            buffer_seconds (float): Dung lượng bộ đệm vòng
+        """
+        self.scorer = scorer
+        self.mfcc = mfcc_stream or StreamingMFCC()
+        self.window_size = window_size
+        self.hop_frames = hop_frames
+        self.calibration_frames = int(calibration_seconds / self.mfcc.winstep)
+        self.ring = RingBuffer(int(buffer_seconds * self.mfcc.sample_rate))
+        self._history = np.zeros((0, self.mfcc.numcep))
+        self._calibration = []
+        self._mean = None
+        self._std = None
+
+    @property
+    def calibrated(self):
+        return self._mean is not None
+
+    def _calibrate(self):
+        """
+        Huấn luyện mô hình trên các khung hiệu chỉnh; trả về False nếu chưa đủ hai lớp
+        """
+        frames = np.vstack(self._calibration)
+        windows, y = sliding_window_features(frames, energy_labels(frames),
+                                             window_size=self.window_size)
+        if len(np.unique(y)) < 2:
+            # Chỉ giữ calibration_frames khung gần nhất và thử lại khi có khung mới, để bộ nhớ
+            # và chi phí mỗi lần thử không tăng theo độ dài đoạn im lặng
+            self._calibration = [frames[-self.calibration_frames:]]
+            return False
+
+        self._mean = windows.mean(axis=0)
+        self._std = windows.std(axis=0) + 1e-10
+        self.scorer.fit((windows - self._mean) / self._std, y)
+        self._history = frames[-(self.window_size - 1):] if self.window_size > 1 \
+            else np.zeros((0, frames.shape[1]))
+        self._calibration = []
+        return True
+
+    def process(self, samples):
+        """
+        Xử lý một khối mẫu mới
+
+        Trả về:
+            list: Các Decision cho những khung vừa được chấm điểm
+        """
+        frames = self.mfcc.push(samples)
+        if len(frames) == 0:
+            return []
+
+        if not self.calibrated:
+            self._calibration.append(frames)
+            if sum(len(f) for f in self._calibration) >= self.calibration_frames:
+                self._calibrate()
+            return []
+
+        frames = np.vstack((self._history, frames))
+        if len(frames) < self.window_size:
+            self._history = frames
+            return []
+        self._history = frames[len(frames) - self.window_size + 1:]
+
+        windows, _ = sliding_window_features(frames, window_size=self.window_size)
+        X = (windows - self._mean) / self._std
+        labels, scores = self.scorer.score(X)
+
+        # Mỗi quyết định gắn với khung mới nhất trong cửa sổ của nó
+        first = self.mfcc.n_frames - len(X)
+        return [Decision(first + i, (first + i) * self.mfcc.winstep + self.mfcc.winlen,
+                         int(label), float(score))
+                for i, (label, score) in enumerate(zip(labels, scores))]
+
+    def stream(self, source, timeout=0.5):
+        """
+        Chạy phát hiện trên một nguồn âm thanh (MicrophoneSource hoặc FileReplaySource)
+
+        Trả về:
+            generator: Các Decision theo thứ tự thời gian
+        """
+        hop_samples = self.hop_frames * self.mfcc.frame_step
+        lossless = getattr(source, 'lossless', False)
+        self.ring.open()
+        source.start(self.ring.write_wait if lossless else self.ring.write)
+        try:
+            while True:
+                chunk = self.ring.read(hop_samples, timeout=timeout)
+                if len(chunk) == 0:
+                    if not source.active:
+                        break
+                    continue
+                for decision in self.process(chunk):
+                    yield decision
+        finally:
+            # Đóng bộ đệm trước để luồng phát lại không bị kẹt trong write_wait khi dừng sớm
+            self.ring.close()
+            source.stop()
@@ -1,8 +1,80 @@
-import matplotlib.pyplot as plt
 import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
 import numpy as np
 
-def plot_results(metrics, timestamp):
+from instrumentation import instrumentation
+
+# Nhãn mặc định của ba mô hình trên trục hoành
+METHOD_LABELS = ['HMM\n(Tự cài đặt)', 'HMM\n(Thư viện)', 'SVM']
+
+# Các độ đo được vẽ: (khóa trong metrics, tiêu đề biểu đồ con)
+MEASURES = [('accuracy', 'Accuracy'), ('f1_score', 'F1-score'),
+            ('precision', 'Precision'), ('recall', 'Recall')]
+
+def _method_labels(n_models):
+    if n_models == len(METHOD_LABELS):
+        return METHOD_LABELS
+    return [f"Mô hình {i + 1}" for i in range(n_models)]
+
+class ResultsFigure:
+    """
+    Mẫu figure 2x2 dựng sẵn cho biểu đồ kết quả: các cột, nhãn giá trị, tiêu đề, lưới và bố cục
+    chỉ tạo một lần; update() chỉ đổi chiều cao cột và nhãn. Dùng trực tiếp canvas Agg
+    (không qua pyplot) nên không phụ thuộc màn hình.
+    
+    Thuộc tính:
+        methods (list): Nhãn các mô hình
+        figure (Figure): Figure matplotlib
+    """
+    def __init__(self, methods):
+        # matplotlib chỉ được nạp khi vẽ (thường là trong tiến trình nền của PlotWorker)
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        
+        self.methods = list(methods)
+        self.figure = Figure(figsize=(15, 10))
+        FigureCanvasAgg(self.figure)
+        self.figure.suptitle('Đánh giá hiệu suất các mô hình', fontsize=16)
+        
+        self._bars = {}
+        self._labels = {}
+        for ax, (key, title) in zip(self.figure.subplots(2, 2).flat, MEASURES):
+            bars = ax.bar(self.methods, np.zeros(len(self.methods)))
+            # Nhãn giá trị trên đầu mỗi cột
+            self._labels[key] = [ax.text(bar.get_x() + bar.get_width() / 2., 0, '',
+                                         ha='center', va='bottom') for bar in bars]
+            self._bars[key] = bars
+            ax.set_title(title)
+            ax.set_ylim([0, 1])  # Các độ đo đều có giá trị từ 0 đến 1
+            ax.grid(True, alpha=0.3)
+        self.figure.tight_layout()
+
+    def update(self, metrics):
+        """
+        Cập nhật chiều cao cột và nhãn theo độ đo mới
+        """
+        for key, _ in MEASURES:
+            for bar, label, value in zip(self._bars[key], self._labels[key], metrics[key]):
+                bar.set_height(value)
+                label.set_y(value)
+                label.set_text(f'{value:.3f}')
+
+    def save(self, filename, dpi=300, fmt='png'):
+        self.figure.savefig(filename, dpi=dpi, format=fmt)
+
+# Các mẫu figure đã dựng trong tiến trình hiện tại, theo bộ nhãn mô hình
+_templates = {}
+
+def _get_template(methods):
+    key = tuple(methods)
+    if key not in _templates:
+        _templates[key] = ResultsFigure(methods)
+    return _templates[key]
+
+@instrumentation.timed('plot.results')
+def plot_results(metrics, timestamp, dpi=300, fmt='png', plots_dir="plots", methods=None):
     """
     Trực quan hóa kết quả đánh giá của các mô hình bằng biểu đồ cột.
     
@@ -24,51 +96,129 @@ def plot_results(metrics, timestamp):
        - Đánh giá khả năng phát hiện đúng các mẫu dương tính
        - Giá trị từ 0 đến 1 (càng cao càng tốt)
     
+    Figure được dựng một lần cho mỗi bộ tên mô hình (ResultsFigure) và dùng lại: mỗi lần vẽ
+    chỉ cập nhật chiều cao cột và nhãn giá trị.
+    
     Tham số:
         metrics (dict): Dictionary chứa các độ đo cho từng mô hình
         timestamp (str): Thời gian để đặt tên file kết quả
-    """
-    methods = ['HMM\n(Tự cài đặt)', 'HMM\n(Thư viện)', 'SVM']
-    measures = ['Accuracy', 'F1-score', 'Precision', 'Recall']
-    
-    # Tạo figure với 4 subplots
-    fig, axes = plt.subplots(2, 2, figsize=(15, 10))
-    fig.suptitle('Đánh giá hiệu suất các mô hình', fontsize=16)
-    
-    # Vẽ từng độ đo trên một biểu đồ con
-    for idx, (measure, values) in enumerate([
-        ('accuracy', metrics['accuracy']),
-        ('f1_score', metrics['f1_score']),
-        ('precision', metrics['precision']),
-        ('recall', metrics['recall'])
-    ]):
-        row = idx // 2
-        col = idx % 2
-        
-        ax = axes[row, col]
-        bars = ax.bar(methods, values)
-        
-        # Thêm giá trị lên đầu mỗi cột
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                   f'{height:.3f}',
-                   ha='center', va='bottom')
-        
-        ax.set_title(measures[idx])
-        ax.set_ylim([0, 1])  # Các độ đo đều có giá trị từ 0 đến 1
-        ax.grid(True, alpha=0.3)
+        dpi (int): Độ phân giải khi lưu
+        fmt (str): Định dạng file ('png', 'svg', 'pdf', ...)
+        plots_dir (str): Thư mục lưu biểu đồ
+        methods (list): Nhãn các mô hình trên trục hoành (mặc định theo số mô hình)
     
-    plt.tight_layout()
+    Trả về:
+        str: Đường dẫn file đã lưu
+    """
+    methods = methods or _method_labels(len(metrics['accuracy']))
+    figure = _get_template(methods)
+    figure.update(metrics)
     
     # Tạo thư mục plots nếu chưa tồn tại
-    plots_dir = "plots"
-    if not os.path.exists(plots_dir):
-        os.makedirs(plots_dir)
+    os.makedirs(plots_dir, exist_ok=True)
     
     # Lưu biểu đồ với timestamp
-    filename = os.path.join(plots_dir, f'results_{timestamp}.png')
-    plt.savefig(filename, dpi=300, bbox_inches='tight')
-    plt.close()
+    filename = os.path.join(plots_dir, f'results_{timestamp}.{fmt}')
+    figure.save(filename, dpi=dpi, fmt=fmt)
+    
+    print(f"\nĐã lưu biểu đồ kết quả vào: {filename}")
+    return filename
+
+@instrumentation.timed('plot.dashboard')
+def plot_dashboard(history, session_id, dpi=300, fmt='png', plots_dir="plots", methods=None):
+    """
+    Vẽ một biểu đồ tổng hợp cho cả phiên thay vì một file cho mỗi bản ghi: mỗi biểu đồ con
+    là diễn biến một độ đo qua các bản ghi, mỗi mô hình một đường.
+    
+    Tham số:
+        history (list): Danh sách metrics (kết quả evaluate_models) theo thứ tự bản ghi
+        session_id (str): Tên phiên để đặt tên file
+        dpi, fmt, plots_dir, methods: Như plot_results
+    
+    Trả về:
+        str: Đường dẫn file đã lưu, hoặc None nếu history rỗng
+    """
+    if not history:
+        return None
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.ticker import MaxNLocator
+    
+    methods = methods or _method_labels(len(history[0]['accuracy']))
+    recordings = np.arange(1, len(history) + 1)
     
-    print(f"\nĐã lưu biểu đồ kết quả vào: {filename}")
\ No newline at end of file
+    figure = Figure(figsize=(15, 10))
+    FigureCanvasAgg(figure)
+    figure.suptitle(f'Hiệu suất các mô hình qua {len(history)} bản ghi', fontsize=16)
+    for ax, (key, title) in zip(figure.subplots(2, 2).flat, MEASURES):
+        values = np.array([metrics[key] for metrics in history])  # (số_bản_ghi, số_mô_hình)
+        for i, method in enumerate(methods):
+            ax.plot(recordings, values[:, i], marker='o',
+                    label=f"{method.replace(chr(10), ' ')} (TB {values[:, i].mean():.3f})")
+        ax.set_title(title)
+        ax.set_xlabel('Bản ghi')
+        ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+        ax.set_ylim([0, 1])
+        ax.grid(True, alpha=0.3)
+        ax.legend(loc='lower right')
+    figure.tight_layout()
+    
+    os.makedirs(plots_dir, exist_ok=True)
+    filename = os.path.join(plots_dir, f'dashboard_{session_id}.{fmt}')
+    figure.savefig(filename, dpi=dpi, format=fmt)
+    print(f"\nĐã lưu biểu đồ tổng hợp của phiên vào: {filename}")
+    return filename
+
+class PlotWorker:
+    """
+    Vẽ biểu đồ trên một tiến trình nền để vòng lặp ghi âm không phải chờ render.
+    
+    Tiến trình nền giữ mẫu figure giữa các lần vẽ. Ở chế độ 'dashboard', các độ đo chỉ được
+    ghi lại và một biểu đồ tổng hợp được vẽ khi đóng phiên (close).
+    
+    Thuộc tính:
+        mode (str): 'each' (một biểu đồ mỗi bản ghi), 'dashboard' hoặc 'off'
+        dpi (int): Độ phân giải
+        fmt (str): Định dạng file
+        history (list): Các metrics đã nhận trong phiên
+    """
+    def __init__(self, mode='each', dpi=300, fmt='png', plots_dir="plots", background=True):
+        self.mode = mode
+        self.dpi = dpi
+        self.fmt = fmt
+        self.plots_dir = plots_dir
+        self.history = []
+        self._pending = []
+        self._executor = None
+        if background and mode != 'off':
+            # spawn: tiến trình con không thừa hưởng các thread đang chạy (ASR, ...)
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn'))
+
+    def _run(self, func, *args):
+        kwargs = {'dpi': self.dpi, 'fmt': self.fmt, 'plots_dir': self.plots_dir}
+        if self._executor is None:
+            return func(*args, **kwargs)
+        self._pending = [f for f in self._pending if not f.done() or f.exception()]
+        self._pending.append(self._executor.submit(func, *args, **kwargs))
+
+    def submit(self, metrics, timestamp):
+        """
+        Ghi nhận kết quả một bản ghi; ở chế độ 'each' gửi yêu cầu vẽ ngay (không chờ)
+        """
+        self.history.append(metrics)
+        if self.mode == 'each':
+            self._run(plot_results, metrics, timestamp)
+
+    def close(self, session_id=None):
+        """
+        Vẽ biểu đồ tổng hợp (chế độ 'dashboard'), chờ các yêu cầu đang chạy và dừng tiến trình nền
+        """
+        if self.mode == 'dashboard' and self.history:
+            self._run(plot_dashboard, self.history, session_id or 'session')
+        if self._executor is not None:
+            for future in self._pending:
+                error = future.exception()
+                if error is not None:
+                    print(f"Lỗi khi vẽ biểu đồ: {error}")
+            self._executor.shutdown()
+            self._executor = None